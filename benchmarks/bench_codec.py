@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Compare payload codec pipelines on Shopify shaped payloads: bytes stored in
+Temporal history (and sent over gRPC) versus CPU time spent encoding/decoding.
+
+    python benchmarks/bench_codec.py
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from shopify_payloads import payloads
+from temporalio.converter import DataConverter
+
+from temporal_forwarder.codec import (
+    CodecChain,
+    CompressionCodec,
+    EncryptionCodec,
+    KeyRingEncryptionCodec,
+    default_key,
+    default_key_id,
+)
+from temporal_forwarder.envelope import WebhookPayloadConverter
+
+
+def pipelines() -> dict:
+    codecs = {
+        "none": None,
+        "encrypt": EncryptionCodec(),
+        "keyring": KeyRingEncryptionCodec({default_key_id: default_key}, default_key_id),
+        "zlib+encrypt": CodecChain(CompressionCodec("zlib"), EncryptionCodec()),
+    }
+    try:
+        codecs["zstd+encrypt"] = CodecChain(CompressionCodec("zstd"), EncryptionCodec())
+    except Exception as e:
+        print(f"Skipping zstd: {e}", file=sys.stderr)
+    return codecs
+
+
+async def measure(codec, body: bytes, iterations: int) -> dict:
+    converter = DataConverter(
+        payload_converter_class=WebhookPayloadConverter, payload_codec=codec
+    )
+    value = json.dumps({"headers": {}, "data": json.loads(body)})
+
+    start = time.process_time()
+    for _ in range(iterations):
+        encoded = await converter.encode([value])
+    encode_time = (time.process_time() - start) / iterations
+
+    start = time.process_time()
+    for _ in range(iterations):
+        await converter.decode(encoded, [str])
+    decode_time = (time.process_time() - start) / iterations
+
+    return {
+        "bytes": encoded[0].ByteSize(),
+        "encode_us": round(encode_time * 1e6, 1),
+        "decode_us": round(decode_time * 1e6, 1),
+    }
+
+
+async def main():
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--iterations", type=int, default=200)
+    p.add_argument("--json", dest="json_output", help="also write results to this file")
+    args = p.parse_args()
+
+    results = []
+    for name, body in payloads().items():
+        baseline = None
+        for pipeline, codec in pipelines().items():
+            result = await measure(codec, body, args.iterations)
+            baseline = baseline or result["bytes"]
+            result |= {
+                "payload": name,
+                "pipeline": pipeline,
+                "saved": f"{100 * (1 - result['bytes'] / baseline):.1f}%",
+            }
+            results.append(result)
+
+    print(
+        f"{'payload':<24} {'pipeline':<14} {'bytes':>9} {'saved':>7} {'enc us':>9} {'dec us':>9}"
+    )
+    for r in results:
+        print(
+            f"{r['payload']:<24} {r['pipeline']:<14} {r['bytes']:>9} {r['saved']:>7} "
+            f"{r['encode_us']:>9} {r['decode_us']:>9}"
+        )
+
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Load test forward_webhook end to end (ASGI app, forwarder plugins, Temporal client
+and codecs) against an in-process fake Temporal frontend.
+
+    python benchmarks/bench_forwarder.py --requests 2000 --concurrency 32 --json results.json
+
+Requests are made in-process through the ASGI interface (no sockets), for both the
+Shopify forwarder (with correctly signed payloads) and the generic forwarder. CPU
+time per request includes the fake frontend and the load generating client, which
+share this process.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+SECRET = "benchmark-secret"
+os.environ.setdefault("SHOPIFY_WEBHOOKS_KEY", SECRET)
+
+import httpx
+from fake_temporal import FakeTemporal, FakeWorkflowService
+from shopify_payloads import payloads, sign
+
+from temporal_forwarder import ENVELOPE_JSON, ENVELOPE_PASSTHROUGH, Config, create_app
+from temporal_forwarder.asgi import create_asgi_app
+from temporal_forwarder.background import set_background_loop
+from temporal_forwarder.logs import configure_logging
+from temporal_forwarder.plugins import WEBHOOK_FORWARDERS
+from temporal_forwarder.services import start_services, stop_services
+from temporal_forwarder.webhooks.generic import GenericForwarder
+from temporal_forwarder.webhooks.shopify import ShopifyForwarder
+
+FORWARDERS = {"shopify": ShopifyForwarder, "generic": GenericForwarder}
+
+
+def request_headers(forwarder: str, topic: str, body: bytes) -> dict:
+    webhook_id = str(uuid.uuid4())
+    headers = {"Content-Type": "application/json"}
+    if forwarder == "shopify":
+        return headers | {
+            "X-Shopify-Webhook-Id": webhook_id,
+            "X-Shopify-Topic": topic,
+            "X-Shopify-Shop-Domain": "example.myshopify.com",
+            "X-Shopify-Hmac-SHA256": sign(body, SECRET),
+        }
+    return headers | {"X-Request-ID": webhook_id}
+
+
+def percentile(ordered: list, p: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, forwarder: str, name: str, body: bytes, args
+) -> dict:
+    topic = name.split()[0]
+    remaining = iter(range(args.requests))
+    latencies = []
+    statuses = collections.Counter()
+
+    async def worker():
+        for _ in remaining:
+            headers = request_headers(forwarder, topic, body)
+            start = time.perf_counter()
+            response = await client.post(
+                f"/temporal/{forwarder}", content=body, headers=headers
+            )
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+
+    cpu, wall = time.process_time(), time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+
+    latencies.sort()
+    return {
+        "forwarder": forwarder,
+        "payload": name,
+        "body_bytes": len(body),
+        "requests": len(latencies),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "rps": round(len(latencies) / wall, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "p999_ms": round(percentile(latencies, 0.999) * 1000, 2),
+        "cpu_us_per_request": round(cpu / len(latencies) * 1e6, 1),
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+async def main():
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    p.add_argument("--concurrency", type=int, default=32)
+    p.add_argument(
+        "--forwarders", nargs="+", choices=FORWARDERS, default=list(FORWARDERS)
+    )
+    p.add_argument("--payloads", nargs="+", help="payload names (default all)")
+    p.add_argument("--latency-ms", type=float, default=2.0, help="fake start RPC latency")
+    p.add_argument("--jitter-ms", type=float, default=1.0, help="random extra latency")
+    p.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="fraction of starts failed as UNAVAILABLE (retried by the Temporal client)",
+    )
+    p.add_argument(
+        "--envelope", choices=[ENVELOPE_JSON, ENVELOPE_PASSTHROUGH], default=ENVELOPE_JSON
+    )
+    p.add_argument("--compression", choices=["zlib", "zstd"])
+    p.add_argument("--max-inflight-starts", type=int, default=0)
+    p.add_argument("--log-level", default="WARNING")
+    p.add_argument("--json", dest="json_output", help="write results to this file")
+    args = p.parse_args()
+
+    configure_logging(Config, getattr(logging, args.log_level))
+
+    service = FakeWorkflowService(args.latency_ms, args.jitter_ms, args.error_rate)
+    fake = FakeTemporal(service).start()
+
+    Config.temporal_endpoint = fake.endpoint
+    Config.envelope = args.envelope
+    Config.compression = args.compression
+    Config.max_inflight_starts = args.max_inflight_starts
+
+    app = create_app(Config)
+    for slug in args.forwarders:
+        WEBHOOK_FORWARDERS[slug] = FORWARDERS[slug](Config)
+
+    set_background_loop(asyncio.get_running_loop())
+    await start_services(Config, WEBHOOK_FORWARDERS)
+
+    bodies = payloads()
+    names = args.payloads or list(bodies)
+
+    results = []
+    transport = httpx.ASGITransport(app=create_asgi_app(app, Config))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # warm up connections, caches and code paths before measuring
+        for forwarder in args.forwarders:
+            await client.post(
+                f"/temporal/{forwarder}",
+                content=bodies[names[0]],
+                headers=request_headers(forwarder, names[0].split()[0], bodies[names[0]]),
+            )
+
+        for forwarder in args.forwarders:
+            for name in names:
+                result = await run_scenario(client, forwarder, name, bodies[name], args)
+                results.append(result)
+                print(
+                    f"{forwarder:<8} {name:<24} {result['rps']:>8} rps "
+                    f"p50 {result['p50_ms']:>7}ms p99 {result['p99_ms']:>7}ms "
+                    f"p999 {result['p999_ms']:>7}ms {result['cpu_us_per_request']:>8}us cpu "
+                    f"{result['peak_rss_mb']:>6}MB {result['statuses']}"
+                )
+
+    await stop_services()
+
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "settings": {
+                        k: v for k, v in vars(args).items() if k != "json_output"
+                    },
+                    "fake_temporal": {
+                        "started": service.started,
+                        "failed": service.failed,
+                    },
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Measure how much per-topic projection shrinks Shopify shaped payloads: envelope
+size with and without projection, the CPU time to project a parsed body, and the
+end to end encode time (parse, project and serialize the envelope).
+
+    python benchmarks/bench_projection.py
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from shopify_payloads import payloads
+
+from temporal_forwarder.projection import compile_projection
+
+# fields a typical order or product workflow reads
+PROJECTIONS = {
+    "orders/create": compile_projection(
+        (
+            "id",
+            "email",
+            "total_price",
+            "customer.id",
+            "line_items[*].sku",
+            "line_items[*].quantity",
+            "line_items[*].price",
+        )
+    ),
+    "products/update": compile_projection(
+        ("id", "title", "status", "variants[*].sku", "variants[*].price")
+    ),
+}
+
+HEADERS = {"X-Shopify-Topic": "orders/create", "X-Webhook-Route": "shopify"}
+
+
+def encode(body: bytes, projection, iterations: int) -> tuple[int, float]:
+    start = time.process_time()
+    for _ in range(iterations):
+        data = json.loads(body)
+        if projection:
+            data = projection(data)
+        envelope = json.dumps({"headers": HEADERS, "data": data})
+    return len(envelope), (time.process_time() - start) / iterations
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--iterations", type=int, default=500)
+    p.add_argument("--json", dest="json_output", help="also write results to this file")
+    args = p.parse_args()
+
+    results = []
+    for payload, body in payloads().items():
+        projection = PROJECTIONS[payload.split()[0]]
+        data = json.loads(body)
+
+        start = time.process_time()
+        for _ in range(args.iterations):
+            projection(data)
+        project_time = (time.process_time() - start) / args.iterations
+
+        full_bytes, full_time = encode(body, None, args.iterations)
+        projected_bytes, projected_time = encode(body, projection, args.iterations)
+        results.append(
+            {
+                "payload": payload,
+                "bytes": full_bytes,
+                "projected_bytes": projected_bytes,
+                "project_us": round(project_time * 1e6, 1),
+                "encode_us": round(full_time * 1e6, 1),
+                "projected_encode_us": round(projected_time * 1e6, 1),
+            }
+        )
+
+    print(
+        f"{'payload':<24} {'bytes':>9} {'projected':>10} "
+        f"{'proj us':>9} {'enc us':>9} {'proj enc us':>12}"
+    )
+    for r in results:
+        print(
+            f"{r['payload']:<24} {r['bytes']:>9} {r['projected_bytes']:>10} "
+            f"{r['project_us']:>9} {r['encode_us']:>9} {r['projected_encode_us']:>12}"
+        )
+
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Compare envelope serializers on Shopify shaped payloads: CPU time to parse the
+webhook body and serialize its envelope (the request path), time for a worker
+to deserialize it, and the encoded size.
+
+    python benchmarks/bench_serializers.py
+
+"json string" is the default (no --serializer) path: json.dumps of the envelope
+followed by Temporal's JSON converter encoding that string again. Serializers
+whose package is not installed are skipped.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from shopify_payloads import payloads
+from temporalio.converter import DefaultPayloadConverter
+
+from temporal_forwarder.envelope import WebhookPayloadConverter
+from temporal_forwarder.serialization import (
+    SERIALIZER_CLASSES,
+    SerializedEnvelope,
+    get_serializer,
+)
+
+HEADERS = {
+    "X-Shopify-Topic": "orders/create",
+    "X-Shopify-Shop-Domain": "example.myshopify.com",
+    "X-Shopify-Webhook-Id": "b54557e4-bdd9-4b37-8a5f-bf7d70bcd043",
+    "X-Webhook-Route": "shopify",
+}
+
+
+def json_string(body: bytes, iterations: int) -> dict:
+    converter = DefaultPayloadConverter()
+
+    start = time.process_time()
+    for _ in range(iterations):
+        value = json.dumps({"headers": HEADERS, "data": json.loads(body)})
+        [payload] = converter.to_payloads([value])
+    encode_time = (time.process_time() - start) / iterations
+
+    start = time.process_time()
+    for _ in range(iterations):
+        [value] = converter.from_payloads([payload], [str])
+        json.loads(value)
+    decode_time = (time.process_time() - start) / iterations
+
+    return result(payload, encode_time, decode_time)
+
+
+def serialized(name: str, body: bytes, iterations: int) -> dict:
+    serializer = get_serializer(name)
+    converter = WebhookPayloadConverter()
+
+    start = time.process_time()
+    for _ in range(iterations):
+        envelope = {"headers": HEADERS, "data": serializer.parse_json(body)}
+        [payload] = converter.to_payloads(
+            [SerializedEnvelope.serialize(serializer, envelope)]
+        )
+    encode_time = (time.process_time() - start) / iterations
+
+    start = time.process_time()
+    for _ in range(iterations):
+        converter.from_payloads([payload])
+    decode_time = (time.process_time() - start) / iterations
+
+    return result(payload, encode_time, decode_time)
+
+
+def result(payload, encode_time: float, decode_time: float) -> dict:
+    return {
+        "bytes": payload.ByteSize(),
+        "encode_us": round(encode_time * 1e6, 1),
+        "decode_us": round(decode_time * 1e6, 1),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--iterations", type=int, default=500)
+    p.add_argument("--json", dest="json_output", help="also write results to this file")
+    args = p.parse_args()
+
+    serializers = []
+    for name in SERIALIZER_CLASSES:
+        try:
+            get_serializer(name)
+            serializers.append(name)
+        except Exception as e:
+            print(f"Skipping {name}: {e}", file=sys.stderr)
+
+    results = []
+    for payload, body in payloads().items():
+        baseline = json_string(body, args.iterations)
+        results.append(baseline | {"payload": payload, "serializer": "json string"})
+        for name in serializers:
+            r = serialized(name, body, args.iterations)
+            results.append(r | {"payload": payload, "serializer": name})
+
+    print(f"{'payload':<24} {'serializer':<12} {'bytes':>9} {'enc us':>9} {'dec us':>9}")
+    for r in results:
+        print(
+            f"{r['payload']:<24} {r['serializer']:<12} {r['bytes']:>9} "
+            f"{r['encode_us']:>9} {r['decode_us']:>9}"
+        )
+
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
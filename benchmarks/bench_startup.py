@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Measure forwarder cold start: how long src/app.py takes to import, and how long
+after the process is spawned the first webhook is accepted (against an
+in-process fake Temporal frontend).
+
+    python benchmarks/bench_startup.py --runs 5 --json startup.json
+
+Each run is a fresh interpreter, as when an autoscaled container starts.
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+from fake_temporal import FakeTemporal, FakeWorkflowService
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+IMPORT_APP = (
+    "import sys, time; sys.path.insert(0, sys.argv[1]); t = time.perf_counter(); "
+    "import app; print(time.perf_counter() - t)"
+)
+
+
+def import_time() -> float:
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_APP, SRC])
+    return float(output)
+
+
+def slowest_imports(count: int = 10) -> list:
+    """
+    Modules imported directly by app.py with the largest cumulative import time
+    (from python -X importtime)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_APP, SRC],
+        capture_output=True,
+        text=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # modules are listed after everything they import, indented by depth
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            if name.strip() == "app":
+                break
+            modules = []  # imported by site or the -c command itself
+        elif depth == 1:
+            modules.append((int(cumulative) / 1000, name.strip()))
+    return [
+        {"module": name, "ms": round(ms, 1)}
+        for ms, name in sorted(modules, reverse=True)[:count]
+    ]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_request_time(endpoint: str, args) -> float:
+    """
+    Seconds from spawning the server until a webhook is accepted
+    """
+    port = free_port()
+    command = [
+        sys.executable,
+        os.path.join(SRC, "app.py"),
+        "--asgi",
+        "--host=127.0.0.1",
+        f"--port={port}",
+        "--cert=",
+        "--key=",
+        f"--endpoint={endpoint}",
+        "--forwarders=generic",
+    ]
+    if args.lazy_forwarders:
+        command.append("--lazy-forwarders")
+
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            while time.perf_counter() - started < args.timeout:
+                try:
+                    response = client.post(
+                        "/temporal/generic",
+                        content=b'{"id": 1}',
+                        headers={
+                            "Content-Type": "application/json",
+                            "X-Request-ID": str(uuid.uuid4()),
+                        },
+                    )
+                    if response.status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+        raise Exception(f"No webhook accepted within {args.timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def summary(samples: list[float]) -> dict:
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return None
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--timeout", type=float, default=30.0, help="seconds per server start")
+    p.add_argument(
+        "--lazy-forwarders",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="load forwarder plugins on their first request",
+    )
+    p.add_argument("--json", dest="json_output", help="write results to this file")
+    args = p.parse_args()
+
+    fake = FakeTemporal(FakeWorkflowService()).start()
+
+    imports = [import_time() for _ in range(args.runs)]
+    first_requests = [first_request_time(fake.endpoint, args) for _ in range(args.runs)]
+
+    results = [
+        {"name": "import app"} | summary(imports),
+        {"name": "first request"} | summary(first_requests),
+    ]
+    for result in results:
+        print(
+            f"{result['name']:<16} median {result['median_ms']:>8}ms "
+            f"min {result['min_ms']:>8}ms max {result['max_ms']:>8}ms"
+        )
+    slowest = slowest_imports()
+    print("slowest imports: " + ", ".join(f"{m['module']} {m['ms']}ms" for m in slowest))
+
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "settings": {
+                        k: v for k, v in vars(args).items() if k != "json_output"
+                    },
+                    "results": results,
+                    "slowest_imports": slowest,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Compare two bench_forwarder.py results files, exiting non-zero if any scenario
+regressed by more than the threshold (for CI).
+
+    python benchmarks/compare.py baseline.json results.json --threshold 10
+"""
+
+import argparse
+import json
+import sys
+
+# metric -> True if higher is better
+METRICS = {"rps": True, "p50_ms": False, "p99_ms": False, "cpu_us_per_request": False}
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        results = json.load(f)
+    return {(r["forwarder"], r["payload"]): r for r in results["results"]}
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("baseline")
+    p.add_argument("current")
+    p.add_argument(
+        "--threshold", type=float, default=10.0, help="allowed regression (percent)"
+    )
+    p.add_argument("--metrics", nargs="+", choices=METRICS, default=list(METRICS))
+    args = p.parse_args()
+
+    baseline, current = load(args.baseline), load(args.current)
+
+    regressions = []
+    print(
+        f"{'scenario':<34} {'metric':<20} {'baseline':>10} {'current':>10} {'change':>8}"
+    )
+    for scenario, result in current.items():
+        before = baseline.get(scenario)
+        if not before:
+            continue
+        for metric in args.metrics:
+            old, new = before[metric], result[metric]
+            change = 100 * (new - old) / old if old else 0.0
+            worse = -change if METRICS[metric] else change
+            flag = ""
+            if worse > args.threshold:
+                regressions.append((scenario, metric))
+                flag = " REGRESSED"
+            print(
+                f"{' '.join(scenario):<34} {metric:<20} {old:>10} {new:>10} "
+                f"{change:>+7.1f}%{flag}"
+            )
+
+    if regressions:
+        print(f"{len(regressions)} metrics regressed by more than {args.threshold}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+In-process stand-in for the Temporal frontend's gRPC WorkflowService, with
+injectable latency and error rates, for benchmarking the forwarder without a
+Temporal cluster. Workflow starts are acknowledged (and counted) but go nowhere.
+
+Requires the 'grpcio' package.
+"""
+
+import asyncio
+import random
+import threading
+import uuid
+
+import grpc
+from google.protobuf.any_pb2 import Any
+from temporalio.api.common.v1 import GrpcStatus
+from temporalio.api.errordetails.v1 import WorkflowExecutionAlreadyStartedFailure
+from temporalio.api.workflowservice.v1 import request_response_pb2 as workflowservice
+from temporalio.api.workflowservice.v1 import service_pb2_grpc
+from temporalio.bridge.proto.health.v1 import health_pb2
+
+
+class FakeWorkflowService(service_pb2_grpc.WorkflowServiceServicer):
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.started = 0
+        self.failed = 0
+        self.workflow_ids = set()
+        self._random = random.Random(seed)
+
+    async def _respond(self, context):
+        delay = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.failed += 1
+            await context.abort(grpc.StatusCode.UNAVAILABLE, "injected failure")
+
+    async def GetSystemInfo(self, request, context):
+        return workflowservice.GetSystemInfoResponse(server_version="fake")
+
+    async def StartWorkflowExecution(self, request, context):
+        await self._respond(context)
+        if request.workflow_id in self.workflow_ids:
+            await _abort_already_started(context)
+        self.workflow_ids.add(request.workflow_id)
+        self.started += 1
+        return workflowservice.StartWorkflowExecutionResponse(
+            run_id=str(uuid.uuid4()), started=True
+        )
+
+    async def SignalWithStartWorkflowExecution(self, request, context):
+        await self._respond(context)
+        self.started += 1
+        return workflowservice.SignalWithStartWorkflowExecutionResponse(
+            run_id=str(uuid.uuid4()), started=True
+        )
+
+
+async def _abort_already_started(context):
+    # the status details let the client raise WorkflowAlreadyStartedError
+    details = Any()
+    details.Pack(WorkflowExecutionAlreadyStartedFailure())
+    status = GrpcStatus(
+        code=grpc.StatusCode.ALREADY_EXISTS.value[0],
+        message="workflow already started",
+        details=[details],
+    )
+    context.set_trailing_metadata(
+        (("grpc-status-details-bin", status.SerializeToString()),)
+    )
+    await context.abort(grpc.StatusCode.ALREADY_EXISTS, status.message)
+
+
+async def _health_check(request, context):
+    return health_pb2.HealthCheckResponse(status=health_pb2.HealthCheckResponse.SERVING)
+
+
+def _health_handler() -> grpc.GenericRpcHandler:
+    return grpc.method_handlers_generic_handler(
+        "grpc.health.v1.Health",
+        {
+            "Check": grpc.unary_unary_rpc_method_handler(
+                _health_check,
+                request_deserializer=health_pb2.HealthCheckRequest.FromString,
+                response_serializer=health_pb2.HealthCheckResponse.SerializeToString,
+            )
+        },
+    )
+
+
+class FakeTemporal:
+    """
+    Serves a FakeWorkflowService on its own event loop in a daemon thread (for
+    the life of the process)
+    """
+
+    def __init__(self, service: FakeWorkflowService, host: str = "127.0.0.1"):
+        self.service = service
+        self._host = host
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self.port = None
+
+    @property
+    def endpoint(self) -> str:
+        return f"{self._host}:{self.port}"
+
+    async def _serve(self):
+        self._server = grpc.aio.server()
+        service_pb2_grpc.add_WorkflowServiceServicer_to_server(self.service, self._server)
+        self._server.add_generic_rpc_handlers([_health_handler()])
+        self.port = self._server.add_insecure_port(f"{self._host}:0")
+        await self._server.start()
+        self._ready.set()
+        await self._server.wait_for_termination()
+
+    def start(self) -> "FakeTemporal":
+        thread = threading.Thread(
+            target=self._loop.run_until_complete,
+            args=(self._serve(),),
+            name="fake-temporal",
+            daemon=True,
+        )
+        thread.start()
+        self._ready.wait()
+        return self
@@ -0,0 +1,218 @@
+"""
+Synthetic Shopify webhook payloads shaped like real orders/* and products/* bodies
+(field names and value types follow Shopify's Admin REST API webhook examples).
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import random
+
+# approximate body sizes seen in practice, from a single item order up to a
+# large catalog product with many variants
+SIZES = {"small": 2, "medium": 20, "large": 150}
+
+
+def _address(rnd: random.Random) -> dict:
+    return {
+        "first_name": rnd.choice(["Jane", "John", "Bob", "Alice"]),
+        "last_name": rnd.choice(["Smith", "Norman", "Doe", "Lee"]),
+        "address1": f"{rnd.randint(1, 9999)} {rnd.choice(['Main', 'Oak', 'Pine'])} St",
+        "address2": "",
+        "city": rnd.choice(["Ottawa", "Portland", "Austin"]),
+        "province": rnd.choice(["Ontario", "Oregon", "Texas"]),
+        "country": rnd.choice(["Canada", "United States"]),
+        "zip": f"{rnd.randint(10000, 99999)}",
+        "phone": f"555-{rnd.randint(100, 999)}-{rnd.randint(1000, 9999)}",
+        "company": None,
+        "latitude": round(rnd.uniform(-90, 90), 6),
+        "longitude": round(rnd.uniform(-180, 180), 6),
+        "country_code": rnd.choice(["CA", "US"]),
+        "province_code": rnd.choice(["ON", "OR", "TX"]),
+    }
+
+
+def _money(amount: float) -> dict:
+    value = f"{amount:.2f}"
+    return {
+        "shop_money": {"amount": value, "currency_code": "USD"},
+        "presentment_money": {"amount": value, "currency_code": "USD"},
+    }
+
+
+def _line_item(rnd: random.Random, i: int) -> dict:
+    price = round(rnd.uniform(5, 500), 2)
+    return {
+        "id": 466157049 + i,
+        "admin_graphql_api_id": f"gid://shopify/LineItem/{466157049 + i}",
+        "fulfillable_quantity": 1,
+        "fulfillment_service": "manual",
+        "fulfillment_status": None,
+        "gift_card": False,
+        "grams": rnd.randint(100, 5000),
+        "name": f"IPod Nano - {rnd.choice(['8gb', '16gb', '32gb'])}",
+        "price": f"{price:.2f}",
+        "price_set": _money(price),
+        "product_exists": True,
+        "product_id": 632910392 + i,
+        "properties": [],
+        "quantity": rnd.randint(1, 5),
+        "requires_shipping": True,
+        "sku": f"IPOD-{rnd.randint(1000, 9999)}",
+        "taxable": True,
+        "title": "IPod Nano",
+        "total_discount": "0.00",
+        "total_discount_set": _money(0),
+        "variant_id": 808950810 + i,
+        "variant_inventory_management": "shopify",
+        "variant_title": rnd.choice(["green", "pink", "black"]),
+        "vendor": "Apple",
+        "tax_lines": [{"price": f"{price * 0.13:.2f}", "rate": 0.13, "title": "HST"}],
+        "duties": [],
+        "discount_allocations": [],
+    }
+
+
+def order(line_items: int, seed: int = 0) -> dict:
+    rnd = random.Random(seed)
+    items = [_line_item(rnd, i) for i in range(line_items)]
+    total = sum(float(item["price"]) * item["quantity"] for item in items)
+    return {
+        "id": 820982911946154508 + seed,
+        "admin_graphql_api_id": f"gid://shopify/Order/{820982911946154508 + seed}",
+        "app_id": None,
+        "browser_ip": f"216.191.105.{rnd.randint(1, 254)}",
+        "buyer_accepts_marketing": rnd.choice([True, False]),
+        "cancel_reason": None,
+        "cancelled_at": None,
+        "cart_token": None,
+        "checkout_token": None,
+        "confirmation_number": None,
+        "confirmed": True,
+        "contact_email": "jon@example.com",
+        "created_at": "2021-12-31T19:00:00-05:00",
+        "currency": "USD",
+        "current_subtotal_price": f"{total:.2f}",
+        "current_subtotal_price_set": _money(total),
+        "current_total_price": f"{total * 1.13:.2f}",
+        "current_total_price_set": _money(total * 1.13),
+        "email": "jon@example.com",
+        "financial_status": "voided",
+        "fulfillment_status": "pending",
+        "landing_site": None,
+        "name": f"#{9999 + seed}",
+        "note": None,
+        "note_attributes": [],
+        "order_number": 1234 + seed,
+        "payment_gateway_names": ["visa", "bogus"],
+        "phone": None,
+        "presentment_currency": "USD",
+        "processed_at": "2021-12-31T19:00:00-05:00",
+        "subtotal_price": f"{total:.2f}",
+        "tags": "tag1, tag2",
+        "tax_lines": [],
+        "taxes_included": False,
+        "test": True,
+        "total_price": f"{total * 1.13:.2f}",
+        "total_weight": sum(item["grams"] for item in items),
+        "updated_at": "2021-12-31T19:00:00-05:00",
+        "billing_address": _address(rnd),
+        "customer": {
+            "id": 115310627314723954 + seed,
+            "email": "john@example.com",
+            "first_name": "John",
+            "last_name": "Smith",
+            "state": "disabled",
+            "verified_email": True,
+            "tax_exempt": False,
+            "default_address": _address(rnd),
+        },
+        "discount_applications": [],
+        "fulfillments": [],
+        "line_items": items,
+        "refunds": [],
+        "shipping_address": _address(rnd),
+        "shipping_lines": [
+            {
+                "id": 271878346596884015,
+                "code": None,
+                "price": "10.00",
+                "price_set": _money(10),
+                "source": "shopify",
+                "title": "Generic Shipping",
+                "tax_lines": [],
+            }
+        ],
+    }
+
+
+def product(variants: int, seed: int = 0) -> dict:
+    rnd = random.Random(seed)
+    return {
+        "id": 788032119674292922 + seed,
+        "title": "Example T-Shirt",
+        "body_html": "<p>An example T-Shirt</p>" * 10,
+        "vendor": "Acme",
+        "product_type": "Shirts",
+        "created_at": None,
+        "handle": "example-t-shirt",
+        "updated_at": "2021-12-31T19:00:00-05:00",
+        "published_at": "2021-12-31T19:00:00-05:00",
+        "template_suffix": None,
+        "status": "active",
+        "published_scope": "web",
+        "tags": "example, mens, t-shirt",
+        "admin_graphql_api_id": f"gid://shopify/Product/{788032119674292922 + seed}",
+        "variants": [
+            {
+                "id": 642667041472713922 + i,
+                "product_id": 788032119674292922 + seed,
+                "title": f"{rnd.choice(['Small', 'Medium', 'Large'])} / Color {i}",
+                "price": f"{rnd.uniform(10, 50):.2f}",
+                "sku": f"EXAMPLE-SHIRT-{i}",
+                "position": i,
+                "inventory_policy": "deny",
+                "compare_at_price": f"{rnd.uniform(50, 60):.2f}",
+                "fulfillment_service": "manual",
+                "inventory_management": "shopify",
+                "option1": rnd.choice(["Small", "Medium", "Large"]),
+                "option2": f"Color {i}",
+                "option3": None,
+                "taxable": True,
+                "barcode": None,
+                "grams": rnd.randint(100, 500),
+                "weight": round(rnd.uniform(0.1, 1.0), 2),
+                "weight_unit": "kg",
+                "inventory_item_id": 107 + i,
+                "inventory_quantity": rnd.randint(0, 100),
+                "requires_shipping": True,
+                "admin_graphql_api_id": f"gid://shopify/ProductVariant/{642667041472713922 + i}",
+            }
+            for i in range(variants)
+        ],
+        "options": [
+            {"name": "Title", "position": 1, "values": ["Small", "Medium", "Large"]}
+        ],
+        "images": [],
+        "image": None,
+    }
+
+
+def payloads() -> dict:
+    """
+    JSON bodies keyed by "<topic> <size>"
+    """
+    bodies = {}
+    for size, count in SIZES.items():
+        bodies[f"orders/create {size}"] = json.dumps(order(count)).encode()
+        bodies[f"products/update {size}"] = json.dumps(product(count)).encode()
+    return bodies
+
+
+def sign(body: bytes, secret: str) -> str:
+    """
+    Shopify X-Shopify-Hmac-SHA256 header value for the body
+    """
+    digest = hmac.new(secret.encode("utf-8"), body, digestmod=hashlib.sha256).digest()
+    return base64.b64encode(digest).decode()
@@ -2,14 +2,15 @@
 
 import logging
 import argparse
-import asyncio
 import os
 import sys
 
-import uvloop
-
+# only lightweight modules are imported before the command line is parsed, with
+# Flask, temporalio and cryptography imported once the app and services start
 from temporal_forwarder import *
+from temporal_forwarder.logs import configure_logging
 from temporal_forwarder.plugins import WEBHOOK_FORWARDERS, register_plugins
+from temporal_forwarder.server import DEFAULT_GRACEFUL_TIMEOUT, DEFAULT_KEEP_ALIVE, serve
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 LOG = logging.getLogger()
@@ -37,16 +38,20 @@ def env_help():
                 if details:
                     help += " (" + "; ".join(details) + ")"
                 help += "\n"
+    return help
 
 
-# async def main(cfg: DictConfig):
-async def main():
+# def main(cfg: DictConfig):
+def main():
     p = argparse.ArgumentParser(
         description="Shopify webhook callbacks to Temporal workflow forwarder",
         epilog=(
             "Environment variables:\n"
             + f"AES_KEY - hex string for AES key used to encerypt payloads passed into Temporal (recommended)\n"
             + f"AES_KEY_ID - name/id passed to workers to select correct key to decrypt (recommended)\n"
+            + f"AES_KEYS - comma separated id:hex keys workers may still decrypt with (key rotation)\n"
+            + f"AES_KEYS_FILE - JSON key ring file, reloaded when changed (overrides AES_KEY/AES_KEYS)\n"
+            + f"WEBHOOK_ID_KEY - secret key for content-addressed workflow ids (routes with id_strategy content)\n"
             + f"TEMPORAL_ENDPOINT - Temporal endpoint  messages should be routed (overrides {Config.temporal_endpoint})\n"
             + f"TEMPORAL_NAMESPACE - Temporal namespace to use (overrides {Config.temporal_namespace})\n"
         ),
@@ -74,17 +79,212 @@ async def main():
         help=f"validate webhook data with Shopify SHA256 HMAC",
     )
 
+    p.add_argument(
+        "--forwarders",
+        default=os.environ.get("FORWARDERS", Config.forwarders),
+        help="comma separated forwarder plugins to enable (built-in or installed entry points)",
+    )
+    p.add_argument(
+        "--lazy-forwarders",
+        dest="lazy_forwarders",
+        default=Config.lazy_forwarders,
+        action=argparse.BooleanOptionalAction,
+        help="load forwarder plugins on their first request instead of at startup",
+    )
+
+    p.add_argument(
+        "--routes",
+        dest="routes_file",
+        default=os.environ.get("ROUTES_FILE", Config.routes_file),
+        help="JSON file of rules routing webhooks to task queues (reloaded when changed)",
+    )
+
+    p.add_argument(
+        "--fanout-policy",
+        dest="fanout_policy",
+        choices=[FANOUT_ALL, FANOUT_QUORUM],
+        default=Config.fanout_policy,
+        help="destinations a fanned out webhook must start on before acknowledging it",
+    )
+
+    p.add_argument(
+        "--envelope",
+        choices=[ENVELOPE_JSON, ENVELOPE_PASSTHROUGH],
+        default=Config.envelope,
+        help="webhook payload format (passthrough forwards raw bodies without parsing)",
+    )
+
+    p.add_argument(
+        "--serializer",
+        choices=["json", "orjson", "msgpack"],
+        default=os.environ.get("ENVELOPE_SERIALIZER", Config.serializer),
+        help="serialize webhook envelopes once into the Temporal payload (unset = JSON string argument)",
+    )
+
+    p.add_argument(
+        "--max-body-size",
+        dest="max_body_size",
+        type=int,
+        default=Config.max_body_size,
+        help="reject webhook bodies larger than this many bytes",
+    )
+
+    p.add_argument(
+        "--compression",
+        choices=["zlib", "zstd"],
+        default=os.environ.get("PAYLOAD_COMPRESSION", Config.compression),
+        help="compress payloads (before encryption) passed into Temporal",
+    )
+    p.add_argument(
+        "--compression-threshold",
+        dest="compression_threshold",
+        type=int,
+        default=Config.compression_threshold,
+        help="only compress payloads of at least this many bytes",
+    )
+
+    p.add_argument(
+        "--claim-check-store",
+        dest="claim_check_store",
+        default=os.environ.get("CLAIM_CHECK_STORE", Config.claim_check_store),
+        help="directory or s3:// URL to store oversized payloads in (claim-check)",
+    )
+    p.add_argument(
+        "--claim-check-threshold",
+        dest="claim_check_threshold",
+        type=int,
+        default=Config.claim_check_threshold,
+        help="only claim-check payloads of at least this many bytes",
+    )
+
+    p.add_argument(
+        "--dedupe-entries",
+        dest="dedupe_entries",
+        type=int,
+        default=Config.dedupe_entries,
+        help="number of recently accepted webhook ids to acknowledge retries of (0 = off)",
+    )
+    p.add_argument(
+        "--dedupe-path",
+        dest="dedupe_path",
+        default=os.environ.get("DEDUPE_PATH", Config.dedupe_path),
+        help="SQLite file persisting accepted webhook ids across restarts",
+    )
+
+    p.add_argument(
+        "--spool-dir",
+        dest="spool_dir",
+        default=os.environ.get("SPOOL_DIR", Config.spool_dir),
+        help="durably spool webhooks to this directory and ack before Temporal responds",
+    )
+    p.add_argument(
+        "--spool-concurrency",
+        dest="spool_concurrency",
+        type=int,
+        default=Config.spool_concurrency,
+        help="max concurrent workflow starts when draining the spool",
+    )
+    p.add_argument(
+        "--spool-fsync",
+        dest="spool_fsync",
+        default=Config.spool_fsync,
+        action=argparse.BooleanOptionalAction,
+        help="fsync each spooled webhook before acknowledging it",
+    )
+
+    p.add_argument(
+        "--max-inflight-starts",
+        dest="max_inflight_starts",
+        type=int,
+        default=Config.max_inflight_starts,
+        help="max concurrent workflow starts per Temporal destination (0 = unlimited)",
+    )
+
+    p.add_argument(
+        "--max-concurrent-webhooks",
+        dest="max_concurrent_webhooks",
+        type=int,
+        default=Config.max_concurrent_webhooks,
+        help="max concurrent webhooks per forwarder, adaptively lowered when Temporal slows down (0 = unlimited)",
+    )
+    p.add_argument(
+        "--admission-target-latency",
+        dest="admission_target_latency",
+        type=float,
+        default=Config.admission_target_latency,
+        help="seconds a workflow start may take before the concurrency limit is lowered",
+    )
+
+    p.add_argument(
+        "--asgi",
+        dest="asgi",
+        default=False,
+        action=argparse.BooleanOptionalAction,
+        help="serve with the production ASGI server (instead of Flask's dev server)",
+    )
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of ASGI worker processes (sharing the port with SO_REUSEPORT)",
+    )
+    p.add_argument(
+        "--request-threads",
+        dest="request_threads",
+        type=int,
+        default=Config.request_threads,
+        help="max ASGI requests in flight per worker process",
+    )
+    p.add_argument(
+        "--keep-alive",
+        dest="keep_alive",
+        type=int,
+        default=DEFAULT_KEEP_ALIVE,
+        help="seconds to keep idle ASGI client connections open",
+    )
+    p.add_argument(
+        "--graceful-timeout",
+        dest="graceful_timeout",
+        type=int,
+        default=DEFAULT_GRACEFUL_TIMEOUT,
+        help="seconds to drain in-flight ASGI requests after SIGTERM",
+    )
+
     p.add_argument(
         "--help-env-vars",
         dest="help_env_vars",
         help="display environment vars used by configured plugins",
-        default=False,
+        action="store_true",
+    )
+    p.add_argument(
+        "--log-format",
+        dest="log_format",
+        choices=["text", "json"],
+        default=os.environ.get("LOG_FORMAT", Config.log_format),
+        help="log as plain text or one JSON object per line",
+    )
+    p.add_argument(
+        "--log-payloads",
+        dest="log_payload_sample_rate",
+        type=float,
+        default=Config.log_payload_sample_rate,
+        help="fraction (0-1) of webhook payloads to log, redacted and truncated",
+    )
+    p.add_argument(
+        "--log-payload-max-bytes",
+        dest="log_payload_max_bytes",
+        type=int,
+        default=Config.log_payload_max_bytes,
+        help="truncate logged payloads to this many bytes",
     )
     p.add_argument("-d", "--debug", action="store_true", help="verbose logging")
     args = p.parse_args()
 
-    if args.debug:
-        logging.getLogger().setLevel(level=logging.DEBUG)
+    # log through a background thread, so requests never block on log output
+    Config.log_format = args.log_format
+    Config.log_payload_sample_rate = args.log_payload_sample_rate
+    Config.log_payload_max_bytes = args.log_payload_max_bytes
+    configure_logging(Config, logging.DEBUG if args.debug else logging.INFO)
 
     Config.ssl_cert = args.cert
     Config.ssl_key = args.key
@@ -97,8 +297,31 @@ async def main():
     Config.global_task_queue = args.global_queue
     Config.validate_hmac = args.validate_hmac
 
-    # app must be created first so that env vars for configured forwarders can be displayed in help
-    app = create_app(Config)
+    Config.forwarders = args.forwarders
+    Config.lazy_forwarders = args.lazy_forwarders and not args.help_env_vars
+    Config.routes_file = args.routes_file
+    Config.fanout_policy = args.fanout_policy
+    Config.webhook_id_key = os.environ.get("WEBHOOK_ID_KEY", Config.webhook_id_key)
+    Config.envelope = args.envelope
+    Config.serializer = args.serializer
+    Config.max_body_size = args.max_body_size
+
+    Config.compression = args.compression
+    Config.compression_threshold = args.compression_threshold
+    Config.claim_check_store = args.claim_check_store
+    Config.claim_check_threshold = args.claim_check_threshold
+
+    Config.dedupe_entries = args.dedupe_entries
+    Config.dedupe_path = args.dedupe_path
+
+    Config.spool_dir = args.spool_dir
+    Config.spool_concurrency = args.spool_concurrency
+    Config.spool_fsync = args.spool_fsync
+    Config.max_inflight_starts = args.max_inflight_starts
+    Config.max_concurrent_webhooks = args.max_concurrent_webhooks
+    Config.admission_target_latency = args.admission_target_latency
+    Config.request_threads = args.request_threads
+
     register_plugins(Config)
 
     # display help for any environment variables needed by forwarding plugins
@@ -106,20 +329,36 @@ async def main():
         print(env_help())
         sys.exit(1)
 
+    app = create_app(Config)
+
+    if args.asgi:
+        # each worker process starts its own services on its own event loop
+        serve(
+            app,
+            Config,
+            args.host,
+            args.port,
+            workers=args.workers,
+            keep_alive=args.keep_alive,
+            graceful_timeout=args.graceful_timeout,
+        )
+        return
+
+    from temporal_forwarder.background import run_in_background
+    from temporal_forwarder.services import start_services
+
+    run_in_background(start_services(Config, WEBHOOK_FORWARDERS)).result()
+
     # run Flask app until complete
-    await app.run(
+    app.run(
         host=args.host,
         port=args.port,
         debug=True,
+        # the reloader forks a second process which could not lock the spool
+        use_reloader=not Config.spool_dir,
         ssl_context=(Config.ssl_cert, Config.ssl_key),
     )
 
 
 if __name__ == "__main__":
-    # use high-performance uvloop event loop
-    if sys.version_info >= (3, 11):
-        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
-            runner.run(main())
-    else:
-        uvloop.install()
-        asyncio.run(main())
+    main()
@@ -1,17 +1,29 @@
 import logging
 from dataclasses import dataclass
 
-from flask import Flask
-
 LOG = logging.getLogger()
 
 DEFAULT_TEMPORAL_ENDPOINT = "localhost:7233"
 
+# webhook payload formats passed to Temporal
+ENVELOPE_JSON = "json"  # {"headers": ..., "data": ...} JSON document
+ENVELOPE_PASSTHROUGH = "passthrough"  # raw body with headers in payload metadata
+
+# workflow starts required for a webhook fanned out to several destinations
+FANOUT_ALL = "all"
+FANOUT_QUORUM = "quorum"  # a majority of destinations
+
+# workflow id strategies (TemporalDestination.id_strategy)
+ID_CONTENT = "content"  # keyed BLAKE2 hash of the request (see WebhookCall.content_id)
+
 
 def create_app(config):
     """
     Create the Flask app (also used for functional tests)
     """
+    # imported here so the command line can be parsed without importing Flask
+    from flask import Flask
+
     app = Flask(__name__)
 
     with app.app_context():
@@ -36,14 +48,61 @@ class Config:
     ssl_key: str = "privkey.pem"
     fail_on_fatal: bool = True
     encoding: str = "utf-8"
+    spool_dir: str = None  # durable local spool (disabled unless set)
+    spool_fsync: bool = True
+    spool_concurrency: int = 16
+    spool_adopt_dirs: tuple = ()  # spools of workers that no longer exist, to drain
+    max_inflight_starts: int = 0  # per destination dispatcher limit (0 = disabled)
+    health_probe_interval: float = 5.0  # seconds between Temporal health probes
+    min_start_budget: float = 0.25  # seconds of deadline needed to attempt a start
+    envelope: str = ENVELOPE_JSON
+    serializer: str = None  # json, orjson, msgpack envelopes (None = JSON string)
+    max_body_size: int = 10 * 1024 * 1024  # larger webhooks are rejected (413)
+    body_spill_threshold: int = 1024 * 1024  # larger bodies are buffered on disk
+    dedupe_entries: int = 0  # recently accepted webhook ids (0 = disabled)
+    dedupe_ttl: float = 48 * 60 * 60  # covers Shopify's 48 hour retry schedule
+    dedupe_path: str = None  # SQLite file persisting accepted ids across restarts
+    compression: str = None  # payload compression: zlib, zstd (or None)
+    compression_threshold: int = 1024  # smaller payloads are not compressed
+    crypto_offload_threshold: int = 256 * 1024  # larger payloads encrypted off the loop
+    crypto_threads: int = None  # thread pool size for off-loop encryption (None = CPUs)
+    claim_check_store: str = None  # blob store URL for oversized payloads (or None)
+    claim_check_threshold: int = 256 * 1024  # larger payloads are claim-checked
+    fanout_policy: str = FANOUT_ALL
+    webhook_id_key: str = None  # secret key for content-addressed workflow ids
+    max_concurrent_webhooks: int = 0  # per forwarder admission limit (0 = unlimited)
+    admission_target_latency: float = 1.0  # slower workflow starts reduce the limit
+    routes_file: str = None  # JSON routing rules (reloaded when changed)
+    forwarders: str = "shopify"  # comma separated slugs of the forwarders to enable
+    lazy_forwarders: bool = False  # load forwarders on their first request
+    request_threads: int = 64  # ASGI requests in flight per worker process
+    metrics_dir: str = None  # metrics shared across worker processes (or None)
+    log_format: str = "text"  # text or json
+    log_payload_sample_rate: float = 0.0  # fraction of payloads logged (redacted)
+    log_payload_max_bytes: int = 1024  # logged payloads are truncated to this size
 
 
-@dataclass
+# immutable, so a single instance can be shared by every request routed to it
+@dataclass(frozen=True)
 class TemporalDestination:
     endpoint: str = DEFAULT_TEMPORAL_ENDPOINT
     namespace: str = "default"
     workflow_type: str = None
     task_queue: str = "temporal_webhook_gateway"
+    # signal-with-start: webhooks for the same resource (e.g. an order) are
+    # signalled to one long-running workflow, instead of each starting a workflow
+    signal: str = None  # signal name (None = start a workflow per webhook)
+    resource_key: str = None  # "header:<name>" or JSON body path, e.g. "order_id"
+    # micro-batching: high-volume webhooks are started as one workflow per batch
+    # of up to batch_size webhooks, waiting at most batch_wait_ms for a batch to fill
+    batch_size: int = None  # webhooks per batch (None = start a workflow per webhook)
+    batch_wait_ms: int = None
+    # content-addressed workflow ids, so identical retries of webhooks without an
+    # idempotency id (e.g. generic webhooks) start the same workflow
+    id_strategy: str = None  # "content" (None = the webhook's own id)
+    id_headers: str = None  # comma separated headers included in content ids
+    # seconds in each time bucket of content ids (None = no buckets)
+    id_window: int | None = None
 
 
 # environment variable description for documentation/auto-configuration
@@ -0,0 +1,127 @@
+"""
+Admission control for webhook requests.
+
+Each forwarder admits a limited number of concurrent requests, and requests
+past the limit are shed immediately with a 503 and Retry-After, leaving the
+sender's retry schedule (e.g. Shopify retries for 48 hours) to absorb the
+overload. Otherwise, when Temporal slows down, requests pile up until all of
+them miss their deadline together.
+
+The limit adapts to the observed workflow start latency (AIMD): it grows by
+about one for every limit requests that start within the target latency, and
+is cut multiplicatively whenever starts are slower than the target.
+"""
+
+import logging
+import threading
+import time
+
+LOG = logging.getLogger()
+
+DEFAULT_MIN_LIMIT = 4
+DEFAULT_BACKOFF = 0.9  # limit multiplier when starts are slower than the target
+
+ADMISSION = None
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit between min_limit and max_limit (starting at max_limit)
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        target_latency: float,
+        min_limit: int = DEFAULT_MIN_LIMIT,
+        backoff: float = DEFAULT_BACKOFF,
+    ):
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.limit = float(max_limit)
+        self.inflight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()  # the Flask dev server runs requests in threads
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.inflight >= int(self.limit):
+                self.rejected += 1
+                return False
+            self.inflight += 1
+            self.admitted += 1
+            return True
+
+    def release(self, latency: float = None):
+        """
+        Release an admitted request, adapting the limit to how long its workflow
+        start took (None if the request did not start a workflow)
+        """
+        with self._lock:
+            inflight = self.inflight
+            self.inflight -= 1
+            if latency is None:
+                return
+
+            if latency > self.target_latency:
+                # requests already in flight report the same slowdown, so only
+                # decrease once per target latency
+                now = time.monotonic()
+                if now - self._last_decrease >= self.target_latency:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = now
+            elif inflight >= self.limit / 2:
+                # only grow a limit that is actually being used
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 1),
+            "inflight": self.inflight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+class AdmissionController:
+    """
+    An adaptive limiter per forwarder
+    """
+
+    def __init__(self, max_limit: int, target_latency: float):
+        self._max_limit = max_limit
+        self._target_latency = target_latency
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, slug: str) -> AdaptiveLimiter:
+        limiter = self._limiters.get(slug)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.setdefault(
+                    slug, AdaptiveLimiter(self._max_limit, self._target_latency)
+                )
+        return limiter
+
+    def stats(self) -> dict:
+        return {slug: limiter.stats() for slug, limiter in list(self._limiters.items())}
+
+
+def get_admission() -> AdmissionController:
+    return ADMISSION
+
+
+def start_admission(config) -> AdmissionController:
+    """
+    Enable admission control unless config.max_concurrent_webhooks is 0
+    """
+    global ADMISSION
+    if config.max_concurrent_webhooks > 0 and not ADMISSION:
+        ADMISSION = AdmissionController(
+            config.max_concurrent_webhooks, config.admission_target_latency
+        )
+    return ADMISSION
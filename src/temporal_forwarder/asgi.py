@@ -0,0 +1,209 @@
+"""
+ASGI entry point for production serving.
+
+The Flask app is wrapped in a small WSGI to ASGI adapter (modelled on asgiref's
+WsgiToAsgi) which runs the sync parts of each request in a thread, while Flask's
+async views are scheduled back onto the server's event loop by asgiref. Unlike
+asgiref's adapter, which runs every request in one shared thread (allowing only
+one request in flight), requests run in a pool of config.request_threads threads.
+Only asgiref's public sync_to_async/async_to_sync API is used. All requests and
+background services therefore share one long-lived (uvloop) event loop per
+process, instead of Flask creating a temporary event loop for each request.
+
+Request bodies are received before the app runs (spilling large bodies to disk),
+and a body over config.max_body_size is rejected (413) as soon as its
+Content-Length or the bytes received so far exceed it, without reading the rest.
+"""
+
+import logging
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from tempfile import SpooledTemporaryFile
+
+from asgiref.sync import async_to_sync, sync_to_async
+
+from .background import set_background_loop
+from .plugins import WEBHOOK_FORWARDERS
+from .services import start_services, stop_services
+
+LOG = logging.getLogger()
+
+
+def build_environ(scope: dict, body) -> dict:
+    """
+    WSGI environ for an ASGI HTTP scope and its (buffered) request body
+    """
+    script_name = scope.get("root_path", "").encode("utf8").decode("latin1")
+    path_info = scope["path"].encode("utf8").decode("latin1")
+    if path_info.startswith(script_name):
+        path_info = path_info[len(script_name) :]
+
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": script_name,
+        "PATH_INFO": path_info,
+        "QUERY_STRING": scope["query_string"].decode("ascii"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin1")
+        if name == "content-length":
+            key = "CONTENT_LENGTH"
+        elif name == "content-type":
+            key = "CONTENT_TYPE"
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        value = value.decode("latin1")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class _WsgiRequest:
+    """
+    A single request to the WSGI app, run on a thread of the request pool
+    """
+
+    def __init__(self, wsgi_application, config, executor: ThreadPoolExecutor):
+        self._app = wsgi_application
+        self._config = config
+        self._executor = executor
+        self._response_start = None
+        self._started = False
+        self._send = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            raise ValueError(f"Unsupported ASGI scope {scope['type']}")
+
+        max_size = self._config.max_body_size
+        content_length = dict(scope.get("headers", [])).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > max_size:
+            await _too_large(send, f"Content-Length {int(content_length)}", max_size)
+            return
+
+        with SpooledTemporaryFile(max_size=self._config.body_spill_threshold) as body:
+            size = 0
+            while True:
+                message = await receive()
+                if message["type"] != "http.request":
+                    return  # client disconnected
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size > max_size:
+                    await _too_large(send, "Body", max_size)
+                    return
+                body.write(chunk)
+                if not message.get("more_body"):
+                    break
+            body.seek(0)
+
+            self._send = async_to_sync(send)  # callable from the request thread
+            run = sync_to_async(
+                self._run, thread_sensitive=False, executor=self._executor
+            )
+            await run(build_environ(scope, body))
+
+    def _start_response(self, status: str, headers: list, exc_info=None):
+        # an error response can only replace a response that has not been sent
+        if exc_info and self._started:
+            raise exc_info[1].with_traceback(exc_info[2])
+        self._response_start = {
+            "type": "http.response.start",
+            "status": int(status.split(" ", 1)[0]),
+            "headers": [
+                (name.lower().encode("latin1"), value.encode("latin1"))
+                for name, value in headers
+            ],
+        }
+
+    def _run(self, environ: dict):
+        response = self._app(environ, self._start_response)
+        try:
+            for chunk in response:
+                if not self._started:
+                    self._send(self._response_start)
+                    self._started = True
+                if chunk:
+                    self._send(
+                        {"type": "http.response.body", "body": chunk, "more_body": True}
+                    )
+            if not self._started:
+                self._send(self._response_start)
+                self._started = True
+            self._send({"type": "http.response.body"})
+        finally:
+            if hasattr(response, "close"):
+                response.close()
+
+
+async def _too_large(send, what: str, max_size: int):
+    msg = f"{what} exceeds {max_size} bytes"
+    LOG.error(f"Request too large ({msg}) – DROPPING")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": HTTPStatus.REQUEST_ENTITY_TOO_LARGE.value,
+            "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+        }
+    )
+    await send({"type": "http.response.body", "body": msg.encode()})
+
+
+class ForwarderASGIApp:
+    def __init__(self, flask_app, config, forwarders: dict):
+        self._config = config
+        self._forwarders = forwarders
+        self._flask_app = flask_app
+        self._executor = ThreadPoolExecutor(
+            config.request_threads, thread_name_prefix="request"
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        else:
+            await _WsgiRequest(self._flask_app, self._config, self._executor)(
+                scope, receive, send
+            )
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    # background services share the server's event loop
+                    set_background_loop(asyncio.get_running_loop())
+                    await start_services(self._config, self._forwarders)
+                except Exception as e:
+                    LOG.fatal(f"Failed starting forwarder services: {e}")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+
+            elif message["type"] == "lifespan.shutdown":
+                await stop_services()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def create_asgi_app(flask_app, config, forwarders: dict = WEBHOOK_FORWARDERS):
+    """
+    Wrap the Flask app (from create_app) for ASGI serving (forwarder plugins
+    should already be registered)
+    """
+    return ForwarderASGIApp(flask_app, config, forwarders)
@@ -0,0 +1,80 @@
+"""
+Long-lived asyncio event loop for background tasks (spool draining, etc).
+
+Flask runs each async view on a temporary event loop, so any task that must
+outlive a single request is scheduled onto this loop instead, which runs in
+a dedicated daemon thread. When served via ASGI the server's own long-lived
+loop is adopted as the background loop instead (see set_background_loop).
+"""
+
+import logging
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+
+LOG = logging.getLogger()
+
+BACKGROUND_LOOP = None
+_LOOP_LOCK = threading.Lock()
+
+
+def _new_event_loop():
+    # use high-performance uvloop event loop when available
+    try:
+        import uvloop
+
+        return uvloop.new_event_loop()
+    except ImportError:
+        return asyncio.new_event_loop()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the background event loop, starting its thread on first use.
+    """
+    global BACKGROUND_LOOP
+    with _LOOP_LOCK:
+        if not BACKGROUND_LOOP:
+            loop = _new_event_loop()
+            thread = threading.Thread(
+                target=loop.run_forever, name="temporal-forwarder-bg", daemon=True
+            )
+            thread.start()
+            atexit.register(_shutdown, loop, thread)
+            BACKGROUND_LOOP = loop
+            LOG.debug("Started background event loop")
+    return BACKGROUND_LOOP
+
+
+def set_background_loop(loop: asyncio.AbstractEventLoop):
+    """
+    Use an existing long-lived loop (e.g. the ASGI server loop) for background tasks
+    """
+    global BACKGROUND_LOOP
+    with _LOOP_LOCK:
+        if BACKGROUND_LOOP and BACKGROUND_LOOP is not loop:
+            raise Exception("Background event loop is already running")
+        BACKGROUND_LOOP = loop
+
+
+def _shutdown(loop, thread, timeout: float = 5.0):
+    async def cancel_tasks():
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    try:
+        asyncio.run_coroutine_threadsafe(cancel_tasks(), loop).result(timeout)
+    except Exception as e:
+        LOG.warning(f"Background tasks did not shut down cleanly: {e}")
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout)
+
+
+def run_in_background(coro) -> concurrent.futures.Future:
+    """
+    Schedule a coroutine on the background loop (callable from any thread)
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_background_loop())
@@ -0,0 +1,203 @@
+"""
+Micro-batching of workflow starts for high-volume routes.
+
+Routes with a batch_size (e.g. inventory_levels/update during a catalog sync)
+buffer accepted webhooks per destination until batch_size webhooks have arrived
+or batch_wait_ms has passed since the first, whichever is first, and then start
+a single workflow for the whole batch. Every webhook in the batch waits for
+(and shares the result of) that one start, so webhooks are still only
+acknowledged once durably started, and with the spool enabled webhooks are
+batched as they are drained from the durable spool.
+
+The batch workflow's argument is a JSON array of the webhook payloads (pass-through
+envelopes in their spooled JSON form), and its id is derived from the member
+webhook ids and batches are started with the REJECT_DUPLICATE id reuse policy,
+so a retried start of the same batch is idempotent even once the first batch
+workflow has completed. Workflows should still ignore webhook ids they have
+already processed, since a webhook retried by its sender can land in a
+different batch.
+
+Webhooks that gave up waiting (cancelled) or whose deadline has too little
+budget left to start a workflow are dropped from their batch when it is
+flushed, so they neither fail the whole batch nor get started after their
+sender has been told to retry.
+"""
+
+import logging
+import asyncio
+import hashlib
+import json
+
+from . import Config, TemporalDestination
+from .background import get_background_loop
+from .deadline import Deadline, DeadlineExceeded
+from .envelope import WebhookEnvelope
+from .serialization import JSON_ENCODING, SerializedEnvelope, serializer_for_encoding
+
+LOG = logging.getLogger()
+
+DEFAULT_BATCH_WAIT_MS = 50
+
+
+def batch_workflow_id(dest: TemporalDestination, workflow_ids: list[str]) -> str:
+    """
+    Deterministic id for a batch (independent of the order webhooks arrived in)
+    """
+    digest = hashlib.blake2b(
+        "\n".join(sorted(workflow_ids)).encode("utf-8"), digest_size=16
+    )
+    return f"{dest.workflow_type}:batch-{digest.hexdigest()}"
+
+
+def batch_payload(payloads: list):
+    """
+    JSON array of webhook payloads (JSON envelopes are already serialized, so are
+    joined without being parsed again), or for serialized envelopes an array in
+    the same encoding
+    """
+    if isinstance(payloads[0], SerializedEnvelope):
+        encoding = payloads[0].encoding
+        if encoding == JSON_ENCODING:
+            data = b"[" + b",".join(p.data for p in payloads) + b"]"
+            return SerializedEnvelope(data, encoding)
+        serializer = serializer_for_encoding(encoding)
+        return SerializedEnvelope.serialize(
+            serializer, [serializer.loads(p.data) for p in payloads]
+        )
+
+    items = []
+    for payload in payloads:
+        if isinstance(payload, WebhookEnvelope):
+            payload = json.dumps(payload.to_json_dict())
+        items.append(payload)
+    return "[" + ",".join(items) + "]"
+
+
+def _tightest(deadlines: list[Deadline]) -> Deadline:
+    # the batch start must complete before its most urgent (remaining) member's
+    # deadline, so no member is started after its sender has given up
+    bounded = [d for d in deadlines if d and d.remaining() is not None]
+    return min(bounded, key=lambda d: d.remaining()) if bounded else None
+
+
+def _live(items: list) -> list:
+    """
+    Batch members still waiting with enough budget left to be started (expired
+    members are failed individually)
+    """
+    live = []
+    for item in items:
+        future, workflow_id, _, deadline = item
+        if future.done():
+            continue  # cancelled, the webhook is no longer waiting for its batch
+        try:
+            if deadline:
+                deadline.check(Config.min_start_budget)
+        except DeadlineExceeded as e:
+            LOG.warning(f"Dropping {workflow_id} from its batch: {e}")
+            future.set_exception(e)
+            continue
+        live.append(item)
+    return live
+
+
+class BatchBuffer:
+    """
+    Webhooks waiting to be started as one batch on a single destination
+    """
+
+    def __init__(self, dest: TemporalDestination, start_fn):
+        self._dest = dest
+        self._start_fn = start_fn
+        self._items = []  # (future, workflow_id, payload, deadline)
+        self._timer = None
+        self.batches = 0
+        self.webhooks = 0
+
+    def add(self, future: asyncio.Future, workflow_id: str, payload, deadline: Deadline):
+        self._items.append((future, workflow_id, payload, deadline))
+        if len(self._items) >= self._dest.batch_size:
+            self.flush()
+        elif not self._timer:
+            wait_ms = self._dest.batch_wait_ms or DEFAULT_BATCH_WAIT_MS
+            self._timer = asyncio.get_running_loop().call_later(
+                wait_ms / 1000, self.flush
+            )
+
+    def flush(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        items, self._items = self._items, []
+        if items:
+            asyncio.create_task(self._start(items))
+
+    async def _start(self, items: list):
+        items = _live(items)
+        if not items:
+            return
+
+        futures, workflow_ids, payloads, deadlines = zip(*items)
+        batch_id = batch_workflow_id(self._dest, list(workflow_ids))
+        self.batches += 1
+        self.webhooks += len(items)
+        LOG.info(f"Starting batch {batch_id} of {len(items)} webhooks")
+
+        try:
+            result = await self._start_fn(
+                self._dest, batch_id, batch_payload(payloads), _tightest(deadlines)
+            )
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future in futures:
+            if not future.done():
+                future.set_result(result)
+
+
+class WorkflowBatcher:
+    """
+    Batch buffers per destination, running on the background loop
+    """
+
+    def __init__(self, start_fn):
+        self._start_fn = start_fn
+        self._buffers = {}
+
+    async def _add(self, dest: TemporalDestination, workflow_id: str, payload, deadline):
+        # runs on the background loop which owns all buffers and timers
+        buffer = self._buffers.get(dest)
+        if not buffer:
+            buffer = self._buffers[dest] = BatchBuffer(dest, self._start_fn)
+
+        future = asyncio.get_running_loop().create_future()
+        buffer.add(future, workflow_id, payload, deadline)
+        return await future
+
+    async def start_workflow(
+        self,
+        dest: TemporalDestination,
+        workflow_id: str,
+        payload,
+        deadline: Deadline = None,
+    ):
+        """
+        Add a webhook to its destination's batch and wait until the batch has
+        started (callable from any loop)
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._add(dest, workflow_id, payload, deadline), get_background_loop()
+        )
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> list[dict]:
+        return [
+            {
+                "task_queue": dest.task_queue,
+                "batches": buffer.batches,
+                "webhooks": buffer.webhooks,
+            }
+            for dest, buffer in list(self._buffers.items())
+        ]
@@ -0,0 +1,210 @@
+"""
+Claim-check offload of oversized payloads.
+
+Temporal limits payload sizes, and every workflow argument is stored in (and
+replayed from) the workflow history. Payloads of at least a threshold size are
+instead written to a content-addressed blob store, and the Temporal payload only
+carries a reference to the blob:
+
+    metadata["encoding"]           = "binary/claim-check"
+    metadata["claim-check-sha256"] = hex SHA-256 of the blob (also its key)
+    metadata["claim-check-size"]   = blob size in bytes
+    data                           = {"ref": ..., "sha256": ..., "size": ...} JSON
+
+Blobs hold the serialized (already compressed/encrypted) payload, and are only
+fetched when the payload is decoded.
+"""
+
+import logging
+import asyncio
+import collections
+import hashlib
+import json
+import os
+import tempfile
+from abc import ABCMeta, abstractmethod
+from typing import Iterable, List
+from urllib.parse import urlparse
+
+from temporalio.api.common.v1 import Payload
+from temporalio.converter import PayloadCodec
+
+LOG = logging.getLogger()
+
+CLAIM_CHECK_ENCODING = "binary/claim-check"
+DEFAULT_CLAIM_CHECK_THRESHOLD = 256 * 1024
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024  # recently fetched blobs kept for replays
+
+
+class BlobStore(metaclass=ABCMeta):
+    @abstractmethod
+    def ref(self, key: str) -> str:
+        """
+        Location of the blob with the key (e.g. a URL), for workers in other languages
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, key: str, data: bytes):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Blobs stored as files in a directory (sharded by the first two key characters)
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def ref(self, key: str) -> str:
+        return f"file://{os.path.abspath(self._path(key))}"
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        if os.path.exists(path):
+            return  # content addressed, so already stored
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def get(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+
+class S3BlobStore(BlobStore):
+    """
+    Blobs stored in an S3 bucket. endpoint_url allows any S3 compatible store
+    (e.g. MinIO or LocalStack standing in for S3 locally).
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str = None):
+        try:
+            import boto3
+        except ImportError:
+            raise Exception("S3 claim-check store requires the 'boto3' package")
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self._s3 = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def ref(self, key: str) -> str:
+        return f"s3://{self.bucket}/{self._key(key)}"
+
+    def put(self, key: str, data: bytes):
+        self._s3.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+
+    def get(self, key: str) -> bytes:
+        return self._s3.get_object(Bucket=self.bucket, Key=self._key(key))["Body"].read()
+
+
+def create_blob_store(url: str) -> BlobStore:
+    """
+    Blob store for a URL: s3://bucket/prefix, file:///path or a plain directory path
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "s3":
+        return S3BlobStore(
+            parsed.netloc, parsed.path, os.environ.get("CLAIM_CHECK_S3_ENDPOINT")
+        )
+    if parsed.scheme == "file":
+        return LocalBlobStore(parsed.path)
+    if not parsed.scheme:
+        return LocalBlobStore(url)
+    raise ValueError(f"Unsupported claim-check store {url}")
+
+
+class ClaimCheckCodec(PayloadCodec):
+    """
+    Replaces payloads of at least threshold bytes with a reference to a copy in
+    the blob store. Blocking store I/O runs in the loop's default executor.
+    """
+
+    def __init__(
+        self,
+        store: BlobStore,
+        threshold: int = DEFAULT_CLAIM_CHECK_THRESHOLD,
+        cache_bytes: int = DEFAULT_CACHE_BYTES,
+    ) -> None:
+        super().__init__()
+        self.store = store
+        self.threshold = threshold
+        self._cache = collections.OrderedDict()  # key -> blob, oldest first
+        self._cache_size = 0
+        self._cache_bytes = cache_bytes
+
+    async def encode(self, payloads: Iterable[Payload]) -> List[Payload]:
+        loop = asyncio.get_running_loop()
+        ret: List[Payload] = []
+        for p in payloads:
+            data = p.SerializeToString()
+            if len(data) < self.threshold:
+                ret.append(p)
+                continue
+
+            key = hashlib.sha256(data).hexdigest()
+            await loop.run_in_executor(None, self.store.put, key, data)
+            reference = {"ref": self.store.ref(key), "sha256": key, "size": len(data)}
+            ret.append(
+                Payload(
+                    metadata={
+                        "encoding": CLAIM_CHECK_ENCODING.encode(),
+                        "claim-check-sha256": key.encode(),
+                        "claim-check-size": str(len(data)).encode(),
+                    },
+                    data=json.dumps(reference, separators=(",", ":")).encode(),
+                )
+            )
+        return ret
+
+    async def decode(self, payloads: Iterable[Payload]) -> List[Payload]:
+        ret: List[Payload] = []
+        for p in payloads:
+            if p.metadata.get("encoding", b"").decode() != CLAIM_CHECK_ENCODING:
+                ret.append(p)
+                continue
+
+            key = p.metadata["claim-check-sha256"].decode()
+            size = int(p.metadata["claim-check-size"])
+            ret.append(Payload.FromString(await self.fetch(key, size)))
+        return ret
+
+    async def fetch(self, key: str, size: int) -> bytes:
+        """
+        Fetch a blob, verifying it against its hash and size
+        """
+        data = self._cache.get(key)
+        if data is not None:
+            self._cache.move_to_end(key)
+            return data
+
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(None, self.store.get, key)
+        if len(data) != size or hashlib.sha256(data).hexdigest() != key:
+            raise ValueError(f"Claim-check blob {key} is corrupt")
+
+        self._cache[key] = data
+        self._cache_size += size
+        while self._cache_size > self._cache_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_size -= len(evicted)
+        return data
@@ -3,14 +3,19 @@
 #
 # See https://github.com/temporalio/samples-python/
 
+import asyncio
 import base64
 import os
+import time
+import zlib
 from typing import Iterable, List
 
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from temporalio.api.common.v1 import Payload
 from temporalio.converter import PayloadCodec
 
+from .deadline import CURRENT_DEADLINE
+
 # NOTE: please do not use the default key in practice...
 default_key = base64.b64decode(b"MkUb3RVdHQuOTedqETZW7ra2GkZqpBRmYWRACUospMc=")
 default_key_id = "insecure-default-key"
@@ -60,3 +65,221 @@ class EncryptionCodec(PayloadCodec):
 
     def decrypt(self, data: bytes) -> bytes:
         return self.encryptor.decrypt(data[:12], data[12:], None)
+
+
+ENCRYPTED_ENCODING = "binary/encrypted"
+NONCE_SIZE = 12
+DEFAULT_OFFLOAD_THRESHOLD = 256 * 1024  # smaller payloads are cheaper to encrypt inline
+
+
+class KeyRingEncryptionCodec(PayloadCodec):
+    """
+    AES GCM encryption with the same payload format as EncryptionCodec, but with a
+    ring of keys: payloads are encrypted with the active key and decrypted with
+    whichever key they name, so keys can be rotated (via set_keys) without a
+    restart. Payloads of at least offload_threshold bytes are encrypted and
+    decrypted in a thread pool (cryptography releases the GIL while it works)
+    rather than on the event loop.
+    """
+
+    def __init__(
+        self,
+        keys: dict[str, bytes],
+        active_key_id: str,
+        offload_threshold: int = DEFAULT_OFFLOAD_THRESHOLD,
+        executor=None,
+    ) -> None:
+        super().__init__()
+        self.offload_threshold = offload_threshold
+        self._executor = executor
+        self.set_keys(keys, active_key_id)
+
+    def set_keys(self, keys: dict[str, bytes], active_key_id: str):
+        """
+        Replace the key ring; the AESGCM instance for each key is built once here
+        """
+        if active_key_id not in keys:
+            raise ValueError(f"Active key ID {active_key_id} is not in the key ring")
+        ciphers = {key_id: AESGCM(key) for key_id, key in keys.items()}
+
+        # swapped in with a single assignment, so in-flight encodes and decodes see
+        # either the old or the new ring, never a mix
+        self._ring = (ciphers, active_key_id)
+
+    @property
+    def key_id(self) -> str:
+        return self._ring[1]
+
+    @property
+    def key_ids(self) -> list[str]:
+        return list(self._ring[0])
+
+    async def encode(self, payloads: Iterable[Payload]) -> List[Payload]:
+        ciphers, key_id = self._ring
+        metadata = {
+            "encoding": ENCRYPTED_ENCODING.encode(),
+            "encryption-key-id": key_id.encode(),
+        }
+        return [
+            Payload(
+                metadata=metadata,
+                data=await self._run(
+                    self.encrypt, ciphers[key_id], p.SerializeToString()
+                ),
+            )
+            for p in payloads
+        ]
+
+    async def decode(self, payloads: Iterable[Payload]) -> List[Payload]:
+        ciphers = self._ring[0]
+        ret: List[Payload] = []
+        for p in payloads:
+            if p.metadata.get("encoding", b"").decode() != ENCRYPTED_ENCODING:
+                ret.append(p)
+                continue
+
+            key_id = p.metadata.get("encryption-key-id", b"").decode()
+            cipher = ciphers.get(key_id)
+            if not cipher:
+                raise ValueError(f"Unrecognized key ID {key_id}")
+            ret.append(Payload.FromString(await self._run(self.decrypt, cipher, p.data)))
+        return ret
+
+    async def _run(self, crypt, cipher: AESGCM, data: bytes):
+        if len(data) < self.offload_threshold:
+            return crypt(cipher, data)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, crypt, cipher, data)
+
+    @staticmethod
+    def encrypt(cipher: AESGCM, data: bytes) -> bytes:
+        nonce = os.urandom(NONCE_SIZE)
+        return nonce + cipher.encrypt(nonce, data, None)
+
+    @staticmethod
+    def decrypt(cipher: AESGCM, data: bytes) -> bytes:
+        # slice views rather than copies of the nonce and ciphertext
+        view = memoryview(data)
+        return cipher.decrypt(view[:NONCE_SIZE], view[NONCE_SIZE:], None)
+
+
+COMPRESSED_ENCODING = "binary/compressed"
+DEFAULT_COMPRESSION_THRESHOLD = 1024  # smaller payloads are not worth compressing
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise Exception("zstd compression requires the 'zstandard' package")
+    return zstandard
+
+
+class CompressionCodec(PayloadCodec):
+    """
+    Compresses payloads at least threshold bytes in size (with zlib or zstd),
+    recording the algorithm in the payload metadata. Payloads that are not
+    compressed (or were compressed by a different algorithm) decode unchanged.
+    """
+
+    def __init__(
+        self,
+        algorithm: str = "zlib",
+        threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+        level: int = None,
+    ) -> None:
+        super().__init__()
+        self.algorithm = algorithm
+        self.threshold = threshold
+
+        if algorithm == "zlib":
+            level = 6 if level is None else level
+            self._compress = lambda data: zlib.compress(data, level)
+        elif algorithm == "zstd":
+            zstandard = _zstd()
+            self._compress = zstandard.ZstdCompressor(level=level or 3).compress
+        else:
+            raise ValueError(f"Unsupported compression {algorithm}")
+
+    async def encode(self, payloads: Iterable[Payload]) -> List[Payload]:
+        ret: List[Payload] = []
+        for p in payloads:
+            data = p.SerializeToString()
+            compressed = self._compress(data) if len(data) >= self.threshold else data
+            # leave small (or incompressible) payloads alone
+            if len(compressed) >= len(data):
+                ret.append(p)
+                continue
+            ret.append(
+                Payload(
+                    metadata={
+                        "encoding": COMPRESSED_ENCODING.encode(),
+                        "compression": self.algorithm.encode(),
+                    },
+                    data=compressed,
+                )
+            )
+        return ret
+
+    async def decode(self, payloads: Iterable[Payload]) -> List[Payload]:
+        ret: List[Payload] = []
+        for p in payloads:
+            if p.metadata.get("encoding", b"").decode() != COMPRESSED_ENCODING:
+                ret.append(p)
+                continue
+
+            algorithm = p.metadata.get("compression", b"").decode()
+            if algorithm == "zlib":
+                data = zlib.decompress(p.data)
+            elif algorithm == "zstd":
+                data = _zstd().ZstdDecompressor().decompress(p.data)
+            else:
+                raise ValueError(f"Unrecognized compression {algorithm}")
+            ret.append(Payload.FromString(data))
+        return ret
+
+
+class CodecChain(PayloadCodec):
+    """
+    Applies codecs in order when encoding (e.g. compress then encrypt) and in
+    reverse order when decoding.
+    """
+
+    def __init__(self, *codecs: PayloadCodec) -> None:
+        super().__init__()
+        self.codecs = codecs
+
+    async def encode(self, payloads: Iterable[Payload]) -> List[Payload]:
+        payloads = list(payloads)
+        for codec in self.codecs:
+            payloads = await codec.encode(payloads)
+        return payloads
+
+    async def decode(self, payloads: Iterable[Payload]) -> List[Payload]:
+        payloads = list(payloads)
+        for codec in reversed(self.codecs):
+            payloads = await codec.decode(payloads)
+        return payloads
+
+
+class TimedCodec(PayloadCodec):
+    """
+    Records time spent encoding payloads as the "codec" stage of the current
+    request's Deadline (if any)
+    """
+
+    def __init__(self, codec: PayloadCodec) -> None:
+        super().__init__()
+        self.codec = codec
+
+    async def encode(self, payloads: Iterable[Payload]) -> List[Payload]:
+        start = time.monotonic()
+        try:
+            return await self.codec.encode(payloads)
+        finally:
+            deadline = CURRENT_DEADLINE.get()
+            if deadline:
+                deadline.add("codec", time.monotonic() - start)
+
+    async def decode(self, payloads: Iterable[Payload]) -> List[Payload]:
+        return await self.codec.decode(payloads)
@@ -0,0 +1,93 @@
+"""
+Response deadlines for webhook requests.
+
+Webhook senders only wait so long for a response (e.g. Shopify gives up after
+five seconds), so each request carries a Deadline through verification,
+encoding and the workflow start RPC. Time spent in each stage is recorded to
+show where the budget goes.
+"""
+
+import contextvars
+import time
+from datetime import timedelta
+
+
+# deadline of the request whose workflow start is running in the current task, so
+# code without access to the request (e.g. payload codecs) can record stages
+CURRENT_DEADLINE = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """
+    Not enough of the response budget remains to complete the request
+    """
+
+
+class Deadline:
+    def __init__(self, budget: float = None):
+        """
+        budget: seconds until the response is due (None = no deadline)
+        """
+        self._start = self._last = time.monotonic()
+        self._expires = self._start + budget if budget else None
+        self.stages = {}
+
+    def remaining(self) -> float:
+        """
+        Seconds left before the deadline (None if there is no deadline)
+        """
+        if self._expires is None:
+            return None
+        return max(self._expires - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self._expires is not None and time.monotonic() >= self._expires
+
+    def check(self, needed: float = 0.0):
+        """
+        Raise DeadlineExceeded if less than needed seconds of budget remain
+        """
+        remaining = self.remaining()
+        if remaining is not None and remaining <= needed:
+            raise DeadlineExceeded(
+                f"{remaining * 1000:.0f}ms of budget left, {needed * 1000:.0f}ms needed"
+            )
+
+    def timeout(self) -> timedelta:
+        """
+        Remaining budget as a timeout for RPCs (None if there is no deadline)
+        """
+        remaining = self.remaining()
+        return None if remaining is None else timedelta(seconds=remaining)
+
+    def mark(self, stage: str) -> float:
+        """
+        Record the time spent in a stage (since the previous mark)
+        """
+        now = time.monotonic()
+        elapsed = now - self._last
+        self.add(stage, elapsed)
+        self._last = now
+        return elapsed
+
+    def add(self, stage: str, seconds: float):
+        """
+        Record time spent in a stage that overlaps other stages (e.g. payload
+        encoding within the workflow start)
+        """
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self._start
+
+    def server_timing(self) -> str:
+        """
+        Stage timings formatted as a Server-Timing response header
+        """
+        return ", ".join(
+            f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in self.stages.items()
+        )
+
+    def __str__(self):
+        stages = " ".join(f"{s}={t * 1000:.1f}ms" for s, t in self.stages.items())
+        return f"{self.elapsed() * 1000:.1f}ms ({stages})"
@@ -0,0 +1,171 @@
+"""
+Index of recently accepted webhook ids.
+
+Senders like Shopify retry deliveries with the same webhook id. Once a webhook
+has been accepted, retries are answered immediately without re-verifying,
+re-encoding or making another workflow start RPC (which would only conflict
+with the already started workflow). Entries are evicted least recently used
+first and expire after a TTL. The index can optionally be persisted to a small
+SQLite table so it survives restarts. Rows are written behind by a writer thread
+in batches (one transaction each), so accepting a webhook never blocks the event
+loop on disk I/O. Ids accepted just before a crash may be lost, which only means
+a retry of them is forwarded again (and rejected by Temporal as already started).
+"""
+
+import logging
+import collections
+import sqlite3
+import threading
+import time
+
+LOG = logging.getLogger()
+
+DEFAULT_MAX_ENTRIES = 100_000
+DEFAULT_TTL = 48 * 60 * 60  # Shopify retries failed deliveries for up to 48 hours
+
+PRUNE_INTERVAL = 1000  # prune expired rows from disk every N additions
+WRITE_INTERVAL = 0.1  # seconds the writer waits to batch more rows
+
+DEDUPE = None
+
+
+class DedupeCache:
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float = DEFAULT_TTL,
+        path: str = None,
+    ):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._entries = collections.OrderedDict()  # key -> expiry, oldest first
+        self._lock = threading.Lock()
+        self._db = None
+        self._additions = 0
+        self._pending = []  # (key, expires) rows not yet written
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._writer = None
+
+        self.hits = 0
+        self.misses = 0
+
+        if path:
+            self._open(path)
+
+    def _open(self, path: str):
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS accepted (key TEXT PRIMARY KEY, expires REAL)"
+        )
+
+        rows = self._db.execute(
+            "SELECT key, expires FROM accepted WHERE expires > ? "
+            "ORDER BY expires DESC LIMIT ?",
+            (time.time(), self._max_entries),
+        ).fetchall()
+        for key, expires in reversed(rows):
+            self._entries[key] = expires
+        LOG.info(f"Loaded {len(rows)} accepted webhook ids from {path}")
+
+        self._writer = threading.Thread(
+            target=self._write_behind, name="dedupe-writer", daemon=True
+        )
+        self._writer.start()
+
+    def seen(self, key: str) -> bool:
+        """
+        True if the key was accepted within the TTL
+        """
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is None or expires <= time.time():
+                self.misses += 1
+                return False
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+
+    def add(self, key: str):
+        """
+        Record a key as accepted
+        """
+        expires = time.time() + self._ttl
+        with self._lock:
+            self._entries[key] = expires
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+            if self._db:
+                self._pending.append((key, expires))
+        if self._db:
+            self._wakeup.set()
+
+    def _write_behind(self):
+        while not self._closed:
+            self._wakeup.wait()
+            time.sleep(WRITE_INTERVAL)  # let more rows arrive for this batch
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                LOG.error(f"Could not persist accepted webhook ids: {e}")
+
+    def flush(self):
+        """
+        Write all pending rows to disk in a single transaction
+        """
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return
+
+        db = self._db
+        db.execute("BEGIN")
+        db.executemany(
+            "INSERT OR REPLACE INTO accepted (key, expires) VALUES (?, ?)", rows
+        )
+        previous, self._additions = self._additions, self._additions + len(rows)
+        if previous // PRUNE_INTERVAL != self._additions // PRUNE_INTERVAL:
+            db.execute("DELETE FROM accepted WHERE expires <= ?", (time.time(),))
+        db.execute("COMMIT")
+
+    def close(self):
+        """
+        Stop the writer, persisting any pending rows
+        """
+        if self._writer:
+            self._closed = True
+            self._wakeup.set()
+            self._writer.join()
+            self._writer = None
+            self.flush()
+            self._db.close()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def get_dedupe() -> DedupeCache:
+    return DEDUPE
+
+
+def stop_dedupe():
+    global DEDUPE
+    if DEDUPE:
+        DEDUPE.close()
+        DEDUPE = None
+
+
+def start_dedupe(config) -> DedupeCache:
+    """
+    Enable the dedupe index unless config.dedupe_entries is 0
+    """
+    global DEDUPE
+    if config.dedupe_entries > 0:
+        DEDUPE = DedupeCache(config.dedupe_entries, config.dedupe_ttl, config.dedupe_path)
+    return DEDUPE
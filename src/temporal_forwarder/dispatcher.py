@@ -0,0 +1,199 @@
+"""
+Dispatcher owning all workflow start RPCs.
+
+Request handlers enqueue their workflow start onto a per-destination asyncio
+queue and await the result, while a fixed pool of worker tasks per destination
+makes the actual gRPC calls. This keeps the number of in-flight starts to a
+Temporal destination bounded and steady under bursts (e.g. a bulk product
+import firing thousands of products/update webhooks).
+"""
+
+import logging
+import asyncio
+import dataclasses
+import time
+
+from . import TemporalDestination
+from .background import get_background_loop
+from .batching import WorkflowBatcher
+from .deadline import Deadline, DeadlineExceeded
+from .temporal_client import start_workflow_execution
+
+LOG = logging.getLogger()
+
+DEFAULT_MAX_INFLIGHT = 32
+
+# weight of the latest sample in the exponentially weighted moving averages
+EWMA_ALPHA = 0.1
+
+DISPATCHER = None
+BATCHER = None
+
+
+class DestinationQueue:
+    """
+    Queue of pending workflow starts for a single Temporal destination, drained by
+    max_inflight worker tasks.
+    """
+
+    def __init__(self, dest: TemporalDestination, max_inflight: int, start_fn):
+        self._dest = dest
+        self._start_fn = start_fn
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(max_inflight)]
+
+        self.inflight = 0
+        self.started = 0
+        self.failed = 0
+        self.service_time = 0.0  # EWMA seconds spent in the start RPC
+        self.queue_time = 0.0  # EWMA seconds spent waiting in the queue
+
+    def put(self, future: asyncio.Future, workflow_id: str, payload, deadline: Deadline):
+        self._queue.put_nowait(
+            (future, workflow_id, payload, deadline, time.perf_counter())
+        )
+
+    async def _worker(self):
+        while True:
+            future, workflow_id, payload, deadline, enqueued = await self._queue.get()
+            if future.cancelled():
+                continue
+
+            # don't waste an RPC on a start whose caller has already given up
+            if deadline and deadline.expired():
+                self.failed += 1
+                future.set_exception(DeadlineExceeded("expired while queued"))
+                continue
+
+            dequeued = time.perf_counter()
+            self.queue_time += EWMA_ALPHA * (dequeued - enqueued - self.queue_time)
+            self.inflight += 1
+            try:
+                result = await self._start_fn(self._dest, workflow_id, payload, deadline)
+                self.started += 1
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                self.failed += 1
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.inflight -= 1
+                elapsed = time.perf_counter() - dequeued
+                self.service_time += EWMA_ALPHA * (elapsed - self.service_time)
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "workflow_type": self._dest.workflow_type,
+            "task_queue": self._dest.task_queue,
+            "queue_depth": self._queue.qsize(),
+            "inflight": self.inflight,
+            "started": self.started,
+            "failed": self.failed,
+            "service_time_ms": round(self.service_time * 1000, 3),
+            "queue_time_ms": round(self.queue_time * 1000, 3),
+        }
+
+
+class WorkflowDispatcher:
+    """
+    Routes workflow starts to per-destination queues running on the background loop
+    """
+
+    def __init__(self, max_inflight: int = DEFAULT_MAX_INFLIGHT, start_fn=None):
+        self._max_inflight = max_inflight
+        self._start_fn = start_fn or start_workflow_execution
+        self._queues = {}
+
+    async def _dispatch(
+        self, dest: TemporalDestination, workflow_id: str, payload, deadline: Deadline
+    ):
+        # runs on the background loop which owns all queues and workers
+        key = dataclasses.astuple(dest)
+        queue = self._queues.get(key)
+        if not queue:
+            queue = self._queues[key] = DestinationQueue(
+                dest, self._max_inflight, self._start_fn
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        queue.put(future, workflow_id, payload, deadline)
+        return await future
+
+    async def start_workflow(
+        self,
+        dest: TemporalDestination,
+        workflow_id: str,
+        payload,
+        deadline: Deadline = None,
+    ):
+        """
+        Enqueue a workflow start and wait for it to complete (callable from any loop)
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._dispatch(dest, workflow_id, payload, deadline), get_background_loop()
+        )
+        return await asyncio.wrap_future(future)
+
+    def close(self):
+        """
+        Stop all worker tasks (any still queued starts are abandoned)
+        """
+
+        async def close_queues():
+            await asyncio.gather(*[q.close() for q in self._queues.values()])
+
+        asyncio.run_coroutine_threadsafe(close_queues(), get_background_loop()).result()
+
+    def stats(self) -> list[dict]:
+        return [
+            {"endpoint": key[0], "namespace": key[1]} | queue.stats()
+            for key, queue in list(self._queues.items())
+        ]
+
+
+def get_dispatcher() -> WorkflowDispatcher:
+    return DISPATCHER
+
+
+def start_dispatcher(config) -> WorkflowDispatcher:
+    """
+    Enable the dispatcher when config.max_inflight_starts is set (otherwise each
+    request handler makes its own start RPC)
+    """
+    global DISPATCHER
+    if config.max_inflight_starts > 0:
+        DISPATCHER = WorkflowDispatcher(config.max_inflight_starts)
+    return DISPATCHER
+
+
+def get_batcher() -> WorkflowBatcher:
+    global BATCHER
+    if not BATCHER:
+        BATCHER = WorkflowBatcher(_start_workflow)
+    return BATCHER
+
+
+async def dispatch_workflow_start(
+    dest: TemporalDestination, workflow_id: str, payload, deadline: Deadline = None
+):
+    """
+    Start a workflow through the dispatcher when enabled, otherwise directly (in
+    both cases batched with other webhooks if the destination has a batch_size)
+    """
+    if dest.batch_size:
+        return await get_batcher().start_workflow(dest, workflow_id, payload, deadline)
+    return await _start_workflow(dest, workflow_id, payload, deadline)
+
+
+async def _start_workflow(
+    dest: TemporalDestination, workflow_id: str, payload, deadline: Deadline = None
+):
+    if DISPATCHER:
+        return await DISPATCHER.start_workflow(dest, workflow_id, payload, deadline)
+    return await start_workflow_execution(dest, workflow_id, payload, deadline)
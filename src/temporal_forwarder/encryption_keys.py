@@ -0,0 +1,117 @@
+"""
+Payload encryption keys.
+
+Keys are read from (in order of precedence):
+
+    AES_KEYS_FILE - JSON file {"active": "<key id>", "keys": {"<key id>": "<hex key>"}}
+    AES_KEYS      - comma separated <key id>:<hex key> pairs, with AES_KEY_ID active
+    AES_KEY       - single hex key named by AES_KEY_ID
+
+Payloads are always encrypted with the active key, while any key in the ring can
+decrypt. To rotate: add the new key, make it active once workers have it, and
+remove the old key once no running workflow history needs it. The keys file is
+re-read whenever it changes, so none of these steps require a restart.
+"""
+
+import logging
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from . import Config
+from .codec import KeyRingEncryptionCodec
+
+LOG = logging.getLogger()
+
+DEFAULT_KEY_ID = "unnamed-key"
+DEFAULT_RELOAD_INTERVAL = 5.0  # seconds between checks of the keys file
+
+KEY_RING_CODEC = None
+KEY_WATCHER = None
+
+
+def encryption_enabled() -> bool:
+    return any(os.environ.get(var) for var in ["AES_KEYS_FILE", "AES_KEYS", "AES_KEY"])
+
+
+def load_keys_file(path: str) -> tuple[dict, str]:
+    """
+    Keys (by id) and the active key id from a JSON keys file
+    """
+    with open(path) as f:
+        ring = json.load(f)
+    keys = {key_id: bytes.fromhex(key) for key_id, key in ring["keys"].items()}
+    return keys, ring["active"]
+
+
+def load_keys() -> tuple[dict, str]:
+    """
+    Keys (by id) and the active key id from the environment
+    """
+    path = os.environ.get("AES_KEYS_FILE")
+    if path:
+        return load_keys_file(path)
+
+    active = os.environ.get("AES_KEY_ID", DEFAULT_KEY_ID)
+    keys = {}
+    for entry in filter(None, os.environ.get("AES_KEYS", "").split(",")):
+        key_id, _, key = entry.strip().partition(":")
+        keys[key_id] = bytes.fromhex(key)
+    if os.environ.get("AES_KEY"):
+        keys[active] = bytes.fromhex(os.environ["AES_KEY"])
+    return keys, active
+
+
+def get_key_ring_codec() -> KeyRingEncryptionCodec:
+    """
+    The encryption codec shared by all Temporal clients, so that a key rotation
+    applies to every client at once (None if encryption is not enabled)
+    """
+    global KEY_RING_CODEC
+    if not KEY_RING_CODEC and encryption_enabled():
+        keys, active = load_keys()
+        executor = ThreadPoolExecutor(Config.crypto_threads, thread_name_prefix="crypto")
+        KEY_RING_CODEC = KeyRingEncryptionCodec(
+            keys, active, Config.crypto_offload_threshold, executor
+        )
+        LOG.info(f"Payload encryption enabled with key {active} ({len(keys)} keys)")
+    return KEY_RING_CODEC
+
+
+async def watch_keys_file(
+    codec: KeyRingEncryptionCodec, path: str, interval: float = DEFAULT_RELOAD_INTERVAL
+):
+    """
+    Reload the key ring whenever the keys file is modified
+    """
+    mtime = os.stat(path).st_mtime
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            modified = os.stat(path).st_mtime
+            if modified == mtime:
+                continue
+            mtime = modified
+
+            keys, active = load_keys_file(path)
+            codec.set_keys(keys, active)
+            LOG.info(
+                f"Reloaded {len(keys)} encryption keys from {path} (active {active})"
+            )
+        except Exception as e:
+            # keep encrypting with the current keys until the file is fixed
+            LOG.error(f"Could not reload encryption keys from {path}: {e}")
+
+
+def start_key_watcher() -> asyncio.Task:
+    """
+    Watch the keys file for rotations, if keys are loaded from a file (must run
+    on the background loop)
+    """
+    global KEY_WATCHER
+    path = os.environ.get("AES_KEYS_FILE")
+    codec = get_key_ring_codec()
+    if path and codec and not KEY_WATCHER:
+        KEY_WATCHER = asyncio.create_task(watch_keys_file(codec, path))
+    return KEY_WATCHER
@@ -0,0 +1,166 @@
+"""
+Pass-through webhook envelope.
+
+By default the forwarder parses JSON webhook bodies, re-serializes them inside
+a {"headers": ..., "data": ...} JSON document, and Temporal's JSON converter
+then serializes that document yet again. In pass-through mode the raw request
+body becomes the Temporal payload data untouched, with the headers carried in
+the payload metadata:
+
+    metadata["encoding"]        = "binary/webhook-envelope"
+    metadata["content-type"]    = Content-Type of the webhook request
+    metadata["webhook-headers"] = JSON object of the forwarded headers
+    data                        = raw webhook request body
+
+Workers in any language can decode this directly from the payload. Python
+workers can instead register WebhookPayloadConverter, which decodes the payload
+as a WebhookEnvelope, a {"headers", "data"} dict or the legacy JSON string
+depending on the workflow's argument type.
+"""
+
+import base64
+import json
+from dataclasses import dataclass, field
+
+from temporalio.api.common.v1 import Payload
+from temporalio.converter import (
+    CompositePayloadConverter,
+    DefaultPayloadConverter,
+    EncodingPayloadConverter,
+)
+
+from .serialization import (
+    MSGPACK_ENCODING,
+    SERIALIZER_MSGPACK,
+    SerializedEnvelope,
+    get_serializer,
+    serializer_for_encoding,
+)
+
+WEBHOOK_ENVELOPE_ENCODING = "binary/webhook-envelope"
+
+# encoding of the converter for serialized envelopes, never found in payload metadata
+SERIALIZED_ENVELOPE_ENCODING = "binary/serialized-envelope"
+
+JSON_CONTENT_TYPES = ["application/json"]
+
+
+@dataclass
+class WebhookEnvelope:
+    headers: dict = field(default_factory=dict)
+    body: bytes = b""
+    content_type: str = None
+
+    def is_json(self) -> bool:
+        return self.content_type in JSON_CONTENT_TYPES
+
+    def data(self, encoding: str = "utf-8"):
+        """
+        The webhook data as the default (non pass-through) mode provides it: parsed
+        JSON, otherwise the Base64 encoded body.
+        """
+        if self.is_json():
+            return json.loads(self.body.decode(encoding))
+        return base64.b64encode(self.body).decode(encoding)
+
+    def to_dict(self) -> dict:
+        return {"headers": self.headers, "data": self.data()}
+
+    def to_json_dict(self) -> dict:
+        """
+        JSON serializable form (e.g. for spooling to disk)
+        """
+        return {
+            "headers": self.headers,
+            "content_type": self.content_type,
+            "body": base64.b64encode(self.body).decode("ascii"),
+        }
+
+    @classmethod
+    def from_json_dict(cls, value: dict) -> "WebhookEnvelope":
+        return cls(
+            value["headers"], base64.b64decode(value["body"]), value["content_type"]
+        )
+
+
+class WebhookEnvelopePayloadConverter(EncodingPayloadConverter):
+    @property
+    def encoding(self) -> str:
+        return WEBHOOK_ENVELOPE_ENCODING
+
+    def to_payload(self, value) -> Payload:
+        if not isinstance(value, WebhookEnvelope):
+            return None
+
+        metadata = {
+            "encoding": WEBHOOK_ENVELOPE_ENCODING.encode(),
+            "webhook-headers": json.dumps(value.headers, separators=(",", ":")).encode(),
+        }
+        if value.content_type:
+            metadata["content-type"] = value.content_type.encode()
+        return Payload(metadata=metadata, data=value.body)
+
+    def from_payload(self, payload: Payload, type_hint=None):
+        envelope = WebhookEnvelope(
+            headers=json.loads(payload.metadata.get("webhook-headers", b"{}")),
+            body=payload.data,
+            content_type=payload.metadata.get("content-type", b"").decode() or None,
+        )
+
+        # decode into whatever form the workflow argument expects
+        if type_hint is dict:
+            return envelope.to_dict()
+        if type_hint is str:
+            return json.dumps(envelope.to_dict())
+        return envelope
+
+
+class SerializedEnvelopePayloadConverter(EncodingPayloadConverter):
+    """
+    Passes already serialized envelopes through as the payload data
+    """
+
+    @property
+    def encoding(self) -> str:
+        return SERIALIZED_ENVELOPE_ENCODING
+
+    def to_payload(self, value) -> Payload:
+        if not isinstance(value, SerializedEnvelope):
+            return None
+        return Payload(metadata={"encoding": value.encoding.encode()}, data=value.data)
+
+    def from_payload(self, payload: Payload, type_hint=None):
+        return serializer_for_encoding(payload.metadata["encoding"].decode()).loads(
+            payload.data
+        )
+
+
+class MsgpackPayloadConverter(EncodingPayloadConverter):
+    """
+    Decodes msgpack serialized envelopes (for Python workers)
+    """
+
+    @property
+    def encoding(self) -> str:
+        return MSGPACK_ENCODING
+
+    def to_payload(self, value) -> Payload:
+        return None  # only serialized envelopes are encoded as msgpack
+
+    def from_payload(self, payload: Payload, type_hint=None):
+        return get_serializer(SERIALIZER_MSGPACK).loads(payload.data)
+
+
+class WebhookPayloadConverter(CompositePayloadConverter):
+    """
+    Temporal's default payload converters, plus support for WebhookEnvelopes and
+    serialized envelopes (see serialization)
+    """
+
+    def __init__(self) -> None:
+        super().__init__(
+            WebhookEnvelopePayloadConverter(),
+            SerializedEnvelopePayloadConverter(),
+            MsgpackPayloadConverter(),
+            *DefaultPayloadConverter.default_encoding_payload_converters,
+        )
@@ -3,31 +3,91 @@ Routes specific to forwarding to webhook plugins
 """
 
 import logging
+import asyncio
 from http import HTTPStatus
 
 from flask import Response, abort
 from flask import current_app as app
-from flask import json, request
+from flask import g, json, request
+from temporalio.exceptions import WorkflowAlreadyStartedError
+from temporalio.service import RPCError, RPCStatusCode
 
 # FIXME: this should not be global
 from app import Config
+from temporal_forwarder import (
+    ENVELOPE_PASSTHROUGH,
+    FANOUT_QUORUM,
+    ID_CONTENT,
+    TemporalDestination,
+)
 from temporal_forwarder.webhook import WebhookCall
 
-from .plugins import WEBHOOK_FORWARDERS
-from .temporal_client import get_temporal_client
+from .admission import get_admission
+from .deadline import Deadline, DeadlineExceeded
+from .dedupe import get_dedupe
+from .dispatcher import dispatch_workflow_start
+from .envelope import WebhookEnvelope
+from .health import get_health
+from .logs import get_payload_logger
+from .metrics import get_metrics
+from .plugins import get_forwarder
+from .serialization import SerializedEnvelope, get_serializer
+from .spool import get_spool, spool_entry
 
 LOG = logging.getLogger()
 
+# workflow start status on each destination
+STARTED = "started"
+ALREADY_STARTED = "already-started"
+TIMED_OUT = "timed-out"
+UNAVAILABLE = "unavailable"  # endpoint down (or its circuit breaker open)
+FAILED = "failed"
+
+# RPC failures counted against an endpoint's circuit breaker
+BREAKER_STATUSES = (RPCStatusCode.UNAVAILABLE, RPCStatusCode.DEADLINE_EXCEEDED)
+
+
 # Example: https://temporal-webhook.mydomain.com:5000/temporal/shopify
 @app.route("/temporal/<forwarder_slug>", methods=["POST", "GET"])
 async def forward_webhook(forwarder_slug):
-    forwarder = WEBHOOK_FORWARDERS.get(forwarder_slug)
+    forwarder = get_forwarder(forwarder_slug)
     if not forwarder:
         LOG.info(f"Ignoring request for unknown forwarder {forwarder_slug}")
         return ("", HTTPStatus.NOT_IMPLEMENTED)  # 501
 
+    # the budget for responding before the sender gives up and retries
+    deadline = Deadline(forwarder.response_deadline())
+
+    # recorded (with the response status) once the response is ready
+    metrics = get_metrics()
+    g.webhook_metrics = (metrics.route(forwarder_slug), deadline)
+
+    # shed load past the forwarder's (adaptive) concurrency limit immediately,
+    # rather than letting every request miss its deadline
+    admission = get_admission()
+    if admission:
+        limiter = admission.limiter(forwarder_slug)
+        if not limiter.try_acquire():
+            LOG.warning(
+                f"Shedding webhook for {forwarder_slug}, {limiter.inflight} in flight"
+            )
+            return retry_later(f"Too many concurrent webhooks for {forwarder_slug}")
+        g.webhook_admission = (limiter, deadline)
+
     # create a new webhook object for the request
     webhook = forwarder.new_webhook_call(request)
+    g.webhook = webhook
+    route_metrics = metrics.route(forwarder_slug, webhook.topic())
+    g.webhook_metrics = (route_metrics, deadline)
+
+    # retries of an already accepted webhook are acknowledged without doing any
+    # work (content-addressed ids hash the body, so are checked once it is read)
+    dedupe = get_dedupe()
+    content_addressed = webhook.destination().id_strategy == ID_CONTENT
+    if dedupe and not content_addressed:
+        if dedupe.seen(f"{forwarder_slug}:{webhook.id}"):
+            LOG.info(f"Webhook {forwarder_slug} {webhook.id} already accepted")
+            return (webhook.id, HTTPStatus.OK)
 
     # inject additional meta-data useful for debugging in workflow/activities
     headers = webhook.headers()
@@ -37,11 +97,22 @@ async def forward_webhook(forwarder_slug):
         #'X-Webhook-Time': now
     }
 
+    # read the body once, computing any digests needed for verification as it streams
+    route_metrics.add_payload_bytes(webhook.received_body().size)
+    deadline.mark("read")
+
+    webhook_id = webhook.accepted_id()
+    dedupe_key = f"{forwarder_slug}:{webhook_id}"
+    if dedupe and content_addressed and dedupe.seen(dedupe_key):
+        LOG.info(f"Webhook {forwarder_slug} {webhook_id} already accepted")
+        return (webhook_id, HTTPStatus.OK)
+
     # verify the webhook request is valid
     if webhook.verify():
         headers["X-Webhook-Verified"] = "True"
     else:
         headers["X-Webhook-Verified"] = "False"
+        route_metrics.count_verification_failure()
         msg = f"Webhook {forwarder_slug} {webhook.id} failed verification"
         if Config.validate_hmac:
             msg += " – DROPPING EVENT"
@@ -50,46 +121,244 @@ async def forward_webhook(forwarder_slug):
         else:
             msg + " – PROCESSING ANYWAY!!!"
             LOG.warning(msg)
+    deadline.mark("verify")
+
+    # webhooks are projected after verification (which needs the original body),
+    # keeping the HMAC header and the hash of the original body so workers can still
+    # audit the payload. With validate_hmac off, unverified webhooks are projected
+    # too, flagged by X-Webhook-Verified: False
+    projection = webhook.projection()
+    if projection:
+        headers["X-Webhook-Body-SHA256"] = webhook.body_sha256()
+
+    if Config.envelope == ENVELOPE_PASSTHROUGH:
+        # pass the raw body through untouched (no JSON parsing or re-serializing),
+        # unless it is projected
+        if projection and webhook.content_type() == "application/json":
+            body = json.dumps(projection(webhook.json())).encode(Config.encoding)
+        else:
+            body = webhook.body()
+        deadline.mark("data")
+        if not body or body.strip() == b"{}":
+            LOG.warning(f"No data for webhook {forwarder_slug} {webhook.id} - SKIPPING")
+            return ("", HTTPStatus.BAD_REQUEST)
+
+        temporal_payload = WebhookEnvelope(headers, body, webhook.content_type())
+    else:
+        # if there is absolutely no data to provide, skip enqueuing the webhook
+        data = webhook.data()
+        if projection and isinstance(data, (dict, list)):
+            data = projection(data)
+        deadline.mark("data")
+        if not data or data == "{}":
+            LOG.warning(f"No data for webhook {forwarder_slug} {webhook.id} - SKIPPING")
+            return ("", HTTPStatus.BAD_REQUEST)
+
+        # create the JSON webhook payload that will be passed to execution, or
+        # serialize it once straight into the Temporal payload
+        envelope = {"headers": headers, "data": data}
+        if Config.serializer:
+            serializer = get_serializer(Config.serializer)
+            temporal_payload = SerializedEnvelope.serialize(serializer, envelope)
+        else:
+            temporal_payload = json.dumps(envelope)
+
+    # only a sample of (redacted) payloads are logged
+    get_payload_logger().log(webhook.id, temporal_payload)
+    deadline.mark("encode")
+
+    # when spooling, acknowledge as soon as the payload is durably on local disk
+    # and leave starting the workflow to the background drainer
+    spool = get_spool()
+    if spool:
+        await spool_webhook(spool, webhook, temporal_payload)
+        deadline.mark("spool")
+        response_headers = {}
+    else:
+        # start_workflow ONLY returns if durable execution actually started
+        statuses = await start_workflow(webhook, temporal_payload, deadline)
+        response_headers = {"Webhook-Destinations": destination_statuses(statuses)}
+
+    if dedupe:
+        dedupe.add(dedupe_key)
+
+    LOG.debug("Webhook %s completed in %s", webhook.id, deadline)
 
-    # if there is absolutely no data to provide, skip enqueuing the webhook
-    data = webhook.data()
-    if not data or data == "{}":
-        LOG.warning(f"No data for webhook {forwarder_slug} {webhook.id} - SKIPPING")
-        return ("", HTTPStatus.BAD_REQUEST)
+    # include the id used to enqueue to Temporal in the response
+    response_headers["Server-Timing"] = deadline.server_timing()
+    return (webhook_id, HTTPStatus.OK, response_headers)
 
-    # create the JSON webhook payload that will be passed to execution
-    temporal_payload = json.dumps({"headers": headers, "data": data})
-    LOG.info(f"Webhook {webhook.id}: %s", temporal_payload)
 
-    # start_workflow ONLY returns if durable execution actually started
-    await start_workflow(webhook, temporal_payload)
+@app.teardown_request
+def close_webhook(exc):
+    # release the received body (and any temp file it spilled to) right away
+    webhook = g.pop("webhook", None)
+    if webhook:
+        webhook.close()
 
-    # include the webhook.id used to enqueue to Temporal in the response
-    return (webhook.id, HTTPStatus.OK)
+
+@app.teardown_request
+def release_admission(exc):
+    admitted = g.pop("webhook_admission", None)
+    if admitted:
+        limiter, deadline = admitted
+        stages = deadline.stages
+        limiter.release(stages.get("start_workflow", stages.get("spool")))
+
+
+@app.after_request
+def record_metrics(response):
+    recorded = g.pop("webhook_metrics", None)
+    if recorded:
+        route_metrics, deadline = recorded
+        route_metrics.count_status(response.status_code)
+        route_metrics.observe_stages(deadline.stages)
+    return response
 
 
 # NOTE: Temporal task queues should typically be configured to allow only ONE
 # instance of a workflow_id active at a time
-async def start_workflow(webhook: WebhookCall, payload):
-    for dest in [webhook.destination()]:
-        try:
-            # NOTE: this really should start on as many destinations as possible and
-            # then abort if any error occured (to give a chance of success to later
-            # destinations in the list.
-            LOG.info(
-                f"Starting {dest.workflow_type} {webhook.id} on queue {dest.task_queue}"
-            )
-            client = await get_temporal_client()
-            handle = await client.start_workflow(
-                dest.workflow_type,
-                payload,
-                # namespace=destination.namespace, # NOT SUPPORTED
-                task_queue=dest.task_queue,
-                id=webhook.id,
-            )
-            return handle
+async def start_workflow(
+    webhook: WebhookCall, payload, deadline: Deadline = None
+) -> dict[TemporalDestination, str]:
+    """
+    Start the webhook's workflow on all of its destinations concurrently (so the
+    latency is that of the slowest destination), returning the status for each
+    destination. Aborts unless the destinations required by Config.fanout_policy
+    (all of them, or a majority) started.
+    """
+    deadline = deadline or Deadline()
+    destinations = webhook.destinations()
 
-        except Exception as e:
-            msg = f"Failed starting workflow {webhook.id} on queue {dest.task_queue} (exception {e})"
-            LOG.error(msg)
-            abort(Response(msg, HTTPStatus.FAILED_DEPENDENCY))
+    # fail fast (with a retryable status) rather than starting RPCs that
+    # cannot complete before the sender gives up on the request
+    try:
+        deadline.check(Config.min_start_budget)
+    except DeadlineExceeded as e:
+        msg = f"Deadline exceeded starting workflow {webhook.id} after {deadline} ({e})"
+        LOG.error(msg)
+        abort(retry_later(msg))
+
+    results = await asyncio.gather(
+        *[
+            start_on_destination(dest, webhook.workflow_id(dest), payload, deadline)
+            for dest in destinations
+        ]
+    )
+    deadline.mark("start_workflow")  # also when failed, for admission control
+    statuses = dict(zip(destinations, results))
+
+    started = sum(1 for status in results if status in (STARTED, ALREADY_STARTED))
+    required = len(destinations)
+    if Config.fanout_policy == FANOUT_QUORUM:
+        required = len(destinations) // 2 + 1
+    if started >= required:
+        return statuses
+
+    msg = (
+        f"Failed starting workflow {webhook.id} on {len(destinations) - started} of "
+        f"{len(destinations)} destinations ({destination_statuses(statuses)})"
+    )
+    LOG.error(msg)
+    if TIMED_OUT in results or UNAVAILABLE in results:
+        abort(retry_later(msg))
+    abort(Response(msg, HTTPStatus.FAILED_DEPENDENCY))
+
+
+async def start_on_destination(
+    dest: TemporalDestination, workflow_id: str, payload, deadline: Deadline
+) -> str:
+    """
+    Start a workflow on a single destination, returning its status
+    """
+    # an endpoint known to be down fails fast, rather than waiting for the RPC to
+    # time out on every request
+    health = get_health()
+    breaker = health.breaker(dest.endpoint) if health else None
+    if breaker and not breaker.allow():
+        LOG.warning(f"Temporal {dest.endpoint} unavailable, not starting {workflow_id}")
+        return UNAVAILABLE
+
+    try:
+        LOG.info(
+            "Starting %s %s on queue %s%s",
+            dest.workflow_type,
+            workflow_id,
+            dest.task_queue,
+            f" with signal {dest.signal}" if dest.signal else "",
+        )
+        await asyncio.wait_for(
+            dispatch_workflow_start(dest, workflow_id, payload, deadline),
+            deadline.remaining(),
+        )
+        if breaker:
+            breaker.record_success()
+        return STARTED
+
+    except WorkflowAlreadyStartedError:
+        # a retry of a webhook that was already started is a success
+        LOG.info(f"Workflow {workflow_id} already started on queue {dest.task_queue}")
+        return ALREADY_STARTED
+
+    except (DeadlineExceeded, asyncio.TimeoutError) as e:
+        LOG.error(
+            f"Deadline exceeded starting workflow {workflow_id} on queue "
+            f"{dest.task_queue} after {deadline} ({e})"
+        )
+        # a start that hung until the deadline (rather than never being attempted
+        # for lack of budget) is how a browned out frontend usually fails
+        if breaker and isinstance(e, asyncio.TimeoutError):
+            breaker.record_failure(e)
+        return TIMED_OUT
+
+    except Exception as e:
+        LOG.error(
+            f"Failed starting workflow {workflow_id} on queue {dest.task_queue} (exception {e})"
+        )
+        if isinstance(e, RPCError) and e.status in BREAKER_STATUSES:
+            if breaker:
+                breaker.record_failure(e)
+            if e.status == RPCStatusCode.DEADLINE_EXCEEDED:
+                return TIMED_OUT
+            return UNAVAILABLE
+        return FAILED
+
+
+def destination_statuses(statuses: dict[TemporalDestination, str]) -> str:
+    """
+    Status of each destination, e.g. for the Webhook-Destinations response header
+    """
+    return ", ".join(
+        f"{dest.namespace}/{dest.task_queue}={status}"
+        for dest, status in statuses.items()
+    )
+
+
+async def spool_webhook(spool, webhook: WebhookCall, payload):
+    loop = asyncio.get_running_loop()
+    try:
+        # appending blocks on fsync, so keep it off the event loop (concurrent
+        # appends for fan-out destinations share an fsync)
+        await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    None,
+                    spool.append,
+                    spool_entry(webhook.workflow_id(dest), dest, payload),
+                )
+                for dest in webhook.destinations()
+            ]
+        )
+    except Exception as e:
+        msg = f"Failed spooling webhook {webhook.id} (exception {e})"
+        LOG.error(msg)
+        abort(retry_later(msg))
+
+
+def retry_later(msg: str, retry_after: int = 1) -> Response:
+    """
+    Response asking the webhook sender to retry the request later
+    """
+    return Response(
+        msg, HTTPStatus.SERVICE_UNAVAILABLE, headers={"Retry-After": str(retry_after)}
+    )
@@ -0,0 +1,165 @@
+"""
+Background health probing of Temporal endpoints.
+
+A prober periodically makes a cheap health check RPC to each distinct Temporal
+endpoint the forwarders route to, keeping a circuit breaker per endpoint. After
+several consecutive failures the breaker opens, and webhooks for that endpoint
+fail fast (with a retryable 503) instead of each waiting for a gRPC timeout.
+The next successful probe (or workflow start) closes it again, so probes act
+as the breaker's half-open trial requests.
+
+/health/temporal reports the state cached after the latest probe round, so
+health checks never connect to Temporal on the request path.
+"""
+
+import logging
+import asyncio
+import time
+from datetime import timedelta
+
+from .temporal_client import default_destination, get_client_registry
+
+LOG = logging.getLogger()
+
+DEFAULT_PROBE_INTERVAL = 5.0
+DEFAULT_PROBE_TIMEOUT = 2.0
+DEFAULT_FAILURE_THRESHOLD = 3  # consecutive failures opening a breaker
+
+HEALTH = None
+
+
+class CircuitBreaker:
+    """
+    Open (failing fast) after failure_threshold consecutive failures, until the
+    next success
+    """
+
+    __slots__ = ("endpoint", "failure_threshold", "failures", "open", "last_error")
+
+    def __init__(self, endpoint: str, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.failures = 0
+        self.open = False
+        self.last_error = None
+
+    def allow(self) -> bool:
+        return not self.open
+
+    def record_success(self):
+        self.failures = 0
+        if self.open:
+            self.open = False
+            LOG.info(f"Temporal {self.endpoint} recovered, circuit closed")
+
+    def record_failure(self, error: Exception):
+        self.failures += 1
+        self.last_error = str(error) or type(error).__name__
+        if not self.open and self.failures >= self.failure_threshold:
+            self.open = True
+            LOG.error(
+                f"Temporal {self.endpoint} failed {self.failures} times, circuit open "
+                f"({self.last_error})"
+            )
+
+    def state(self) -> dict:
+        return {
+            "healthy": not self.open,
+            "consecutive_failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+class HealthProber:
+    def __init__(
+        self,
+        forwarders: dict,
+        interval: float = DEFAULT_PROBE_INTERVAL,
+        timeout: float = DEFAULT_PROBE_TIMEOUT,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+    ):
+        self._forwarders = forwarders
+        self._interval = interval
+        self._timeout = timeout
+        self._failure_threshold = failure_threshold
+        self._breakers = {}  # endpoint -> CircuitBreaker
+        self._task = None
+
+        # (healthy, report) as of the latest probe round
+        self.status = (False, {"healthy": False, "checked": None, "endpoints": {}})
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers.setdefault(
+                endpoint, CircuitBreaker(endpoint, self._failure_threshold)
+            )
+        return breaker
+
+    def endpoints(self) -> dict:
+        """
+        A destination for each distinct endpoint the forwarders route to (which
+        can change as routes are reloaded)
+        """
+        destinations = [default_destination()]
+        for forwarder in list(self._forwarders.values()):
+            destinations += forwarder.destinations()
+        endpoints = {}
+        for dest in destinations:
+            endpoints.setdefault(dest.endpoint, dest)
+        return endpoints
+
+    async def probe(self, dest) -> bool:
+        breaker = self.breaker(dest.endpoint)
+        try:
+            # connects first if needed (e.g. the endpoint was down at startup)
+            client = await asyncio.wait_for(
+                get_client_registry().get(dest), self._timeout
+            )
+            await client.service_client.check_health(
+                timeout=timedelta(seconds=self._timeout)
+            )
+        except Exception as e:
+            breaker.record_failure(e)
+            return False
+        breaker.record_success()
+        return True
+
+    async def probe_all(self):
+        endpoints = self.endpoints()
+        await asyncio.gather(*[self.probe(dest) for dest in endpoints.values()])
+
+        states = {endpoint: self.breaker(endpoint).state() for endpoint in endpoints}
+        healthy = all(state["healthy"] for state in states.values())
+        self.status = (
+            healthy,
+            {"healthy": healthy, "checked": time.time(), "endpoints": states},
+        )
+
+    async def run(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                LOG.error(f"Temporal health probe failed: {e}")
+            await asyncio.sleep(self._interval)
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self.run())
+
+
+def get_health() -> HealthProber:
+    return HEALTH
+
+
+def start_health_prober(config, forwarders: dict) -> HealthProber:
+    """
+    Start probing the Temporal endpoints of all forwarders (must run on the
+    background loop)
+    """
+    global HEALTH
+    if not HEALTH:
+        HEALTH = HealthProber(forwarders, config.health_probe_interval)
+        HEALTH.start()
+    return HEALTH
@@ -7,13 +7,16 @@ from http import HTTPStatus
 
 from flask import Response, abort
 from flask import current_app as app
+from flask import jsonify
 
-from .temporal_client import get_temporal_client
+from .admission import get_admission
+from .dedupe import get_dedupe
+from .dispatcher import get_batcher, get_dispatcher
+from .health import get_health
+from .metrics import get_metrics, render
 
 LOG = logging.getLogger()
 
-from .plugins import WEBHOOK_FORWARDERS
-
 
 @app.route("/")
 @app.route("/health")
@@ -22,30 +25,49 @@ async def healthcheck():
 
 
 @app.route("/health/temporal")
-async def deep_healthcheck():
+def deep_healthcheck():
     # If all Temporal endpoints are alive and accepting workflows, the
     # forwarder is considered healthy. However, if even ONE endpoint
     # fails (even if others are alive) this still reports unhealthy.
-    client = await get_temporal_client()
-    temporal_endpoints = {"default": client}
-
-    # add all Temporal endpoints in use by the forwarders to the healthcheck list
-    for slug, forwarder in WEBHOOK_FORWARDERS.items():
-        for dest in forwarder.destinations():
-            temporal_endpoints[slug] = dest.endpoint
-
-    checked_endpoints = {}
-    for slug, endpoint in temporal_endpoints.items():
-        try:
-            # only check each physical Temporal endpoint once (e.g. multiple
-            # forwarders can share the same Temporal instance)
-            if not endpoint in checked_endpoints:
-                # FIXME: do some sort of keep-alive check against the client for this endpoint
-                checked_endpoints[endpoint] = [slug]
-            else:
-                checked_endpoints[endpoint].append(slug)
-        except Exception as e:
-            LOG.warning(f"Temporal {endpoint} for {slug} failed health check", e)
-            abort(Response("FAILED", HTTPStatus.SERVICE_UNAVAILABLE))  # 503
+    # Endpoints are probed in the background, so this only reads the latest state.
+    health = get_health()
+    if not health:
+        return ("Temporal health not probed", HTTPStatus.SERVICE_UNAVAILABLE)  # 503
 
-    return ("OK", HTTPStatus.OK)  # 200
+    healthy, report = health.status
+    return (jsonify(report), HTTPStatus.OK if healthy else HTTPStatus.SERVICE_UNAVAILABLE)
+
+
+@app.route("/health/stats")
+async def stats():
+    # internal queue depths and service times (for diagnosing backpressure)
+    stats = {}
+
+    dispatcher = get_dispatcher()
+    if dispatcher:
+        stats["dispatcher"] = dispatcher.stats()
+
+    batches = get_batcher().stats()
+    if batches:
+        stats["batches"] = batches
+
+    dedupe = get_dedupe()
+    if dedupe:
+        stats["dedupe"] = dedupe.stats()
+
+    admission = get_admission()
+    if admission:
+        stats["admission"] = admission.stats()
+
+    return (jsonify(stats), HTTPStatus.OK)
+
+
+@app.route("/metrics")
+def metrics():
+    # Prometheus metrics (summed across all worker processes)
+    try:
+        body, content_type = render(get_metrics())
+    except Exception as e:
+        LOG.error(f"Could not render metrics: {e}")
+        abort(Response(str(e), HTTPStatus.NOT_IMPLEMENTED))  # 501
+    return Response(body, HTTPStatus.OK, content_type=content_type)
@@ -0,0 +1,216 @@
+"""
+Non-blocking logging.
+
+Log records are put on an in-memory queue by the request path and written by a
+background listener thread, so request handling never waits on stdout/disk.
+As with the stdlib QueueHandler, each record's message (and any exception) is
+rendered when it is queued, since arguments such as dicts may change before the
+listener gets to them. Only the final formatting (timestamps, text or JSON) and
+the writing are left to the listener.
+
+Webhook payloads contain customer data, so they are only logged for a sampled
+fraction of requests, with sensitive fields redacted and the output truncated.
+"""
+
+import logging
+import atexit
+import copy
+import json
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+LOG = logging.getLogger()
+
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+# personal data fields in Shopify (and similar) webhook payloads and headers
+REDACTED_FIELDS = {
+    "address1",
+    "address2",
+    "browser_ip",
+    "contact_email",
+    "email",
+    "first_name",
+    "last_name",
+    "latitude",
+    "longitude",
+    "phone",
+    "x-shopify-hmac-sha256",
+    "zip",
+}
+REDACTED = "[REDACTED]"
+
+DEFAULT_PAYLOAD_MAX_BYTES = 1024
+
+# LogRecord attributes that are not structured extra fields
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message",
+    "asctime",
+    "taskName",
+    "color_message",  # uvicorn's ANSI colored duplicate of the message
+}
+
+LISTENER = None
+PAYLOAD_LOGGER = None
+
+EXCEPTION_FORMATTER = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, including any extra={...} fields of the record
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues records with their message and exception rendered, leaving formatting
+    the output to the listener thread
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # a copy, since other handlers may still format the original record
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = EXCEPTION_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def redact(value, fields: set = REDACTED_FIELDS):
+    """
+    Copy of a JSON value with the values of any sensitive fields replaced
+    """
+    if isinstance(value, dict):
+        return {
+            k: REDACTED if k.lower() in fields else redact(v, fields)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(v, fields) for v in value]
+    return value
+
+
+class LoggedPayload:
+    """
+    A webhook payload as logged: redacted and truncated, but only when (and if)
+    the log record's message is rendered
+    """
+
+    def __init__(self, payload, max_bytes: int = DEFAULT_PAYLOAD_MAX_BYTES):
+        self._payload = payload
+        self._max_bytes = max_bytes
+
+    def _redacted(self):
+        payload = self._payload
+        if isinstance(payload, (str, bytes)):
+            return redact(json.loads(payload))
+        if not hasattr(payload, "headers"):
+            # envelope already serialized by config.serializer
+            return redact(payload.value())
+
+        # pass-through WebhookEnvelope
+        data = payload.data() if payload.is_json() else f"<{len(payload.body)} bytes>"
+        return redact({"headers": payload.headers, "data": data})
+
+    def __str__(self):
+        try:
+            text = json.dumps(self._redacted())
+        except Exception as e:
+            return f"<unloggable payload: {e}>"
+        if len(text) > self._max_bytes:
+            return f"{text[:self._max_bytes]}... ({len(text)} bytes)"
+        return text
+
+
+class PayloadLogger:
+    """
+    Logs a sampled fraction of webhook payloads (sample_rate 0 logs none, 1 all)
+    """
+
+    def __init__(
+        self, sample_rate: float = 0.0, max_bytes: int = DEFAULT_PAYLOAD_MAX_BYTES
+    ):
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+
+    def log(self, webhook_id: str, payload):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return
+        if LOG.isEnabledFor(logging.INFO):
+            LOG.info(
+                "Webhook %s payload: %s",
+                webhook_id,
+                LoggedPayload(payload, self.max_bytes),
+            )
+
+
+def get_payload_logger() -> PayloadLogger:
+    global PAYLOAD_LOGGER
+    if not PAYLOAD_LOGGER:
+        PAYLOAD_LOGGER = PayloadLogger()
+    return PAYLOAD_LOGGER
+
+
+def _start_listener(formatter: logging.Formatter):
+    global LISTENER
+    records = queue.SimpleQueue()
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(formatter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(records))
+
+    LISTENER = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    LISTENER.start()
+
+
+def _stop_listener():
+    if LISTENER:
+        LISTENER.stop()  # writes any records still queued
+
+
+def configure_logging(config, level: int = logging.INFO):
+    """
+    Route all logging through the background queue listener, as text or JSON
+    (config.log_format), and configure payload logging
+    """
+    global PAYLOAD_LOGGER
+    if config.log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+    logging.getLogger().setLevel(level)
+    _start_listener(formatter)
+    atexit.register(_stop_listener)
+
+    # listener threads do not survive fork, so forked workers start their own
+    os.register_at_fork(after_in_child=lambda: _start_listener(formatter))
+
+    PAYLOAD_LOGGER = PayloadLogger(
+        config.log_payload_sample_rate, config.log_payload_max_bytes
+    )
@@ -0,0 +1,272 @@
+"""
+Prometheus metrics for forwarded webhooks.
+
+Metrics are recorded per (forwarder slug, topic) into plain counters that are
+allocated once per label set, so recording a request is a few list and integer
+updates. Requests are handled on a pool of threads (see asgi), so each label set
+has its own (uncontended in the common case) lock, held for those updates and
+while snapshotting. The prometheus_client package is only needed to render
+/metrics.
+
+With multiple worker processes, each worker periodically writes a snapshot of
+its metrics into a shared directory, and /metrics sums the snapshots of every
+worker (including workers that have since been restarted).
+"""
+
+import logging
+import asyncio
+import bisect
+import glob
+import json
+import os
+import threading
+
+LOG = logging.getLogger()
+
+# latency buckets (seconds) spanning sub-millisecond stages up to Shopify's 5s timeout
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+MAX_ROUTES = 1000  # label sets beyond this (e.g. bogus topic headers) are lumped together
+OVERFLOW_TOPIC = "other"
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+METRICS = None
+
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last bucket is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+
+
+class RouteMetrics:
+    """
+    Metrics for a single (forwarder slug, topic) label set
+    """
+
+    __slots__ = (
+        "stages",
+        "statuses",
+        "verification_failures",
+        "payload_bytes",
+        "_lock",
+    )
+
+    def __init__(self):
+        self.stages = {}  # stage -> Histogram
+        self.statuses = {}  # HTTP status -> count
+        self.verification_failures = 0
+        self.payload_bytes = 0
+        self._lock = threading.Lock()
+
+    def observe_stages(self, stages: dict):
+        with self._lock:
+            for stage, seconds in stages.items():
+                histogram = self.stages.get(stage)
+                if histogram is None:
+                    histogram = self.stages[stage] = Histogram()
+                histogram.observe(seconds)
+
+    def count_status(self, status: int):
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def count_verification_failure(self):
+        with self._lock:
+            self.verification_failures += 1
+
+    def add_payload_bytes(self, size: int):
+        with self._lock:
+            self.payload_bytes += size
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "stages": {s: h.counts + [h.sum] for s, h in self.stages.items()},
+                "statuses": self.statuses.copy(),
+                "verification_failures": self.verification_failures,
+                "payload_bytes": self.payload_bytes,
+            }
+
+
+class ForwarderMetrics:
+    def __init__(self, directory: str = None):
+        self.directory = directory  # shared by all worker processes (or None)
+        self._routes = {}
+        self._lock = threading.Lock()  # only taken to add a label set
+        self._flush_task = None
+
+    def route(self, slug: str, topic: str = None) -> RouteMetrics:
+        """
+        The metrics for a label set, created on first use
+        """
+        key = (slug, topic or "")
+        route = self._routes.get(key)
+        if route is None:
+            with self._lock:
+                route = self._routes.get(key)
+                if route is None and len(self._routes) >= MAX_ROUTES:
+                    key = (slug, OVERFLOW_TOPIC)
+                    route = self._routes.get(key)
+                if route is None:
+                    route = self._routes[key] = RouteMetrics()
+        return route
+
+    def snapshot(self) -> list:
+        with self._lock:
+            routes = list(self._routes.items())
+        return [[slug, topic, route.snapshot()] for (slug, topic), route in routes]
+
+    def flush(self):
+        """
+        Write this process's snapshot into the shared directory
+        """
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + ".tmp", path)
+
+    def snapshots(self) -> list:
+        """
+        Snapshots of every worker process (just this process if not shared)
+        """
+        if not self.directory:
+            return [self.snapshot()]
+
+        self.flush()  # so this worker's latest requests are included
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError) as e:
+                LOG.warning(f"Skipping unreadable metrics snapshot {path}: {e}")
+        return snapshots
+
+    async def run(self, interval: float = DEFAULT_FLUSH_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.flush()
+            except OSError as e:
+                LOG.warning(f"Could not write metrics snapshot: {e}")
+
+
+def merge(snapshots: list) -> dict:
+    """
+    Sum snapshots by (slug, topic)
+    """
+    merged = {}
+    for snapshot in snapshots:
+        for slug, topic, route in snapshot:
+            total = merged.setdefault(
+                (slug, topic),
+                {
+                    "stages": {},
+                    "statuses": {},
+                    "verification_failures": 0,
+                    "payload_bytes": 0,
+                },
+            )
+            for stage, counts in route["stages"].items():
+                current = total["stages"].get(stage)
+                total["stages"][stage] = (
+                    [a + b for a, b in zip(current, counts)] if current else list(counts)
+                )
+            for status, count in route["statuses"].items():
+                total["statuses"][str(status)] = (
+                    total["statuses"].get(str(status), 0) + count
+                )
+            total["verification_failures"] += route["verification_failures"]
+            total["payload_bytes"] += route["payload_bytes"]
+    return merged
+
+
+class _Collector:
+    def __init__(self, metrics: ForwarderMetrics):
+        self._metrics = metrics
+
+    def collect(self):
+        from prometheus_client.core import CounterMetricFamily, HistogramMetricFamily
+
+        labels = ["forwarder", "topic"]
+        stages = HistogramMetricFamily(
+            "webhook_stage_duration_seconds",
+            "Time spent in each stage of forwarding a webhook",
+            labels=labels + ["stage"],
+        )
+        responses = CounterMetricFamily(
+            "webhook_responses",
+            "Webhook responses by HTTP status",
+            labels=labels + ["status"],
+        )
+        failures = CounterMetricFamily(
+            "webhook_verification_failures",
+            "Webhooks that failed verification",
+            labels=labels,
+        )
+        payload_bytes = CounterMetricFamily(
+            "webhook_payload_bytes", "Webhook request body bytes received", labels=labels
+        )
+
+        for (slug, topic), route in merge(self._metrics.snapshots()).items():
+            for stage, counts in route["stages"].items():
+                cumulative, buckets = 0, []
+                for bound, count in zip(BUCKETS + (float("inf"),), counts):
+                    cumulative += count
+                    buckets.append((_bound(bound), cumulative))
+                stages.add_metric([slug, topic, stage], buckets, counts[-1])
+            for status, count in route["statuses"].items():
+                responses.add_metric([slug, topic, status], count)
+            failures.add_metric([slug, topic], route["verification_failures"])
+            payload_bytes.add_metric([slug, topic], route["payload_bytes"])
+
+        return [stages, responses, failures, payload_bytes]
+
+
+def _bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else str(bound)
+
+
+def render(metrics: ForwarderMetrics) -> tuple[bytes, str]:
+    """
+    The metrics in Prometheus text exposition format, and its content type
+    """
+    try:
+        from prometheus_client import (
+            CONTENT_TYPE_LATEST,
+            CollectorRegistry,
+            generate_latest,
+        )
+    except ImportError:
+        raise Exception("/metrics requires the 'prometheus_client' package")
+
+    registry = CollectorRegistry(auto_describe=False)
+    registry.register(_Collector(metrics))
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def get_metrics() -> ForwarderMetrics:
+    global METRICS
+    if not METRICS:
+        METRICS = ForwarderMetrics()
+    return METRICS
+
+
+def start_metrics(config) -> ForwarderMetrics:
+    """
+    Share metrics with other worker processes via config.metrics_dir, if set
+    (must run on the background loop)
+    """
+    metrics = get_metrics()
+    if config.metrics_dir and not metrics.directory:
+        metrics.directory = config.metrics_dir
+        os.makedirs(metrics.directory, exist_ok=True)
+        metrics._flush_task = asyncio.create_task(metrics.run())
+    return metrics
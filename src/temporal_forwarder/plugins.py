@@ -1,61 +1,125 @@
+"""
+Registry of webhook forwarder plugins.
+
+Forwarders are declared as entry points in the "temporal_forwarder.forwarders"
+group, so packages can add forwarders (e.g. Shippo, Shipstation) just by being
+installed:
+
+    [project.entry-points."temporal_forwarder.forwarders"]
+    shippo = "temporal_forwarder_shippo:ShippoForwarder"
+
+with the built-in forwarders always available. Only forwarders enabled by
+config.forwarders are ever imported, each served at /temporal/<slug>. Enabled
+forwarders are imported and created at startup, or with config.lazy_forwarders
+on the first request to their route, so that scaled up containers accept
+connections (e.g. pass readiness checks) as soon as possible.
+"""
+
 import logging
-import importlib
-import os
-import pkgutil
 import sys
-
-from flask import current_app as app
+import threading
+from importlib.metadata import EntryPoint, entry_points
 
 from . import Config
+from .background import run_in_background
 
 LOG = logging.getLogger()
 
-WEBHOOK_FORWARDERS = {}
-#    "generic": temporal_forwarder.webhooks.forwarder_generic.GenericForwarder
-#    "shopify": temporal_forwarder.webhooks.forwarder_shopify.ShopifyForwarder
-#    'shippo': temporal_forwarder.webhooks.forwarder_shippo.ShippoForwarder
-#    'shipstation': temporal_forwarder.webhooks.forwarder_shipstation.ShipstationForwarder
+ENTRY_POINT_GROUP = "temporal_forwarder.forwarders"
 
+BUILTIN_FORWARDERS = {
+    "generic": "temporal_forwarder.webhooks.generic:GenericForwarder",
+    "shopify": "temporal_forwarder.webhooks.shopify:ShopifyForwarder",
+}
 
-def register_plugins(config):
-    # FIXME: poor mans plugin (use config to determine which forwarders to include)
-    register_webhook_forwarder(
-        "shopify", "temporal_forwarder.webhooks.shopify.ShopifyForwarder", config
-    )
-    # register_webhook_forwarder(
-    #    "generic", "temporal_forwarder.webhooks.generic.GenericForwarder", onfig
-    # )
-    return WEBHOOK_FORWARDERS
+WEBHOOK_FORWARDERS = {}  # slug -> created forwarder
+ENABLED_FORWARDERS = {}  # slug -> entry point of an enabled forwarder not yet created
+_LOCK = threading.Lock()
 
 
-def discover_webhook_forwarders():
+def available_forwarders() -> dict[str, EntryPoint]:
     """
-    Forwarders use the naming convention forwarder_{plugin_name} by convention and will auto-load
-    any of the modules discovered based on this. However, these are ONLY ACTIVATED when the
-    correct configuration is added that enables routing/temporal/<slug> to a forwarder.
+    Entry points of all built-in and installed forwarders by slug (nothing is
+    imported until an entry point is loaded)
     """
-    plugin_dir = os.getcwd() + "/temporal_forwarder/webhooks"
-    LOG.debug(f"Searching for forwarder plugins in {plugin_dir}")
-
-    discovered_plugins = {
-        name: importlib.import_module("temporal_forwarder.webhooks." + name)
-        for finder, name, ispkg in pkgutil.iter_modules(path=[plugin_dir])
-        if name.startswith("webhook_")
+    forwarders = {
+        slug: EntryPoint(slug, value, ENTRY_POINT_GROUP)
+        for slug, value in BUILTIN_FORWARDERS.items()
     }
-    print(f"Discovered forwarder plugins: {discovered_plugins}")
+    # installed plugins may also replace a built-in forwarder
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        forwarders[entry_point.name] = entry_point
+    return forwarders
+
+
+def register_plugins(config):
+    """
+    Enable the forwarders in config.forwarders, creating them now unless
+    config.lazy_forwarders is set
+    """
+    available = available_forwarders()
+    for slug in [s.strip() for s in config.forwarders.split(",") if s.strip()]:
+        entry_point = available.get(slug)
+        if not entry_point:
+            LOG.fatal(f"Unknown forwarder {slug} (available: {', '.join(available)})")
+            if Config.fail_on_fatal:
+                sys.exit(1)
+            continue
+
+        ENABLED_FORWARDERS[slug] = entry_point
+        if not config.lazy_forwarders:
+            register_webhook_forwarder(slug, entry_point, config)
+    return WEBHOOK_FORWARDERS
 
 
-def register_webhook_forwarder(
-    forwarder_route: str, module_class_name: str, config: Config
-):
+def register_webhook_forwarder(forwarder_route: str, entry_point: EntryPoint, config):
     """
     Register an WebhookForwarder to a specific externally exposed webhook route
     """
     try:
-        module_name, class_name = module_class_name.rsplit(".", 1)
-        forwarder_class = getattr(importlib.import_module(module_name), class_name)
-        WEBHOOK_FORWARDERS[forwarder_route] = forwarder_class(config)
+        return _create_forwarder(forwarder_route, entry_point, config)
     except Exception as e:
-        LOG.fatal(f"Could not register route {forwarder_route} {class_name}: {e}")
+        LOG.fatal(f"Could not register route {forwarder_route} {entry_point.value}: {e}")
         if Config.fail_on_fatal:
             sys.exit(1)
+
+
+def _create_forwarder(slug: str, entry_point: EntryPoint, config):
+    forwarder_class = entry_point.load()
+    forwarder = forwarder_class(config)
+    forwarder.slug = slug
+    WEBHOOK_FORWARDERS[slug] = forwarder
+    ENABLED_FORWARDERS.pop(slug, None)
+    return forwarder
+
+
+def get_forwarder(slug: str):
+    """
+    The forwarder for a route, creating an enabled forwarder on its first request
+    (None if the forwarder is not enabled)
+    """
+    forwarder = WEBHOOK_FORWARDERS.get(slug)
+    if forwarder or slug not in ENABLED_FORWARDERS:
+        return forwarder
+
+    with _LOCK:
+        forwarder = WEBHOOK_FORWARDERS.get(slug)
+        entry_point = ENABLED_FORWARDERS.get(slug)
+        if forwarder or not entry_point:
+            return forwarder
+
+        LOG.info(f"Loading forwarder {slug} ({entry_point.value})")
+        try:
+            forwarder = _create_forwarder(slug, entry_point, Config)
+        except Exception as e:
+            # the server is already running, so only this route fails
+            LOG.error(f"Could not load forwarder {slug} {entry_point.value}: {e}")
+            return None
+
+        # background services have already started other forwarders
+        run_in_background(_start_forwarder(forwarder))
+        return forwarder
+
+
+async def _start_forwarder(forwarder):
+    forwarder.start()
@@ -0,0 +1,149 @@
+"""
+Projection of webhook bodies down to the fields workflows actually read.
+
+Shopify orders/* and products/* bodies are often tens to hundreds of KB, all of
+which is encrypted, stored in workflow history and replayed, while workflows read
+a handful of fields. Routes may list "include" and/or "exclude" paths, for example:
+
+    {"slug": "shopify", "topic": "orders/*",
+     "include": ["id", "email", "total_price", "line_items[*].sku",
+                 "line_items[*].quantity", "customer.id"],
+     "workflow_type": "ShopifyOrder", "task_queue": "shopify_orders"}
+
+Paths are dotted object keys, where "[*]" steps into every item of an array (a
+leading "[*]" for array bodies). With "include" only the listed paths are kept
+(a path naming an object keeps all of it), and "exclude" then drops its paths.
+
+Paths are compiled once per route into nested closures, so projecting a body is
+a single walk over only the parts of it that are kept.
+"""
+
+import re
+from functools import lru_cache
+
+ITEMS = "[*]"
+
+PATH_SEGMENT = re.compile(r"([^.\[\]]*)((?:\[\*\])*)")
+
+
+def parse_path(path: str) -> tuple[str, ...]:
+    """
+    Keys (and ITEMS) of a path such as "line_items[*].sku", raising ValueError
+    for invalid paths
+    """
+    keys = []
+    for i, segment in enumerate(path.split(".")):
+        match = PATH_SEGMENT.fullmatch(segment)
+        name, items = match.groups() if match else (None, None)
+        if match is None or not (name or (items and i == 0)):
+            raise ValueError(f"Invalid projection path '{path}'")
+        if name:
+            keys.append(name)
+        keys.extend([ITEMS] * (len(items) // len(ITEMS)))
+    return tuple(keys)
+
+
+def _tree(paths) -> dict:
+    """
+    Paths merged into a tree of keys, where None is a whole value
+    """
+    tree = {}
+    for path in paths:
+        *parents, last = parse_path(path)
+        node = tree
+        for key in parents:
+            node = node.setdefault(key, {})
+            if node is None:
+                break  # an ancestor already covers the whole value
+        else:
+            node[last] = None
+    return tree
+
+
+def _keep(value):
+    return value
+
+
+def _compile_include(tree: dict):
+    if tree is None:
+        return _keep
+
+    fields = tuple(
+        (key, _compile_include(sub)) for key, sub in tree.items() if key != ITEMS
+    )
+    items = _compile_include(tree[ITEMS]) if ITEMS in tree else None
+
+    def include(value):
+        if isinstance(value, dict):
+            return {key: f(value[key]) for key, f in fields if key in value}
+        if isinstance(value, list):
+            return [items(item) for item in value] if items else []
+        return value  # scalars (and nulls) where an object was expected are kept
+
+    return include
+
+
+def _compile_exclude(tree: dict):
+    drop = frozenset(key for key, sub in tree.items() if sub is None and key != ITEMS)
+    nested = tuple(
+        (key, _compile_exclude(sub))
+        for key, sub in tree.items()
+        if sub is not None and key != ITEMS
+    )
+    items = None
+    if ITEMS in tree:
+        items = None if tree[ITEMS] is None else _compile_exclude(tree[ITEMS])
+
+    def exclude(value):
+        if isinstance(value, dict):
+            kept = {key: v for key, v in value.items() if key not in drop}
+            for key, f in nested:
+                if key in kept:
+                    kept[key] = f(kept[key])
+            return kept
+        if isinstance(value, list) and ITEMS in tree:
+            return [items(item) for item in value] if items else []
+        return value
+
+    return exclude
+
+
+class Projection:
+    """
+    A compiled include/exclude projection, called with the parsed body
+    """
+
+    __slots__ = ("include", "exclude", "_project")
+
+    def __init__(self, include: tuple = (), exclude: tuple = ()):
+        self.include = tuple(include)
+        self.exclude = tuple(exclude)
+
+        steps = []
+        if self.include:
+            steps.append(_compile_include(_tree(self.include)))
+        if self.exclude:
+            steps.append(_compile_exclude(_tree(self.exclude)))
+
+        if len(steps) == 2:
+            first, second = steps
+            self._project = lambda value: second(first(value))
+        else:
+            self._project = steps[0] if steps else _keep
+
+    def __call__(self, data):
+        return self._project(data)
+
+    def __repr__(self) -> str:
+        return f"Projection(include={list(self.include)}, exclude={list(self.exclude)})"
+
+
+@lru_cache(maxsize=None)
+def compile_projection(include: tuple = (), exclude: tuple = ()) -> Projection:
+    """
+    The (shared) compiled projection for include and exclude paths, or None
+    if there are neither
+    """
+    if not include and not exclude:
+        return None
+    return Projection(include, exclude)
@@ -0,0 +1,368 @@
+"""
+Declarative routing of webhooks to Temporal destinations.
+
+Routes are read from a JSON file (config.routes_file), for example:
+
+    {
+      "defaults": {"namespace": "default"},
+      "routes": [
+        {"slug": "shopify", "topic": "orders/*",
+         "workflow_type": "ShopifyWebhook", "task_queue": "shopify_orders"},
+        {"slug": "shopify", "shop": "big-store.myshopify.com",
+         "workflow_type": "ShopifyWebhook", "task_queue": "big_store"},
+        {"slug": "shopify", "headers": {"X-Shopify-Test": "true"},
+         "namespace": "testing", "workflow_type": "ShopifyWebhook", "task_queue": "test"},
+        {"slug": "shopify", "topic": "orders/*", "fanout": true,
+         "namespace": "reporting", "workflow_type": "OrderReport", "task_queue": "reports"},
+        {"slug": "shopify", "topic": "refunds/create", "signal": "webhook",
+         "resource_key": "order_id", "workflow_type": "ShopifyOrder", "task_queue": "orders"},
+        {"slug": "shopify", "topic": "inventory_levels/update", "batch_size": 100,
+         "batch_wait_ms": 200, "workflow_type": "InventoryBatch", "task_queue": "inventory"},
+        {"slug": "generic", "id_strategy": "content", "id_headers": ["X-Event-Type"],
+         "id_window": 3600, "workflow_type": "GenericWebhook", "task_queue": "generic"},
+        {"slug": "shopify", "topic": "products/*", "include": ["id", "variants[*].sku"],
+         "workflow_type": "ShopifyProduct", "task_queue": "products"}
+      ]
+    }
+
+A route matches on any of the forwarder slug, topic, shop (tenant) domain and
+request header values, where topics, shops and header values may be globs
+(e.g. "orders/*"). Shop domains are matched case-insensitively (as tenants are
+in secret_store). The first matching route in the file wins, and webhooks
+matching no route go to their forwarder's default destination. Destination
+fields a route omits come from "defaults", then the endpoint and namespace the
+forwarder was started with. Fan-out routes ("fanout": true) instead add their
+destination to that of the first matching route, and every matching fan-out
+route is used. Routes with a "signal" and "resource_key" deliver webhooks for
+the same resource as signals to one workflow (see TemporalDestination), and
+routes with a "batch_size" start one workflow per batch of webhooks (see
+batching). Routes with "id_strategy": "content" derive workflow ids from the
+request content (see WebhookCall.content_id). Routes with "include" or
+"exclude" paths project the bodies of webhooks they match down to those fields
+(see projection).
+
+Routes are compiled once: routes matching only exact slugs, topics and shops
+are indexed by (slug, topic, shop), so resolving them is a few dict lookups,
+and only glob or header routes are matched one by one. Every route resolves to
+a single shared (immutable) TemporalDestination. The routes file is re-read
+whenever it changes, so hot topics can be moved onto their own task queues
+without a restart. Each webhook is matched once (see RoutingTable.match), so its
+destinations and projection always come from the same version of the routes.
+"""
+
+import logging
+import asyncio
+import fnmatch
+import json
+import os
+import re
+
+from . import ID_CONTENT, Config, TemporalDestination
+from .projection import Projection, compile_projection
+
+LOG = logging.getLogger()
+
+MATCH_FIELDS = ("slug", "topic", "shop", "headers", "fanout")
+PROJECTION_FIELDS = ("include", "exclude")
+DESTINATION_FIELDS = (
+    "endpoint",
+    "namespace",
+    "workflow_type",
+    "task_queue",
+    "signal",
+    "resource_key",
+    "batch_size",
+    "batch_wait_ms",
+    "id_strategy",
+    "id_headers",
+    "id_window",
+)
+GLOB_CHARACTERS = re.compile(r"[*?\[]")
+
+DEFAULT_RELOAD_INTERVAL = 5.0  # seconds between checks of the routes file
+
+ROUTING_TABLE = None
+ROUTE_WATCHER = None
+
+
+def _is_glob(value: str) -> bool:
+    return bool(GLOB_CHARACTERS.search(value))
+
+
+def _matcher(value: str):
+    """
+    Compiled test for an optional (glob) value
+    """
+    if value is None:
+        return None
+    if _is_glob(value):
+        return re.compile(fnmatch.translate(value)).match
+    return value.__eq__
+
+
+class Route:
+    """
+    A compiled route (order is its position in the routes file)
+    """
+
+    __slots__ = ("order", "slug", "topic", "shop", "headers", "destination", "projection")
+
+    def __init__(
+        self,
+        order: int,
+        spec: dict,
+        destination: TemporalDestination,
+        projection: Projection = None,
+    ):
+        self.order = order
+        self.slug = spec.get("slug")
+        self.topic = _matcher(spec.get("topic"))
+        self.shop = _matcher(_lower(spec.get("shop")))
+        self.headers = tuple(
+            (name, _matcher(value)) for name, value in spec.get("headers", {}).items()
+        )
+        self.destination = destination
+        self.projection = projection
+
+    def matches(self, slug: str, topic: str, shop: str, headers) -> bool:
+        if self.slug is not None and self.slug != slug:
+            return False
+        if self.topic and (topic is None or not self.topic(topic)):
+            return False
+        if self.shop and (shop is None or not self.shop(shop)):
+            return False
+        for name, matches in self.headers:
+            value = headers.get(name) if headers is not None else None
+            if value is None or not matches(value):
+                return False
+        return True
+
+
+class ResolvedRoute:
+    """
+    Everything the routes say about a single webhook, resolved together from one
+    version of the routes: the destination and projection of the first matching
+    route (None if no route matches) and the destinations of matching fan-out routes
+    """
+
+    __slots__ = ("destination", "projection", "fanout")
+
+    def __init__(
+        self,
+        destination: TemporalDestination = None,
+        projection: Projection = None,
+        fanout: tuple = (),
+    ):
+        self.destination = destination
+        self.projection = projection
+        self.fanout = fanout
+
+
+def _lower(value: str) -> str:
+    return value.lower() if value else value
+
+
+def _exact(spec: dict) -> bool:
+    return not spec.get("headers") and not any(
+        _is_glob(spec.get(field) or "") for field in ("topic", "shop")
+    )
+
+
+def compile_routes(routes: list, defaults: dict = None) -> tuple:
+    """
+    Compile route specs into an (exact index, pattern routes, fan-out routes, all
+    routes) tuple, raising ValueError for any invalid route
+    """
+    defaults = {
+        "endpoint": Config.temporal_endpoint,
+        "namespace": Config.temporal_namespace,
+    } | (defaults or {})
+
+    index = {}
+    patterns = []
+    fanout = []
+    compiled = []
+    destinations = {}  # identical destinations are shared by all their routes
+    for order, spec in enumerate(routes):
+        unknown = (
+            set(spec)
+            - set(MATCH_FIELDS)
+            - set(DESTINATION_FIELDS)
+            - set(PROJECTION_FIELDS)
+        )
+        if unknown:
+            raise ValueError(f"Route {order} has unknown fields {sorted(unknown)}")
+
+        fields = {f: spec.get(f, defaults.get(f)) for f in DESTINATION_FIELDS}
+        if not fields["workflow_type"] or not fields["task_queue"]:
+            raise ValueError(f"Route {order} needs a workflow_type and task_queue")
+        if bool(fields["signal"]) != bool(fields["resource_key"]):
+            raise ValueError(f"Route {order} needs both a signal and resource_key")
+        if fields["batch_size"] and fields["signal"]:
+            raise ValueError(f"Route {order} cannot both batch and signal webhooks")
+        if fields["id_strategy"] not in (None, ID_CONTENT):
+            raise ValueError(
+                f"Route {order} has unknown id_strategy {fields['id_strategy']}"
+            )
+        if fields["id_strategy"] and fields["signal"]:
+            raise ValueError(
+                f"Route {order} signals by resource, so cannot use id_strategy"
+            )
+        if isinstance(fields["id_headers"], list):
+            fields["id_headers"] = ",".join(fields["id_headers"])
+
+        key = tuple(fields.values())
+        destination = destinations.get(key)
+        if destination is None:
+            destination = destinations[key] = TemporalDestination(**fields)
+
+        # every destination of a webhook is sent the same payload, so only the
+        # first matching (non fan-out) route projects it
+        paths = {f: spec.get(f) or () for f in PROJECTION_FIELDS}
+        if not all(
+            isinstance(p, (list, tuple)) and all(isinstance(path, str) for path in p)
+            for p in paths.values()
+        ):
+            raise ValueError(f"Route {order} include and exclude must be lists of paths")
+        if spec.get("fanout") and any(paths.values()):
+            raise ValueError(f"Route {order} is a fan-out route, so cannot project")
+        projection = compile_projection(tuple(paths["include"]), tuple(paths["exclude"]))
+
+        route = Route(order, spec, destination, projection)
+        compiled.append(route)
+        if spec.get("fanout"):
+            fanout.append(route)
+        elif _exact(spec):
+            # an earlier route with the same match always wins
+            index.setdefault(
+                (spec.get("slug"), spec.get("topic"), _lower(spec.get("shop"))), route
+            )
+        else:
+            patterns.append(route)
+
+    return index, tuple(patterns), tuple(fanout), tuple(compiled)
+
+
+def _first_match(compiled: tuple, slug: str, topic: str, shop: str, headers) -> Route:
+    """
+    The first route (in file order) matching a webhook, or None
+    """
+    index, patterns, _, _ = compiled
+
+    best = None
+    for s in (slug, None):
+        for t in (topic, None):
+            for d in (shop, None):
+                route = index.get((s, t, d))
+                if route and (best is None or route.order < best.order):
+                    best = route
+
+    for route in patterns:
+        if best and route.order > best.order:
+            break  # patterns are in file order
+        if route.matches(slug, topic, shop, headers):
+            best = route
+            break
+
+    return best
+
+
+class RoutingTable:
+    def __init__(self, routes: list = (), defaults: dict = None):
+        self.load(routes, defaults)
+
+    def load(self, routes: list, defaults: dict = None):
+        """
+        Compile and replace all routes (requests in flight see either the old or
+        the new routes, never a mix)
+        """
+        self._compiled = compile_routes(routes, defaults)
+
+    def match(
+        self, slug: str, topic: str = None, shop: str = None, headers=None
+    ) -> ResolvedRoute:
+        """
+        Resolve the routes matching a webhook, all from the same version of the
+        routes (even if they are reloaded meanwhile)
+        """
+        compiled = self._compiled
+        shop = _lower(shop)
+        route = _first_match(compiled, slug, topic, shop, headers)
+        fanout = tuple(
+            r.destination for r in compiled[2] if r.matches(slug, topic, shop, headers)
+        )
+        if route is None:
+            return ResolvedRoute(fanout=fanout)
+        return ResolvedRoute(route.destination, route.projection, fanout)
+
+    def destinations(self, slug: str = None) -> list[TemporalDestination]:
+        """
+        Destinations webhooks (for a forwarder slug) could be routed to
+        """
+        destinations = []
+        for route in self._compiled[3]:
+            if (
+                slug is None or route.slug in (None, slug)
+            ) and route.destination not in destinations:
+                destinations.append(route.destination)
+        return destinations
+
+
+def load_routes_file(path: str) -> tuple[list, dict]:
+    """
+    Routes and destination defaults from a JSON routes file
+    """
+    with open(path) as f:
+        table = json.load(f)
+    return table.get("routes", []), table.get("defaults", {})
+
+
+def get_routing_table() -> RoutingTable:
+    """
+    The routing table shared by all forwarders (empty unless config.routes_file
+    is set, so every webhook goes to its forwarder's default destination)
+    """
+    global ROUTING_TABLE
+    if not ROUTING_TABLE:
+        if Config.routes_file:
+            routes, defaults = load_routes_file(Config.routes_file)
+            ROUTING_TABLE = RoutingTable(routes, defaults)
+            LOG.info(f"Loaded {len(routes)} routes from {Config.routes_file}")
+        else:
+            ROUTING_TABLE = RoutingTable()
+    return ROUTING_TABLE
+
+
+async def watch_routes_file(
+    table: RoutingTable, path: str, interval: float = DEFAULT_RELOAD_INTERVAL
+):
+    """
+    Reload the routing table whenever the routes file is modified
+    """
+    mtime = os.stat(path).st_mtime
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            modified = os.stat(path).st_mtime
+            if modified == mtime:
+                continue
+            mtime = modified
+
+            routes, defaults = load_routes_file(path)
+            table.load(routes, defaults)
+            LOG.info(f"Reloaded {len(routes)} routes from {path}")
+        except Exception as e:
+            # keep routing with the current routes until the file is fixed
+            LOG.error(f"Could not reload routes from {path}: {e}")
+
+
+def start_route_watcher() -> asyncio.Task:
+    """
+    Watch the routes file for changes, if one is configured (must run on the
+    background loop)
+    """
+    global ROUTE_WATCHER
+    table = get_routing_table()
+    if Config.routes_file and not ROUTE_WATCHER:
+        ROUTE_WATCHER = asyncio.create_task(watch_routes_file(table, Config.routes_file))
+    return ROUTE_WATCHER
@@ -0,0 +1,120 @@
+"""
+Per-tenant webhook signing secrets.
+
+Secrets are keyed by tenant (e.g. Shopify shop domain), and each tenant can
+have several valid secrets while a secret is being rotated. Each secret is
+encoded and keyed into an HMAC once when loaded, and requests copy these
+pre-keyed prototypes rather than keying a new HMAC per request.
+
+Secrets are read from either:
+
+    a JSON file - {"<tenant>": "<secret>" or ["<secret>", ...], ...}
+    a directory - one file per tenant named after it, with one secret per line
+
+and are re-read whenever the file (or any file in the directory) changes.
+"""
+
+import logging
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+
+LOG = logging.getLogger()
+
+DEFAULT_RELOAD_INTERVAL = 5.0  # seconds between checks for changed secrets
+
+
+class SecretStore:
+    """
+    Pre-keyed HMAC prototypes by tenant, plus default secrets for any tenant
+    without its own
+    """
+
+    def __init__(
+        self, secrets: dict = None, default: list = (), digestmod=hashlib.sha256
+    ):
+        self._digestmod = digestmod
+        self.load(secrets or {}, default)
+
+    def _prototypes(self, secrets) -> tuple:
+        if isinstance(secrets, str):
+            secrets = [secrets]
+        return tuple(
+            hmac.new(secret.encode("utf-8"), digestmod=self._digestmod)
+            for secret in secrets
+            if secret
+        )
+
+    def load(self, secrets: dict, default: list = ()):
+        """
+        Replace all secrets (requests in flight keep the secrets they started with)
+        """
+        tenants = {tenant.lower(): self._prototypes(s) for tenant, s in secrets.items()}
+        self._secrets = (tenants, self._prototypes(default))
+
+    def __len__(self) -> int:
+        return len(self._secrets[0])
+
+    def hmacs(self, tenant: str = None) -> list:
+        """
+        New HMAC objects for each valid secret of a tenant (empty if it has none)
+        """
+        tenants, default = self._secrets
+        prototypes = tenants.get(tenant.lower(), default) if tenant else default
+        return [prototype.copy() for prototype in prototypes]
+
+
+def load_secrets(path: str) -> dict:
+    """
+    Secrets by tenant from a JSON file or a directory of per-tenant files
+    """
+    if not os.path.isdir(path):
+        with open(path) as f:
+            return json.load(f)
+
+    secrets = {}
+    for name in os.listdir(path):
+        file = os.path.join(path, name)
+        if name.startswith(".") or not os.path.isfile(file):
+            continue
+        with open(file) as f:
+            secrets[name] = [line.strip() for line in f if line.strip()]
+    return secrets
+
+
+def _modified(path: str) -> float:
+    """
+    Latest modification time of a file, or of a directory and its files
+    """
+    mtime = os.stat(path).st_mtime
+    if os.path.isdir(path):
+        for entry in os.scandir(path):
+            mtime = max(mtime, entry.stat().st_mtime)
+    return mtime
+
+
+async def watch_secrets(
+    store: SecretStore,
+    path: str,
+    default: list = (),
+    interval: float = DEFAULT_RELOAD_INTERVAL,
+):
+    """
+    Reload the secret store whenever its file or directory is modified
+    """
+    mtime = _modified(path)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            modified = _modified(path)
+            if modified == mtime:
+                continue
+            mtime = modified
+
+            store.load(load_secrets(path), default)
+            LOG.info(f"Reloaded secrets for {len(store)} tenants from {path}")
+        except Exception as e:
+            # keep verifying with the current secrets until the file is fixed
+            LOG.error(f"Could not reload secrets from {path}: {e}")
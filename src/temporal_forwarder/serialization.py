@@ -0,0 +1,145 @@
+"""
+Serializers for the {"headers": ..., "data": ...} webhook envelope.
+
+By default the envelope is serialized to a JSON string, which Temporal's JSON
+converter then serializes again (as a JSON string literal). With
+config.serializer set, the envelope is instead serialized once, straight into
+the Temporal payload data, with the format in the payload metadata:
+
+    json     metadata["encoding"] = "json/plain"      (stdlib json)
+    orjson   metadata["encoding"] = "json/plain"      (requires 'orjson')
+    msgpack  metadata["encoding"] = "binary/msgpack"  (requires 'msgpack')
+
+"json/plain" payloads decode with Temporal's default converter in any SDK
+(workflows take a dict/object argument rather than a string), and workers
+decode "binary/msgpack" with any MessagePack library (Python workers can
+register envelope.WebhookPayloadConverter). The serializer's JSON parser (e.g.
+orjson) is also used for parsing JSON webhook bodies.
+"""
+
+import base64
+import json
+from dataclasses import dataclass
+
+SERIALIZER_JSON = "json"
+SERIALIZER_ORJSON = "orjson"
+SERIALIZER_MSGPACK = "msgpack"
+
+JSON_ENCODING = "json/plain"
+MSGPACK_ENCODING = "binary/msgpack"
+
+SERIALIZERS = {}
+
+
+def _orjson():
+    try:
+        import orjson
+    except ImportError:
+        raise Exception("orjson serialization requires the 'orjson' package")
+    return orjson
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise Exception("msgpack serialization requires the 'msgpack' package")
+    return msgpack
+
+
+class JsonSerializer:
+    name = SERIALIZER_JSON
+    encoding = JSON_ENCODING
+
+    def dumps(self, value) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: bytes):
+        return json.loads(data)
+
+    def parse_json(self, data: bytes):
+        """
+        Parse a JSON webhook body
+        """
+        return json.loads(data)
+
+
+class OrjsonSerializer(JsonSerializer):
+    name = SERIALIZER_ORJSON
+
+    def __init__(self):
+        orjson = _orjson()
+        self.dumps = orjson.dumps
+        self.loads = self.parse_json = orjson.loads
+
+
+class MsgpackSerializer(JsonSerializer):
+    name = SERIALIZER_MSGPACK
+    encoding = MSGPACK_ENCODING
+
+    def __init__(self):
+        msgpack = _msgpack()
+        # packb rather than a shared Packer, which is not thread-safe
+        self.dumps = msgpack.packb
+        self.loads = msgpack.unpackb
+
+
+SERIALIZER_CLASSES = {
+    SERIALIZER_JSON: JsonSerializer,
+    SERIALIZER_ORJSON: OrjsonSerializer,
+    SERIALIZER_MSGPACK: MsgpackSerializer,
+}
+
+
+def get_serializer(name: str = SERIALIZER_JSON) -> JsonSerializer:
+    """
+    The (shared) serializer with the given name (stdlib json if None)
+    """
+    name = name or SERIALIZER_JSON
+    serializer = SERIALIZERS.get(name)
+    if not serializer:
+        if name not in SERIALIZER_CLASSES:
+            raise ValueError(f"Unsupported serializer {name}")
+        serializer = SERIALIZERS[name] = SERIALIZER_CLASSES[name]()
+    return serializer
+
+
+def serializer_for_encoding(encoding: str) -> JsonSerializer:
+    """
+    A serializer able to decode payloads with the given encoding
+    """
+    if encoding == MSGPACK_ENCODING:
+        return get_serializer(SERIALIZER_MSGPACK)
+    if encoding == JSON_ENCODING:
+        return get_serializer(SERIALIZER_JSON)
+    raise ValueError(f"Unsupported serialized encoding {encoding}")
+
+
+@dataclass
+class SerializedEnvelope:
+    """
+    A webhook envelope already serialized into the Temporal payload data
+    """
+
+    data: bytes
+    encoding: str
+
+    @classmethod
+    def serialize(cls, serializer: JsonSerializer, value) -> "SerializedEnvelope":
+        return cls(serializer.dumps(value), serializer.encoding)
+
+    def value(self):
+        return serializer_for_encoding(self.encoding).loads(self.data)
+
+    def to_json_dict(self) -> dict:
+        """
+        JSON serializable form (e.g. for spooling to disk)
+        """
+        return {
+            "encoding": self.encoding,
+            "data": base64.b64encode(self.data).decode("ascii"),
+        }
+
+    @classmethod
+    def from_json_dict(cls, value: dict) -> "SerializedEnvelope":
+        return cls(base64.b64decode(value["data"]), value["encoding"])
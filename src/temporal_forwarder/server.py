@@ -0,0 +1,134 @@
+"""
+Production ASGI server: one uvicorn server (with a single long-lived uvloop
+event loop) per worker process.
+
+Every worker binds its own listening socket with SO_REUSEPORT so the kernel
+load balances connections across workers, with no accept lock or shared
+listener. On SIGTERM each worker stops accepting connections and drains any
+in-flight requests before shutting down.
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import tempfile
+import time
+
+LOG = logging.getLogger()
+
+DEFAULT_KEEP_ALIVE = 75  # longer than typical upstream load balancer idle timeouts
+DEFAULT_GRACEFUL_TIMEOUT = 30
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(
+    index: int,
+    flask_app,
+    config,
+    host: str,
+    port: int,
+    keep_alive: int = DEFAULT_KEEP_ALIVE,
+    graceful_timeout: int = DEFAULT_GRACEFUL_TIMEOUT,
+    workers: int = 1,
+):
+    """
+    Serve the forwarder in this process until SIGTERM/SIGINT
+    """
+    import uvicorn
+
+    from .asgi import create_asgi_app
+    from .spool import orphaned_spool_dirs, worker_spool_dir
+
+    if workers > 1:
+        # forked workers must not run the supervisor's signal handlers
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    # each worker needs its own spool, and drains those of workers that no longer
+    # exist (so webhooks they accepted are not stranded)
+    if config.spool_dir:
+        base = config.spool_dir
+        config.spool_adopt_dirs = tuple(orphaned_spool_dirs(base, index, workers))
+        config.spool_dir = worker_spool_dir(base, index, workers)
+
+    ssl = {}
+    if config.ssl_cert and config.ssl_key:
+        ssl = {"ssl_certfile": config.ssl_cert, "ssl_keyfile": config.ssl_key}
+
+    server = uvicorn.Server(
+        uvicorn.Config(
+            create_asgi_app(flask_app, config),
+            loop="uvloop",
+            lifespan="on",
+            timeout_keep_alive=keep_alive,
+            timeout_graceful_shutdown=graceful_timeout,
+            log_config=None,
+            **ssl,
+        )
+    )
+    LOG.info(f"Worker {index} (pid {os.getpid()}) serving on {host}:{port}")
+    server.run(sockets=[bind_socket(host, port)])
+
+
+def serve(flask_app, config, host: str, port: int, workers: int = 1, **kwargs):
+    """
+    Run the ASGI server with the given number of worker processes, restarting any
+    worker that dies until the server is asked to shut down.
+    """
+    if workers <= 1:
+        return run_worker(0, flask_app, config, host, port, **kwargs)
+
+    # workers share metrics through snapshot files, so /metrics on any worker
+    # reports totals across all of them
+    if not config.metrics_dir:
+        config.metrics_dir = tempfile.mkdtemp(prefix="temporal-forwarder-metrics-")
+
+    # fork (rather than spawn) so workers inherit registered forwarder plugins
+    context = multiprocessing.get_context("fork")
+    processes = {}
+    stopping = False
+
+    def start(index):
+        process = context.Process(
+            target=run_worker,
+            args=(index, flask_app, config, host, port),
+            kwargs=kwargs | {"workers": workers},
+            name=f"temporal-forwarder-{index}",
+        )
+        process.start()
+        processes[index] = process
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        LOG.info(f"Received signal {signum}, draining {len(processes)} workers")
+        for process in processes.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for index in range(workers):
+        start(index)
+
+    while not stopping:
+        for index, process in list(processes.items()):
+            if not process.is_alive() and not stopping:
+                LOG.error(f"Worker {index} exited ({process.exitcode}), restarting")
+                start(index)
+        time.sleep(1)
+
+    for process in processes.values():
+        process.join()
@@ -0,0 +1,47 @@
+"""
+Startup and shutdown of the background services used by the forwarder routes
+"""
+
+import logging
+
+from .admission import start_admission
+from .dedupe import start_dedupe, stop_dedupe
+from .dispatcher import start_dispatcher
+from .encryption_keys import start_key_watcher
+from .health import start_health_prober
+from .metrics import start_metrics
+from .routing import start_route_watcher
+from .serialization import get_serializer
+from .spool import start_spool, stop_spool
+from .temporal_client import start_client_registry
+
+LOG = logging.getLogger()
+
+
+async def start_services(config, forwarders: dict):
+    """
+    Start all configured background services (must run on the background loop)
+    """
+    if config.serializer:
+        get_serializer(config.serializer)  # fail now if its package is missing
+    # connect to all Temporal destinations up front, rather than on the first webhook
+    await start_client_registry(forwarders)
+    start_health_prober(config, forwarders)
+    start_dispatcher(config)
+    start_admission(config)
+    start_dedupe(config)
+    start_spool(config)
+    start_key_watcher()
+    start_route_watcher()
+    for forwarder in forwarders.values():
+        forwarder.start()
+    start_metrics(config)
+
+
+async def stop_services():
+    """
+    Gracefully stop background services, finishing any in-flight work
+    """
+    await stop_spool()
+    stop_dedupe()
+    LOG.info("Background services stopped")
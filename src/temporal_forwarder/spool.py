@@ -0,0 +1,580 @@
+"""
+Durable local spool for accepted webhooks.
+
+When enabled, a webhook is acknowledged as soon as its Temporal payload has
+been appended (and fsynced) to a segmented append-only log on local disk. A
+background drainer then starts the workflows with bounded concurrency and
+checkpoints its progress, so ingest latency depends on the local disk rather
+than the round trip to Temporal.
+
+On-disk layout (one process per spool directory):
+
+    LOCK                   exclusive flock held by the owning process
+    checkpoint.json        {"segment": N, "offset": X} of the first undelivered record
+    spool-000000000001.log records: <length:u32><crc32:u32><JSON entry>
+    dead-letter.jsonl      entries that could not be delivered, one JSON per line
+
+After a crash every record past the checkpoint is delivered again. This is
+safe since workflow ids are idempotent (an already started workflow counts as
+delivered).
+
+Transient failures (Temporal unavailable, timeouts) are retried until they
+succeed, since every later record would fail the same way. Anything else (e.g.
+an unknown namespace, an invalid request or a codec error) will never succeed,
+so the entry is moved to the dead letter file once it is rejected by Temporal
+or has failed max_attempts times, and the checkpoint moves past it.
+"""
+
+import logging
+import asyncio
+import collections
+import dataclasses
+import fcntl
+import json
+import os
+import re
+import struct
+import threading
+import zlib
+
+from temporalio.exceptions import WorkflowAlreadyStartedError
+from temporalio.service import RPCError, RPCStatusCode
+
+from . import TemporalDestination
+from .background import run_in_background
+from .dispatcher import dispatch_workflow_start
+from .envelope import WebhookEnvelope
+from .serialization import SerializedEnvelope
+
+LOG = logging.getLogger()
+
+SEGMENT_PREFIX = "spool-"
+SEGMENT_SUFFIX = ".log"
+CHECKPOINT_FILE = "checkpoint.json"
+LOCK_FILE = "LOCK"
+DEAD_LETTER_FILE = "dead-letter.jsonl"
+WORKER_DIR = re.compile(r"worker-(\d+)$")
+
+RECORD_HEADER = struct.Struct("<II")  # payload length, crc32 of payload
+
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+DEFAULT_DRAIN_CONCURRENCY = 16
+DEFAULT_MAX_ATTEMPTS = 5  # before an entry failing with a non-transient error is dead
+
+# RPC statuses worth retrying indefinitely (any other RPC error is permanent)
+TRANSIENT_STATUSES = frozenset(
+    {
+        RPCStatusCode.UNAVAILABLE,
+        RPCStatusCode.DEADLINE_EXCEEDED,
+        RPCStatusCode.RESOURCE_EXHAUSTED,
+        RPCStatusCode.ABORTED,
+        RPCStatusCode.CANCELLED,
+    }
+)
+
+SPOOL = None
+DRAINER = None
+ADOPTED = []  # drainers of adopted spools
+
+
+@dataclasses.dataclass
+class SpoolRecord:
+    segment: int
+    offset: int  # start of this record
+    end: int  # start of the following record
+    entry: dict
+
+
+class WebhookSpool:
+    """
+    Segmented append-only log of webhook entries awaiting delivery to Temporal
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        fsync: bool = True,
+    ):
+        self._dir = directory
+        self._segment_bytes = segment_bytes
+        self._fsync = fsync
+
+        # appenders serialize on _lock, while fsyncs are batched under _sync_lock
+        # so that concurrent appends can share a single fsync (group commit)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._appended = 0
+        self._synced = 0
+        self._listeners = []
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock_fd = os.open(
+            os.path.join(directory, LOCK_FILE), os.O_RDWR | os.O_CREAT
+        )
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(self._lock_fd)
+            raise Exception(f"Spool {directory} is already in use by another process")
+
+        self._recover()
+
+        # always start appending to a fresh segment
+        segments = self.segments()
+        self._segment = (segments[-1] + 1) if segments else 1
+        self._open_segment()
+
+    @property
+    def directory(self) -> str:
+        return self._dir
+
+    def segments(self) -> list[int]:
+        """
+        Sequence numbers of all segments currently on disk (ascending)
+        """
+        numbers = []
+        for name in os.listdir(self._dir):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                numbers.append(int(name[len(SEGMENT_PREFIX) : -len(SEGMENT_SUFFIX)]))
+        return sorted(numbers)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self._dir, f"{SEGMENT_PREFIX}{segment:012d}{SEGMENT_SUFFIX}")
+
+    def _open_segment(self):
+        self._fd = os.open(
+            self._segment_path(self._segment),
+            os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+            0o600,
+        )
+        self._size = os.fstat(self._fd).st_size
+        self._fsync_dir()
+
+    def _fsync_dir(self):
+        if self._fsync:
+            dir_fd = os.open(self._dir, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def _recover(self):
+        """
+        Truncate any torn record at the tail of the last segment left by a crash
+        """
+        segments = self.segments()
+        if not segments:
+            return
+
+        path = self._segment_path(segments[-1])
+        _, end = self._scan(segments[-1], 0)
+        if end < os.path.getsize(path):
+            LOG.warning(f"Truncating torn spool record in {path} at offset {end}")
+            os.truncate(path, end)
+        LOG.info(f"Recovered spool {self._dir} ({len(segments)} segments)")
+
+    def add_listener(self, callback):
+        """
+        Register a callback invoked (from the appending thread) after each append
+        """
+        self._listeners.append(callback)
+
+    def append(self, entry: dict):
+        """
+        Durably append an entry; returns only once the entry is on stable storage
+        """
+        data = json.dumps(entry, separators=(",", ":")).encode("utf-8")
+        record = RECORD_HEADER.pack(len(data), zlib.crc32(data)) + data
+
+        with self._lock:
+            view = memoryview(record)
+            while view:
+                written = os.write(self._fd, view)
+                view = view[written:]
+            self._size += len(record)
+            self._appended += 1
+            seq = self._appended
+
+        self._sync(seq)
+
+        for callback in self._listeners:
+            callback()
+
+    def _sync(self, seq: int):
+        with self._sync_lock:
+            if self._synced >= seq:
+                return  # already covered by a concurrent fsync
+
+            with self._lock:
+                fd, target = self._fd, self._appended
+            if self._fsync:
+                os.fsync(fd)
+            self._synced = max(self._synced, target)
+
+            if self._size >= self._segment_bytes:
+                with self._lock:
+                    self._roll()
+
+    def _roll(self):
+        # records appended after the last fsync must reach disk before sealing
+        if self._fsync:
+            os.fsync(self._fd)
+        os.close(self._fd)
+        self._synced = self._appended
+
+        self._segment += 1
+        self._open_segment()
+
+    def _scan(self, segment: int, offset: int, limit: int = None):
+        """
+        Read complete, valid records from a segment starting at offset, returning
+        the records and the offset just past the last valid record.
+        """
+        records = []
+        try:
+            f = open(self._segment_path(segment), "rb")
+        except FileNotFoundError:
+            return records, offset
+
+        with f:
+            f.seek(offset)
+            while limit is None or len(records) < limit:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    break
+                length, crc = RECORD_HEADER.unpack(header)
+                data = f.read(length)
+                if len(data) < length or zlib.crc32(data) != crc:
+                    break
+
+                end = offset + RECORD_HEADER.size + length
+                records.append(SpoolRecord(segment, offset, end, json.loads(data)))
+                offset = end
+        return records, offset
+
+    def read(self, position: tuple[int, int], limit: int = 256):
+        """
+        Read up to limit records from position (segment, offset), returning the
+        records and the position to continue reading from.
+        """
+        segment, offset = position
+        while True:
+            # a segment is sealed once a later one exists, so check this before
+            # scanning to avoid racing with the writer rolling over to a new segment
+            later = [s for s in self.segments() if s > segment]
+            records, offset = self._scan(segment, offset, limit)
+            if records or not later:
+                return records, (segment, offset)
+
+            if offset < os.path.getsize(self._segment_path(segment)):
+                LOG.error(f"Skipping corrupt spool data in segment {segment} at {offset}")
+            segment, offset = later[0], 0
+
+    def load_checkpoint(self) -> tuple[int, int]:
+        try:
+            with open(os.path.join(self._dir, CHECKPOINT_FILE)) as f:
+                checkpoint = json.load(f)
+            return (checkpoint["segment"], checkpoint["offset"])
+        except FileNotFoundError:
+            segments = self.segments()
+            return (segments[0] if segments else 1, 0)
+
+    def checkpoint(self, position: tuple[int, int]):
+        """
+        Atomically persist the delivery position and delete fully drained segments
+        """
+        segment, offset = position
+        path = os.path.join(self._dir, CHECKPOINT_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"segment": segment, "offset": offset}, f)
+            f.flush()
+            if self._fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._fsync_dir()
+
+        for old in self.segments():
+            if old < segment:
+                os.unlink(self._segment_path(old))
+
+    def dead_letter(self, entry: dict, error: str):
+        """
+        Durably record an entry that could not be delivered (for inspection and
+        manual replay), so the drainer can move past it
+        """
+        line = json.dumps({"error": error, "entry": entry}, separators=(",", ":"))
+        with self._sync_lock:
+            with open(os.path.join(self._dir, DEAD_LETTER_FILE), "a") as f:
+                f.write(line + "\n")
+                f.flush()
+                if self._fsync:
+                    os.fsync(f.fileno())
+
+    def close(self):
+        with self._sync_lock, self._lock:
+            if self._fsync:
+                os.fsync(self._fd)
+            os.close(self._fd)
+            os.close(self._lock_fd)
+
+
+class SpoolDrainer:
+    """
+    Delivers spooled webhooks to Temporal with bounded concurrency, checkpointing
+    the position of the oldest undelivered record.
+    """
+
+    def __init__(
+        self,
+        spool: WebhookSpool,
+        concurrency: int = DEFAULT_DRAIN_CONCURRENCY,
+        start_fn=dispatch_workflow_start,
+        checkpoint_interval: float = 0.5,
+        max_backoff: float = 30.0,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        self._spool = spool
+        self._concurrency = concurrency
+        self._start_fn = start_fn
+        self._checkpoint_interval = checkpoint_interval
+        self._max_backoff = max_backoff
+        self._max_attempts = max_attempts
+        self._stopping = False
+        self._wakeup = None
+        self._loop = None
+        self._task = None
+
+    def _notify(self):
+        # called from request threads after each append
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._spool.add_listener(self._notify)
+
+        semaphore = asyncio.Semaphore(self._concurrency)
+        pending = collections.deque()  # [record, delivered] in spool order
+        tasks = set()
+        checkpointed = committed = read_position = self._spool.load_checkpoint()
+        last_checkpoint = loop.time()
+        LOG.info(f"Draining spool {self._spool.directory} from {read_position}")
+
+        async def deliver(item):
+            try:
+                await self._deliver(item[0].entry)
+                item[1] = True
+            finally:
+                semaphore.release()
+
+        while True:
+            # advance past the contiguous prefix of delivered records
+            while pending and pending[0][1]:
+                committed = (pending[0][0].segment, pending[0][0].end)
+                pending.popleft()
+            if committed != checkpointed and (
+                not pending
+                or self._stopping
+                or loop.time() - last_checkpoint >= self._checkpoint_interval
+            ):
+                await loop.run_in_executor(None, self._spool.checkpoint, committed)
+                checkpointed, last_checkpoint = committed, loop.time()
+
+            if self._stopping:
+                if not tasks:
+                    break
+                await asyncio.wait(tasks)
+                continue
+
+            self._wakeup.clear()
+            records, read_position = await loop.run_in_executor(
+                None, self._spool.read, read_position
+            )
+            for record in records:
+                await semaphore.acquire()
+                item = [record, False]
+                pending.append(item)
+                task = loop.create_task(deliver(item))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if not records:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self._checkpoint_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _deliver(self, entry: dict):
+        backoff = min(0.5, self._max_backoff)
+        attempts = 0
+        while True:
+            try:
+                dest = TemporalDestination(**entry["destination"])
+                payload = entry["payload"]
+                if entry.get("envelope"):
+                    payload = WebhookEnvelope.from_json_dict(payload)
+                elif entry.get("serialized"):
+                    payload = SerializedEnvelope.from_json_dict(payload)
+
+                await self._start_fn(dest, entry["id"], payload)
+                LOG.info(f"Started spooled {dest.workflow_type} {entry['id']}")
+                return
+            except WorkflowAlreadyStartedError:
+                LOG.info(f"Spooled webhook {entry['id']} was already started")
+                return
+            except Exception as e:
+                if self._stopping:
+                    raise
+                attempts += 1
+                if not _transient(e) and (
+                    isinstance(e, RPCError) or attempts >= self._max_attempts
+                ):
+                    LOG.error(
+                        f"Dead lettering spooled {entry.get('id')} after {attempts} "
+                        f"attempts: {e!r}"
+                    )
+                    loop = asyncio.get_running_loop()
+                    await loop.run_in_executor(
+                        None, self._spool.dead_letter, entry, repr(e)
+                    )
+                    return
+                LOG.warning(
+                    f"Failed starting spooled {entry.get('id')} (retrying in "
+                    f"{backoff}s): {e}"
+                )
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self._max_backoff)
+
+    def start(self):
+        """
+        Start draining on the background loop
+        """
+        self._task = run_in_background(self.run())
+
+    def stop(self):
+        self._stopping = True
+        self._notify()
+
+    async def close(self):
+        """
+        Stop draining, wait for in-flight deliveries to finish and close the spool
+        """
+        self.stop()
+        if self._task:
+            await asyncio.wrap_future(self._task)
+        self._spool.close()
+
+
+def _transient(e: Exception) -> bool:
+    """
+    Whether a failed workflow start may succeed if retried
+    """
+    if isinstance(e, RPCError):
+        return e.status in TRANSIENT_STATUSES
+    return isinstance(e, (asyncio.TimeoutError, ConnectionError))
+
+
+def worker_spool_dir(base: str, index: int, workers: int) -> str:
+    """
+    Spool directory of a worker process (each needs its own, since a spool is
+    locked by a single process)
+    """
+    return os.path.join(base, f"worker-{index}") if workers > 1 else base
+
+
+def orphaned_spool_dirs(base: str, index: int, workers: int) -> list[str]:
+    """
+    Spools under base left by workers that no longer exist (e.g. after restarting
+    with fewer workers, or switching between one and several workers), which
+    worker index adopts so their accepted webhooks are still delivered
+    """
+    try:
+        names = os.listdir(base)
+    except FileNotFoundError:
+        return []
+
+    orphans = []
+    for name in sorted(names):
+        match = WORKER_DIR.match(name)
+        if match and os.path.isdir(os.path.join(base, name)):
+            number = int(match.group(1))
+            if (workers <= 1 or number >= workers) and number % workers == index:
+                orphans.append(os.path.join(base, name))
+
+    # a single process spools directly into base, which worker 0 adopts
+    single = any(
+        name.startswith(SEGMENT_PREFIX) or name == CHECKPOINT_FILE for name in names
+    )
+    if workers > 1 and index == 0 and single:
+        orphans.append(base)
+    return orphans
+
+
+def get_spool() -> WebhookSpool:
+    return SPOOL
+
+
+def start_spool(config) -> WebhookSpool:
+    """
+    Open the spool configured in config.spool_dir and start draining it in the background
+    """
+    global SPOOL, DRAINER
+    if not config.spool_dir:
+        return None
+
+    SPOOL = WebhookSpool(config.spool_dir, fsync=config.spool_fsync)
+    DRAINER = SpoolDrainer(SPOOL, concurrency=config.spool_concurrency)
+    DRAINER.start()
+
+    # only drained, nothing new is appended to an adopted spool
+    for directory in config.spool_adopt_dirs:
+        LOG.info(f"Adopting orphaned spool {directory}")
+        drainer = SpoolDrainer(
+            WebhookSpool(directory, fsync=config.spool_fsync),
+            concurrency=config.spool_concurrency,
+        )
+        drainer.start()
+        ADOPTED.append(drainer)
+    return SPOOL
+
+
+async def stop_spool():
+    """
+    Stop accepting spooled webhooks and wait for in-flight deliveries to finish
+    """
+    global SPOOL, DRAINER
+    if not DRAINER:
+        return
+
+    SPOOL = None
+    await DRAINER.close()
+    DRAINER = None
+    while ADOPTED:
+        await ADOPTED.pop().close()
+
+
+def spool_entry(webhook_id: str, dest: TemporalDestination, payload) -> dict:
+    if isinstance(payload, WebhookEnvelope):
+        return {
+            "id": webhook_id,
+            "destination": dataclasses.asdict(dest),
+            "envelope": True,
+            "payload": payload.to_json_dict(),
+        }
+    if isinstance(payload, SerializedEnvelope):
+        return {
+            "id": webhook_id,
+            "destination": dataclasses.asdict(dest),
+            "serialized": True,
+            "payload": payload.to_json_dict(),
+        }
+
+    return {
+        "id": webhook_id,
+        "destination": dataclasses.asdict(dest),
+        "payload": payload,
+    }
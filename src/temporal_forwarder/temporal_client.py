@@ -1,40 +1,237 @@
 import logging
-import dataclasses
-import os
+import asyncio
+from datetime import timedelta
 
 import temporalio
 from temporalio.client import Client
+from temporalio.common import WorkflowIDReusePolicy
 
-from temporal_forwarder.codec import EncryptionCodec
+from temporal_forwarder.claimcheck import ClaimCheckCodec, create_blob_store
+from temporal_forwarder.codec import CodecChain, CompressionCodec, TimedCodec
 
-from . import Config
+from . import ID_CONTENT, Config, TemporalDestination
+from .background import run_in_background
+from .deadline import CURRENT_DEADLINE, Deadline
+from .encryption_keys import encryption_enabled, get_key_ring_codec
+from .envelope import WebhookPayloadConverter
 
 LOG = logging.getLogger()
 
-TEMPORAL_CLIENT = None
-
-
-async def get_temporal_client(config=None):
-    global TEMPORAL_CLIENT
-    if not TEMPORAL_CLIENT:
-        # use Temporal's unencrypted default data converter (unless overridden later)
-        data_converter = temporalio.converter.default()
-
-        # if AES_KEY env var is specified, enable payload encryption
-        aes_key = os.environ.get("AES_KEY")
-        if aes_key:
-            # enable payload encryption codec for the existing data converter
-            data_converter = dataclasses.replace(
-                temporalio.converter.default(),
-                payload_codec=EncryptionCodec(
-                    key_id=os.environ.get("AES_KEY_ID", "unnamed-key"),
-                    key=bytes.fromhex(aes_key),
-                ),
+DEFAULT_HEALTH_INTERVAL = 10.0  # seconds between connection checks
+DEFAULT_WARM_UP_TIMEOUT = 5.0
+
+CLIENT_REGISTRY = None
+
+
+def codec_settings() -> tuple:
+    """
+    Hashable description of the payload codec settings clients are created with
+    """
+    # key rotations are applied in place to the shared key ring codec, so only
+    # whether encryption is enabled distinguishes clients
+    return (
+        Config.compression,
+        Config.compression_threshold,
+        encryption_enabled(),
+        Config.claim_check_store,
+        Config.claim_check_threshold,
+    )
+
+
+def create_payload_codec() -> temporalio.converter.PayloadCodec:
+    """
+    Codec pipeline applied to payloads: compression (if enabled), encryption (if
+    enabled) and then claim-check (if enabled), so encrypted payloads are
+    compressed first and claim-checked blobs are stored encrypted.
+    """
+    codecs = []
+    if Config.compression:
+        codecs.append(CompressionCodec(Config.compression, Config.compression_threshold))
+
+    # if AES_KEY (or AES_KEYS/AES_KEYS_FILE) env var is specified, enable payload encryption
+    encryption = get_key_ring_codec()
+    if encryption:
+        codecs.append(encryption)
+    else:
+        LOG.warning("Payload encryption is NOT enabled (set AES_KEY env var)")
+
+    if Config.claim_check_store:
+        codecs.append(
+            ClaimCheckCodec(
+                create_blob_store(Config.claim_check_store), Config.claim_check_threshold
+            )
+        )
+
+    if not codecs:
+        return None
+    return TimedCodec(CodecChain(*codecs) if len(codecs) > 1 else codecs[0])
+
+
+def create_data_converter() -> temporalio.converter.DataConverter:
+    # use Temporal's default data converter extended to support pass-through
+    # webhook envelopes, with any configured compression/encryption codecs
+    return temporalio.converter.DataConverter(
+        payload_converter_class=WebhookPayloadConverter,
+        payload_codec=create_payload_codec(),
+    )
+
+
+class TemporalClientRegistry:
+    """
+    Temporal clients keyed by (endpoint, namespace, codec settings).
+
+    All connects happen on the background loop so concurrent requests share a
+    single connection attempt, and a background monitor reconnects any client
+    whose connection has dropped.
+    """
+
+    def __init__(self, health_interval: float = DEFAULT_HEALTH_INTERVAL):
+        self._health_interval = health_interval
+        self._clients = {}
+        self._locks = {}
+        self._monitor_task = None
+
+    @staticmethod
+    def key(dest: TemporalDestination) -> tuple:
+        return (dest.endpoint, dest.namespace) + codec_settings()
+
+    async def get(self, dest: TemporalDestination) -> Client:
+        """
+        Return the client for the destination, connecting if necessary (callable
+        from any loop)
+        """
+        client = self._clients.get(self.key(dest))
+        if client:
+            return client
+        return await asyncio.wrap_future(run_in_background(self._connect(dest)))
+
+    async def _connect(
+        self, dest: TemporalDestination, reconnect: bool = False
+    ) -> Client:
+        # runs on the background loop
+        key = self.key(dest)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            client = self._clients.get(key)
+            if client and not reconnect:
+                return client
+
+            LOG.info(f"Connecting to Temporal {dest.endpoint} namespace {dest.namespace}")
+            self._clients[key] = await Client.connect(
+                dest.endpoint,
+                namespace=dest.namespace,
+                data_converter=create_data_converter(),
             )
-        else:
-            LOG.warning("Payload encryption is NOT enabled (set AES_KEY env var)")
+            return self._clients[key]
+
+    async def warm_up(self, destinations: list[TemporalDestination]):
+        """
+        Eagerly connect to every distinct destination (so the first webhook does not
+        pay for the gRPC connect and TLS handshake)
+        """
+        distinct = {self.key(dest): dest for dest in destinations}
+        results = await asyncio.gather(
+            *[self._connect(dest) for dest in distinct.values()], return_exceptions=True
+        )
+        for dest, result in zip(distinct.values(), results):
+            if isinstance(result, Exception):
+                LOG.warning(f"Could not connect to Temporal {dest.endpoint}: {result}")
+
+    def start_monitor(self):
+        if not self._monitor_task:
+            self._monitor_task = asyncio.create_task(self.monitor())
+
+    async def monitor(self):
+        """
+        Periodically check each connection, reconnecting any that have dropped
+        """
+        while True:
+            await asyncio.sleep(self._health_interval)
+            for key, client in list(self._clients.items()):
+                try:
+                    await client.service_client.check_health(
+                        timeout=timedelta(seconds=self._health_interval)
+                    )
+                except Exception as e:
+                    dest = TemporalDestination(key[0], key[1])
+                    LOG.warning(f"Temporal {dest.endpoint} connection unhealthy ({e})")
+                    try:
+                        await self._connect(dest, reconnect=True)
+                    except Exception as e:
+                        LOG.warning(f"Reconnect to Temporal {dest.endpoint} failed: {e}")
+
+
+def default_destination() -> TemporalDestination:
+    return TemporalDestination(Config.temporal_endpoint, Config.temporal_namespace)
+
 
-        TEMPORAL_CLIENT = await Client.connect(
-            Config.temporal_endpoint, data_converter=data_converter
+def get_client_registry() -> TemporalClientRegistry:
+    global CLIENT_REGISTRY
+    if not CLIENT_REGISTRY:
+        CLIENT_REGISTRY = TemporalClientRegistry()
+    return CLIENT_REGISTRY
+
+
+async def start_client_registry(
+    forwarders: dict, timeout: float = DEFAULT_WARM_UP_TIMEOUT
+) -> TemporalClientRegistry:
+    """
+    Connect to the destinations of all registered forwarders and start monitoring
+    the connections (must run on the background loop). Waits up to timeout seconds
+    for the initial connects, which otherwise continue in the background.
+    """
+    registry = get_client_registry()
+    destinations = [default_destination()]
+    for forwarder in forwarders.values():
+        destinations += forwarder.destinations()
+
+    registry.start_monitor()
+    warm_up = asyncio.create_task(registry.warm_up(destinations))
+    done, _ = await asyncio.wait([warm_up], timeout=timeout)
+    if not done:
+        LOG.warning(f"Temporal connections not ready after {timeout}s, continuing")
+    return registry
+
+
+async def get_temporal_client(dest: TemporalDestination = None) -> Client:
+    return await get_client_registry().get(dest or default_destination())
+
+
+async def start_workflow_execution(
+    dest: TemporalDestination, workflow_id: str, payload, deadline: Deadline = None
+):
+    """
+    Start a single workflow execution on the destination, raising on any failure.
+    If a deadline is given, the start RPC is bounded by the remaining budget.
+    """
+    deadline = deadline or Deadline()
+    deadline.check()
+
+    client = await get_temporal_client(dest)
+    CURRENT_DEADLINE.set(deadline)  # payloads are encoded within this task
+    if dest.signal:
+        # starts the resource's workflow if it is not already running, and delivers
+        # the webhook to it as a signal either way
+        return await client.start_workflow(
+            dest.workflow_type,
+            task_queue=dest.task_queue,
+            id=workflow_id,
+            start_signal=dest.signal,
+            start_signal_args=[payload],
+            rpc_timeout=deadline.timeout(),
         )
-    return TEMPORAL_CLIENT
+
+    # content-addressed ids (of a request or of a batch of webhooks) identify the
+    # content itself, so even once the first workflow has completed a retry must
+    # not start another
+    id_reuse_policy = WorkflowIDReusePolicy.ALLOW_DUPLICATE
+    if dest.id_strategy == ID_CONTENT or dest.batch_size:
+        id_reuse_policy = WorkflowIDReusePolicy.REJECT_DUPLICATE
+    return await client.start_workflow(
+        dest.workflow_type,
+        payload,
+        task_queue=dest.task_queue,
+        id=workflow_id,
+        id_reuse_policy=id_reuse_policy,
+        rpc_timeout=deadline.timeout(),
+    )
@@ -1,19 +1,34 @@
 import logging
-import base64
+import hashlib
 import json
+import time
 from abc import ABCMeta, abstractmethod
+from http import HTTPStatus
 
-from flask import Request
+from flask import Request, Response, abort
 
-from . import EnvVar, TemporalDestination
+from . import ID_CONTENT, EnvVar, TemporalDestination
+from .ingest import BodyTooLarge, WebhookBody, read_body
+from .projection import Projection
+from .routing import ResolvedRoute, get_routing_table
+from .serialization import get_serializer
 
 LOG = logging.getLogger()
 
+# body digest streamed in by webhooks that may need content-addressed ids
+CONTENT_DIGEST = "content"
+# hash of the original body streamed in by webhooks whose payload is projected
+BODY_DIGEST = "sha256"
+
 
 class WebhookCall(metaclass=ABCMeta):
     def __init__(self, config, request: Request):
         self._config = config
         self._request = request
+        self._body = None
+        self._json = None
+        self._content_ids = {}
+        self._route = None
 
     @property
     @abstractmethod
@@ -48,32 +63,239 @@ class WebhookCall(metaclass=ABCMeta):
         """
         return NotImplementedError
 
+    def content_type(self) -> str:
+        return self._request.headers.get("Content-Type")
+
+    def topic(self) -> str:
+        """
+        The webhook's event topic, if the sender provides one (used to label metrics)
+        """
+        return None
+
+    def shop(self) -> str:
+        """
+        The tenant (e.g. store domain) the webhook was sent for, if the sender
+        provides one (used for routing)
+        """
+        return None
+
+    def routed_destination(self, slug: str) -> TemporalDestination:
+        """
+        The destination of the first route matching this webhook (or None)
+        """
+        return self.route(slug).destination
+
+    def route(self, slug: str) -> ResolvedRoute:
+        """
+        The routes matching this webhook, resolved once so that its destinations and
+        projection all come from the same version of the routes
+        """
+        if self._route is None:
+            self._route = get_routing_table().match(
+                slug, self.topic(), self.shop(), self._request.headers
+            )
+        return self._route
+
+    def projection(self) -> Projection:
+        """
+        The projection applied to this webhook's data before it is enqueued, if
+        any (can be overridden)
+        """
+        return None
+
+    def routed_projection(self, slug: str) -> Projection:
+        """
+        The projection of the first route matching this webhook (or None)
+        """
+        return self.route(slug).projection
+
+    def destinations(self) -> list[TemporalDestination]:
+        """
+        Every Temporal destination this webhook's workflow is started on: its
+        destination() plus any fan-out destinations
+        """
+        return [self.destination()]
+
+    def fanout_destinations(self, slug: str) -> list[TemporalDestination]:
+        """
+        The destination() of this webhook plus those of any fan-out routes matching it
+        """
+        primary = self.destination()
+        return [primary] + [dest for dest in self.route(slug).fanout if dest != primary]
+
+    def body_digests(self) -> dict:
+        """
+        New hashlib/hmac objects (keyed by name) to update while the request body
+        streams in, for example to verify signatures without a second pass.
+        """
+        return {}
+
+    def received_body(self) -> WebhookBody:
+        """
+        The request body, read once in chunks (spilling large bodies to disk)
+        """
+        if not self._body:
+            request = self._request
+            digests = self.body_digests()
+            if self.projection():
+                # so workers can still audit the original (unprojected) body
+                digests[BODY_DIGEST] = hashlib.sha256()
+            try:
+                self._body = read_body(
+                    request.stream,
+                    request.content_length,
+                    digests=digests,
+                    max_size=self._config.max_body_size,
+                    spill_threshold=self._config.body_spill_threshold,
+                )
+            except BodyTooLarge as e:
+                msg = f"Webhook {self.id} too large ({e}) – DROPPING"
+                LOG.error(msg)
+                abort(Response(msg, HTTPStatus.REQUEST_ENTITY_TOO_LARGE))
+        return self._body
+
+    def body_sha256(self) -> str:
+        """
+        Hex SHA-256 of the request body as received
+        """
+        body = self.received_body()
+        try:
+            return body.digest(BODY_DIGEST).hex()  # computed as the body streamed in
+        except KeyError:
+            digest = hashlib.sha256()
+            for chunk in body.chunks():
+                digest.update(chunk)
+            return digest.hexdigest()
+
+    def close(self):
+        """
+        Release the received body, if it was read
+        """
+        if self._body:
+            self._body.close()
+
+    def json(self):
+        """
+        The JSON request body, parsed once
+        """
+        if self._json is None:
+            self._json = get_serializer(self._config.serializer).parse_json(
+                self.received_body().read()
+            )
+        return self._json
+
+    def resource(self, key: str) -> str:
+        """
+        The value of a resource key, either "header:<name>" or a dotted path into
+        the JSON body such as "id" or "customer.id" (None if not present)
+        """
+        if key.startswith("header:"):
+            return self._request.headers.get(key[len("header:") :])
+
+        value = self.json() if self.content_type() == "application/json" else None
+        for field in key.split("."):
+            value = value.get(field) if isinstance(value, dict) else None
+        return None if value is None else str(value)
+
+    def workflow_id(self, dest: TemporalDestination) -> str:
+        """
+        The workflow id on a destination: the webhook id, a content-addressed id,
+        or for signal-with-start destinations the workflow type and resource key
+        (e.g. ShopifyOrder:4502)
+        """
+        if dest.id_strategy == ID_CONTENT:
+            # computed once, so every use agrees even across a time bucket boundary
+            if dest not in self._content_ids:
+                self._content_ids[dest] = self.content_id(dest)
+            return self._content_ids[dest]
+        if not dest.signal:
+            return self.id
+
+        resource = self.resource(dest.resource_key)
+        if resource is None:
+            LOG.warning(f"Webhook {self.id} has no {dest.resource_key}, using its id")
+            resource = self.id
+        return f"{dest.workflow_type}:{resource}"
+
+    def accepted_id(self) -> str:
+        """
+        The id the webhook is acknowledged and deduplicated with: the workflow id
+        on a content-addressed primary destination, otherwise the webhook id
+        """
+        dest = self.destination()
+        if dest.id_strategy == ID_CONTENT:
+            return self.workflow_id(dest)
+        return self.id
+
+    def content_id(self, dest: TemporalDestination) -> str:
+        """
+        Keyed BLAKE2 hash of the method, path and query, the destination's
+        id_headers and the body (and the current id_window time bucket), so
+        identical retries of a webhook get the same workflow id
+        """
+        request = self._request
+        body = self.received_body()
+        try:
+            body_hash = body.digest(CONTENT_DIGEST)  # computed as the body streamed in
+        except KeyError:
+            digest = hashlib.blake2b(digest_size=32)
+            for chunk in body.chunks():
+                digest.update(chunk)
+            body_hash = digest.digest()
+
+        parts = [request.method, request.full_path]
+        for header in [h.strip() for h in (dest.id_headers or "").split(",")]:
+            if header:
+                parts.append(f"{header.lower()}:{request.headers.get(header, '')}")
+        if dest.id_window:
+            parts.append(str(int(time.time() // dest.id_window)))
+
+        # BLAKE2 keys are at most 64 bytes, so the secret is hashed to fit
+        secret = (self._config.webhook_id_key or "").encode("utf-8")
+        digest = hashlib.blake2b(key=hashlib.blake2b(secret).digest(), digest_size=16)
+        for part in parts:
+            # length prefixed, so different splits of the same bytes never collide
+            encoded = part.encode("utf-8")
+            digest.update(len(encoded).to_bytes(4, "big") + encoded)
+        digest.update(body_hash)
+        return digest.hexdigest()
+
+    def body(self) -> bytes:
+        """
+        The raw data passed through untouched to the Temporal destination in
+        pass-through envelope mode: the POST body, or GET query params as JSON.
+        """
+        request = self._request
+        if request.method == "POST":
+            return self.received_body().read()
+        return json.dumps(request.args.to_dict(flat=True)).encode(self._config.encoding)
+
     def data(self) -> str:
         """
         The data top be passed to the Temporal destination (can be overridden).
         By default this includes the entire POST body or GET query params.
+
+        The data is built whole in memory (the parsed JSON, or the entire Base64
+        encoded body), since the envelope is sent to Temporal as a single payload,
+        so only reading the body is streamed (see ingest).
         """
         request = self._request
-        encoding = self._config.encoding
-
         data = None
         if request.method == "POST":
             # pass JSON natively, but Base64 encode all other data content types
             content_type = request.headers.get("Content-Type")
             LOG.debug("Webhook %s content type %s", self.id, content_type)
-            data = request.get_data()
-
             if content_type in ["application/json"]:
-                text = data.decode(encoding)
-                data = json.loads(text)
+                data = self.json()
             else:
-                # re-encode the date with Base64
-                data = base64.b64encode(data).decode(encoding)
+                # re-encode the date with Base64 (a chunk at a time)
+                data = "".join(self.received_body().iter_base64())
 
         else:
             # convert Flask's MultiDict request params to JSON as the data
             # ... may need to be UTF-8 decoded (Config.encoding)
-            LOG.info(request.args)
+            # query params can contain customer data, so only their names are logged
+            LOG.debug("Webhook %s query params %s", self.id, list(request.args))
             data = request.args.to_dict(flat=True)
 
         return data
@@ -84,6 +306,10 @@ class WebhookForwarder(metaclass=ABCMeta):
     Base class definition for all webhook forwarder implementations.
     """
 
+    # route the forwarder is served on (overridden when registered), which routing
+    # rules match on
+    slug: str = None
+
     def __init__(self, config):
         self._config = config
 
@@ -93,6 +319,19 @@ class WebhookForwarder(metaclass=ABCMeta):
         """
         return []
 
+    def start(self):
+        """
+        Start any background tasks the forwarder needs (runs on the background loop)
+        """
+        pass
+
+    def response_deadline(self) -> float:
+        """
+        Seconds the webhook sender waits for a response before giving up and
+        retrying (None = no deadline)
+        """
+        return None
+
     def destinations(self, filter: WebhookCall = None) -> list[TemporalDestination]:
         """
         The Temporal destinations this forwarder routes requests to, which can be
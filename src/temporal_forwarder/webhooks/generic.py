@@ -4,12 +4,15 @@
 # and always enqueues data from any HTTP GET/POST request.
 
 import logging
+import hashlib
 import uuid
 
 from flask import Request
 
-from temporal_forwarder import TemporalDestination
-from temporal_forwarder.webhook import WebhookCall, WebhookForwarder
+from temporal_forwarder import ID_CONTENT, TemporalDestination
+from temporal_forwarder.projection import Projection
+from temporal_forwarder.routing import get_routing_table
+from temporal_forwarder.webhook import CONTENT_DIGEST, WebhookCall, WebhookForwarder
 
 DEFAULT_TEMPORAL_WORKFLOW = "GenericWebhook"
 DEFAULT_TASK_QUEUE = "generic_webhooks"
@@ -18,21 +21,30 @@ LOG = logging.getLogger()
 
 
 class GenericForwarder(WebhookForwarder):
+    slug = "generic"
+
     def __init__(self, config):
         super().__init__(config)
 
+        # webhooks not matching any routing rule
+        self._destination = TemporalDestination(
+            config.temporal_endpoint,
+            config.temporal_namespace,
+            DEFAULT_TEMPORAL_WORKFLOW,
+            DEFAULT_TASK_QUEUE,
+        )
+
     def destinations(self, filter: WebhookCall = None) -> list[TemporalDestination]:
         """
         Which Temporal destinations webhooks should be enqueued
         """
-        return [
-            TemporalDestination(
-                self._config.temporal_endpoint,
-                self._config.temporal_namespace,
-                DEFAULT_TEMPORAL_WORKFLOW,
-                DEFAULT_TASK_QUEUE,
-            )
-        ]
+        if filter:
+            return filter.destinations()
+        routed = get_routing_table().destinations(self.slug)
+        return [self._destination] + [d for d in routed if d != self._destination]
+
+    def default_destination(self) -> TemporalDestination:
+        return self._destination
 
     def new_webhook_call(self, request: Request) -> WebhookCall:
         """
@@ -67,8 +79,21 @@ class GenericWebhook(WebhookCall):
     def verify(self) -> bool:
         return True
 
+    def body_digests(self) -> dict:
+        # hash the body as it streams in if any destination needs a content id
+        if any(dest.id_strategy == ID_CONTENT for dest in self.destinations()):
+            return {CONTENT_DIGEST: hashlib.blake2b(digest_size=32)}
+        return {}
+
     def destination(self) -> TemporalDestination:
-        return self._forwarder.destinations()[0]
+        forwarder = self._forwarder
+        return self.routed_destination(forwarder.slug) or forwarder.default_destination()
+
+    def destinations(self) -> list[TemporalDestination]:
+        return self.fanout_destinations(self._forwarder.slug)
+
+    def projection(self) -> Projection:
+        return self.routed_projection(self._forwarder.slug)
 
     def headers(self) -> dict:
         """
@@ -9,8 +9,9 @@
 #   window, it times out
 
 import logging
+import asyncio
 import base64
-import hashlib
+import binascii
 import hmac
 import os
 from http import HTTPStatus
@@ -18,6 +19,9 @@ from http import HTTPStatus
 from flask import Request, Response, abort
 
 from temporal_forwarder import EnvVar, TemporalDestination
+from temporal_forwarder.projection import Projection
+from temporal_forwarder.routing import get_routing_table
+from temporal_forwarder.secret_store import SecretStore, load_secrets, watch_secrets
 from temporal_forwarder.webhook import WebhookCall, WebhookForwarder
 
 X_SHOPIFY_API_VERSION = "X-Shopify-API-Version"
@@ -31,20 +35,40 @@ X_SHOPIFY_WEBHOOK_ID = "X-Shopify-Webhook-Id"
 DEFAULT_SHOPIFY_TEMPORAL_WORKFLOW = "ShopifyWebhook"
 DEFAULT_SHOPIFY_TASK_QUEUE = "shopify_webhooks"
 
+# Shopify times out webhooks after 5 seconds, leave headroom for the network
+SHOPIFY_RESPONSE_DEADLINE = 4.5
+
 LOG = logging.getLogger()
 
 
 class ShopifyForwarder(WebhookForwarder):
+    slug = "shopify"
+
     def __init__(self, config):
         super().__init__(config)
 
-        self._secret_key = os.environ.get("SHOPIFY_WEBHOOKS_KEY")
-        if not self._secret_key:  # FIXME: unless validate_hmac disabled
+        # webhooks not matching any routing rule
+        self._destination = TemporalDestination(
+            config.temporal_endpoint,
+            config.temporal_namespace,
+            DEFAULT_SHOPIFY_TEMPORAL_WORKFLOW,
+            DEFAULT_SHOPIFY_TASK_QUEUE,
+        )
+
+        # secrets for shops not in the secrets file (comma separated during rotation)
+        self._default_secrets = os.environ.get("SHOPIFY_WEBHOOKS_KEY", "").split(",")
+        self._secrets_path = os.environ.get("SHOPIFY_WEBHOOKS_SECRETS")
+        if not any(self._default_secrets) and not self._secrets_path:
+            # FIXME: unless validate_hmac disabled
             raise Exception(
-                "Must define SHOPIFY_WEBHOOKS_KEY env var "
+                "Must define SHOPIFY_WEBHOOKS_KEY or SHOPIFY_WEBHOOKS_SECRETS env var "
                 + "to verify Shopify data signatures"
             )
 
+        shops = load_secrets(self._secrets_path) if self._secrets_path else {}
+        self.secrets = SecretStore(shops, self._default_secrets)
+        self._secrets_watcher = None
+
     def env_vars(self) -> list[EnvVar]:
         """
         Return environment vars used by this forwarder (for command line help)
@@ -52,24 +76,37 @@ class ShopifyForwarder(WebhookForwarder):
         return [
             EnvVar(
                 var="SHOPIFY_WEBHOOKS_KEY",
-                help="Shopify provided key to validate webhook data HMAC",
+                help="Shopify provided key to validate webhook data HMAC (comma separated during rotation)",
                 required=True,
-            )
+            ),
+            EnvVar(
+                var="SHOPIFY_WEBHOOKS_SECRETS",
+                help="JSON file or directory of keys per X-Shopify-Shop-Domain, reloaded when changed",
+            ),
         ]
 
+    def start(self):
+        if self._secrets_path and not self._secrets_watcher:
+            self._secrets_watcher = asyncio.create_task(
+                watch_secrets(self.secrets, self._secrets_path, self._default_secrets)
+            )
+
+    def response_deadline(self) -> float:
+        return SHOPIFY_RESPONSE_DEADLINE
+
     def destinations(self, filter: WebhookCall = None) -> list[TemporalDestination]:
         """
-        Which Temporal destinations this Shopify webhook should be added to (currently
-        only supports a SINGLE destination)
+        Which Temporal destinations Shopify webhooks are routed to: the default
+        destination and those of any routing rules (or the destination of a single
+        webhook call)
         """
-        return [
-            TemporalDestination(
-                self._config.temporal_endpoint,
-                self._config.temporal_namespace,
-                DEFAULT_SHOPIFY_TEMPORAL_WORKFLOW,
-                DEFAULT_SHOPIFY_TASK_QUEUE,
-            )
-        ]
+        if filter:
+            return filter.destinations()
+        routed = get_routing_table().destinations(self.slug)
+        return [self._destination] + [d for d in routed if d != self._destination]
+
+    def default_destination(self) -> TemporalDestination:
+        return self._destination
 
     def new_webhook_call(self, request: Request) -> WebhookCall:
         """
@@ -83,6 +120,7 @@ class ShopifyWebhook(WebhookCall):
     def __init__(self, config, request, forwarder):
         super().__init__(config, request)
         self._forwarder = forwarder
+        self._hmac_names = []
 
         if request.method != "POST":
             LOG.error(f"Only Shopify POST webhooks supported")
@@ -118,14 +156,39 @@ class ShopifyWebhook(WebhookCall):
         request = self._request
         hmac_header = request.headers.get(X_SHOPIFY_HMAC_SHA256)
         if not hmac_header:
-            msg = f"Missing {X_SHOPIFY_HMAC_SHA256} header for {request.base_url} – DROPPING (id={webhook.id})"
+            msg = f"Missing {X_SHOPIFY_HMAC_SHA256} header for {request.base_url} – DROPPING (id={self.id})"
             LOG.error(msg)
             abort(Response(msg, HTTPStatus.BAD_REQUEST))
 
-        key = self._forwarder._secret_key.encode("utf-8")
-        digest = hmac.new(key, request.get_data(), digestmod=hashlib.sha256).digest()
-        computed_hmac = base64.b64encode(digest)
-        return hmac.compare_digest(computed_hmac, hmac_header.encode("utf-8"))
+        try:
+            expected = base64.b64decode(hmac_header, validate=True)
+        except binascii.Error:
+            return False
+
+        # the HMAC digests (one per valid secret of the shop) are computed as the
+        # body streams in, and any of them may match while a secret is rotated
+        body = self.received_body()
+        if not self._hmac_names:
+            LOG.error(f"No webhook secret for shop {self.shop()} (id={self.id})")
+        verified = False
+        for name in self._hmac_names:
+            verified |= hmac.compare_digest(body.digest(name), expected)
+        return verified
+
+    def topic(self) -> str:
+        return self._request.headers.get(X_SHOPIFY_TOPIC)
+
+    def shop(self) -> str:
+        return self._request.headers.get(X_SHOPIFY_SHOP_DOMAIN)
+
+    def body_digests(self) -> dict:
+        # copies of HMACs pre-keyed with each of the shop's secrets
+        digests = {
+            f"hmac-{i}": h
+            for i, h in enumerate(self._forwarder.secrets.hmacs(self.shop()))
+        }
+        self._hmac_names = list(digests)
+        return digests
 
     def headers(self) -> str:
         """
@@ -140,9 +203,15 @@ class ShopifyWebhook(WebhookCall):
         return headers
 
     def destination(self) -> TemporalDestination:
-        return TemporalDestination(
-            self._config.temporal_endpoint,
-            self._config.temporal_namespace,
-            DEFAULT_SHOPIFY_TEMPORAL_WORKFLOW,
-            DEFAULT_SHOPIFY_TASK_QUEUE,
-        )
+        """
+        Routed by topic, shop domain and headers (see routing.py), or the default
+        Shopify task queue
+        """
+        forwarder = self._forwarder
+        return self.routed_destination(forwarder.slug) or forwarder.default_destination()
+
+    def destinations(self) -> list[TemporalDestination]:
+        return self.fanout_destinations(self._forwarder.slug)
+
+    def projection(self) -> Projection:
+        return self.routed_projection(self._forwarder.slug)
@@ -3,7 +3,8 @@ import pytest
 from temporal_forwarder import create_app
 
 
-@pytest.fixture(scope="module")
+# routes are registered on the first app created, so share a single app across tests
+@pytest.fixture(scope="session")
 def test_client():
     flask_app = create_app("flask_test.cfg")
 
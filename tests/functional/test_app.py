@@ -10,10 +10,28 @@ def test_healthcheck(test_client):
     assert b"OK" in response.data
 
 
-def test_deep_healthcheck(test_client):
+def test_deep_healthcheck(test_client, mocker):
     """
-    FOR NOW DO NOT TEST for now, since a deep healthcheck
-    confirms that the underlying Temporal instances are
-    all alive and ready to have Durable Executions started.
+    GIVEN the cached state of the background Temporal health prober
+    WHEN the '/health/temporal' page is requested (GET)
+    THEN the cached state is reported, without connecting to Temporal
     """
-    pass
+    health = mocker.Mock(status=(True, {"healthy": True, "endpoints": {}}))
+    mocker.patch("temporal_forwarder.healthchecks.get_health", return_value=health)
+    response = test_client.get("/health/temporal")
+    assert response.status_code == 200
+    assert response.json["healthy"]
+
+    health.status = (False, {"healthy": False, "endpoints": {}})
+    assert test_client.get("/health/temporal").status_code == 503
+
+
+def test_stats(test_client):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN the '/health/stats' page is requested (GET)
+    THEN check that internal stats are returned as JSON
+    """
+    response = test_client.get("/health/stats")
+    assert response.status_code == 200
+    assert response.is_json
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+
+from flask import Flask, request
+
+from temporal_forwarder import Config
+from temporal_forwarder.asgi import create_asgi_app
+
+
+async def asgi_request(
+    app, path, body: bytes = None, received: list = None, content_length: bool = True
+):
+    """
+    Issue a GET (or with a body, POST) request directly against an ASGI app,
+    returning the sent messages (and appending the received chunks to received)
+    """
+    sent = []
+    chunks = [body[:4], body[4:]] if body else [b""]
+    received = [] if received is None else received
+
+    async def receive():
+        chunk = chunks.pop(0)
+        received.append(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "POST" if body else "GET",
+        "path": path,
+        "query_string": b"",
+        "headers": (
+            [(b"content-type", b"application/json")]
+            + ([(b"content-length", b"%d" % len(body))] if content_length else [])
+            if body
+            else []
+        ),
+        "http_version": "1.1",
+    }
+    await app(scope, receive, send)
+    return sent
+
+
+def asgi_get(app, path):
+    return asyncio.run(asgi_request(app, path))
+
+
+def test_asgi_healthcheck(test_client):
+    """
+    GIVEN the Flask application wrapped for ASGI serving
+    WHEN the '/health' page is requested (GET)
+    THEN check that the response is valid
+    """
+    app = create_asgi_app(test_client.application, Config, forwarders={})
+    start, body = asgi_get(app, "/health")[:2]
+
+    assert start["status"] == 200
+    assert body["body"] == b"OK"
+
+
+def test_asgi_concurrent_requests():
+    """
+    GIVEN a Flask application wrapped for ASGI serving
+    WHEN two requests that each wait for the other are made at the same time
+    THEN check that both complete (requests are not run one at a time)
+    """
+    flask_app = Flask(__name__)
+    barrier = threading.Barrier(2, timeout=5)
+
+    @flask_app.route("/wait")
+    def wait():
+        barrier.wait()
+        return "OK"
+
+    app = create_asgi_app(flask_app, Config, forwarders={})
+
+    async def both():
+        return await asyncio.gather(
+            asgi_request(app, "/wait"), asgi_request(app, "/wait")
+        )
+
+    for sent in asyncio.run(both()):
+        assert sent[0]["status"] == 200
+
+
+def test_asgi_async_view_on_server_loop():
+    """
+    GIVEN a Flask application with an async view wrapped for ASGI serving
+    WHEN a body is POSTed to it in several chunks
+    THEN the view runs on the server's event loop and receives the whole body
+    """
+    flask_app = Flask(__name__)
+
+    @flask_app.route("/echo", methods=["POST"])
+    async def echo():
+        loops.append(asyncio.get_running_loop())
+        return request.get_data()
+
+    loops = []
+    app = create_asgi_app(flask_app, Config, forwarders={})
+
+    async def post():
+        return asyncio.get_running_loop(), await asgi_request(app, "/echo", b'{"id": 1}')
+
+    loop, sent = asyncio.run(post())
+
+    assert loops == [loop]
+    assert sent[0]["status"] == 200
+    assert b"".join(m.get("body", b"") for m in sent[1:]) == b'{"id": 1}'
+
+
+def test_asgi_body_too_large(mocker):
+    """
+    GIVEN a Flask application wrapped for ASGI serving, with a maximum body size
+    WHEN bodies larger than that are POSTed, with and without a Content-Length
+    THEN they are rejected (413) without running the app or receiving the rest
+    """
+    flask_app = Flask(__name__)
+    calls = []
+
+    @flask_app.route("/echo", methods=["POST"])
+    def echo():
+        calls.append(request.get_data())
+        return "OK"
+
+    mocker.patch.object(Config, "max_body_size", 8)
+    app = create_asgi_app(flask_app, Config, forwarders={})
+    body = b'{"id": 820982911946154508}'
+
+    received = []
+    sent = asyncio.run(asgi_request(app, "/echo", body, received))
+    assert sent[0]["status"] == 413
+    assert received == []
+
+    sent = asyncio.run(asgi_request(app, "/echo", body, content_length=False))
+    assert sent[0]["status"] == 413
+    assert calls == []
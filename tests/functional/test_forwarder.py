@@ -0,0 +1,402 @@
+import asyncio
+import hashlib
+import json
+
+import pytest
+
+from temporalio.exceptions import WorkflowAlreadyStartedError
+from temporalio.service import RPCError, RPCStatusCode
+
+from temporal_forwarder import (
+    ENVELOPE_JSON,
+    ENVELOPE_PASSTHROUGH,
+    FANOUT_ALL,
+    FANOUT_QUORUM,
+    Config,
+)
+from temporal_forwarder.admission import AdmissionController
+from temporal_forwarder.dedupe import DedupeCache
+from temporal_forwarder.envelope import WebhookEnvelope
+from temporal_forwarder.health import HealthProber
+from temporal_forwarder.ingest import WebhookBody
+from temporal_forwarder.plugins import WEBHOOK_FORWARDERS
+from temporal_forwarder.routing import RoutingTable
+from temporal_forwarder.serialization import SerializedEnvelope
+from temporal_forwarder.webhooks.generic import GenericForwarder
+
+BODY = b'{"id": 820982911946154508, "email": "jon@example.com"}'
+
+
+@pytest.fixture
+def started(mocker):
+    """
+    Register a generic forwarder and capture workflow starts instead of calling Temporal
+    """
+    mocker.patch.dict(WEBHOOK_FORWARDERS, {"generic": GenericForwarder(Config)})
+
+    started = []
+
+    async def start(dest, workflow_id, payload, deadline=None):
+        started.append((dest, workflow_id, payload))
+
+    mocker.patch(
+        "temporal_forwarder.forwarder.dispatch_workflow_start", side_effect=start
+    )
+    return started
+
+
+def post(test_client, body=BODY):
+    return test_client.post(
+        "/temporal/generic",
+        data=body,
+        headers={"Content-Type": "application/json", "X-Request-ID": "test-1"},
+    )
+
+
+def test_json_envelope(test_client, started, mocker):
+    """
+    GIVEN the default JSON envelope
+    WHEN a webhook is POSTed
+    THEN the parsed body and headers are started as a JSON document
+    """
+    mocker.patch.object(Config, "envelope", ENVELOPE_JSON)
+    response = post(test_client)
+
+    assert response.status_code == 200
+    assert response.data == b"test-1"
+
+    [(dest, workflow_id, payload)] = started
+    assert workflow_id == "test-1"
+    assert json.loads(payload)["data"] == json.loads(BODY)
+    assert json.loads(payload)["headers"]["X-Webhook-Route"] == "generic"
+
+
+def test_passthrough_envelope(test_client, started, mocker):
+    """
+    GIVEN the pass-through envelope
+    WHEN a webhook is POSTed
+    THEN the raw body is started untouched
+    """
+    mocker.patch.object(Config, "envelope", ENVELOPE_PASSTHROUGH)
+    response = post(test_client)
+
+    assert response.status_code == 200
+    [(dest, workflow_id, payload)] = started
+    assert isinstance(payload, WebhookEnvelope)
+    assert payload.body == BODY
+    assert payload.headers["X-Webhook-Route"] == "generic"
+
+
+def test_serialized_envelope(test_client, started, mocker):
+    """
+    GIVEN an envelope serializer
+    WHEN a webhook is POSTed
+    THEN the envelope is started already serialized, tagged with its encoding
+    """
+    mocker.patch.object(Config, "serializer", "orjson")
+    response = post(test_client)
+
+    assert response.status_code == 200
+    [(dest, workflow_id, payload)] = started
+    assert isinstance(payload, SerializedEnvelope)
+    assert payload.encoding == "json/plain"
+    assert payload.value()["data"] == json.loads(BODY)
+
+
+def test_empty_body_skipped(test_client, started):
+    response = post(test_client, body=b"{}")
+
+    assert response.status_code == 400
+    assert not started
+
+
+def test_body_closed_after_request(test_client, started, mocker):
+    """
+    GIVEN a webhook body
+    WHEN the webhook is POSTed
+    THEN its received body is closed once the request completes
+    """
+    close = mocker.spy(WebhookBody, "close")
+    response = post(test_client)
+
+    assert response.status_code == 200
+    assert close.call_count == 1
+
+
+def test_duplicate_acknowledged_without_starting(test_client, started, mocker):
+    """
+    GIVEN a webhook that was already accepted
+    WHEN the sender retries it
+    THEN it is acknowledged without starting another workflow
+    """
+    dedupe = DedupeCache()
+    mocker.patch("temporal_forwarder.forwarder.get_dedupe", return_value=dedupe)
+
+    assert post(test_client).status_code == 200
+    assert post(test_client).status_code == 200
+
+    assert len(started) == 1
+    assert dedupe.stats()["hits"] == 1
+
+
+def test_already_started_is_success(test_client, mocker):
+    mocker.patch.dict(WEBHOOK_FORWARDERS, {"generic": GenericForwarder(Config)})
+    mocker.patch(
+        "temporal_forwarder.forwarder.dispatch_workflow_start",
+        side_effect=WorkflowAlreadyStartedError("test-1", "GenericWebhook"),
+    )
+
+    assert post(test_client).status_code == 200
+
+
+def test_metrics(test_client, started):
+    """
+    GIVEN a forwarded webhook
+    WHEN '/metrics' is requested
+    THEN per stage latency histograms and the response status are exported
+    """
+    post(test_client)
+    response = test_client.get("/metrics")
+
+    assert response.status_code == 200
+    text = response.data.decode()
+    assert (
+        'webhook_stage_duration_seconds_count{forwarder="generic",stage="verify",topic=""}'
+        in text
+    )
+    assert 'webhook_responses_total{forwarder="generic",status="200",topic=""}' in text
+    assert f'webhook_payload_bytes_total{{forwarder="generic",topic=""}}' in text
+
+
+FANOUT_ROUTES = [
+    {
+        "fanout": True,
+        "namespace": "reporting",
+        "workflow_type": "R",
+        "task_queue": "reports",
+    },
+    {"fanout": True, "namespace": "audit", "workflow_type": "A", "task_queue": "audit"},
+]
+
+
+def test_fanout(test_client, mocker):
+    """
+    GIVEN fan-out routes adding two destinations, one of which fails
+    WHEN a webhook is POSTed
+    THEN workflows are started on every destination concurrently, and the webhook is
+    only acknowledged if the fan-out policy is met
+    """
+    mocker.patch.dict(WEBHOOK_FORWARDERS, {"generic": GenericForwarder(Config)})
+    mocker.patch(
+        "temporal_forwarder.webhook.get_routing_table",
+        return_value=RoutingTable(FANOUT_ROUTES),
+    )
+
+    inflight = []
+
+    async def start(dest, workflow_id, payload, deadline=None):
+        inflight.append(dest.task_queue)
+        await asyncio.sleep(0.01)
+        assert len(inflight) == 3  # all started before any completed
+        if dest.task_queue == "audit":
+            raise RuntimeError("audit namespace unavailable")
+
+    mocker.patch(
+        "temporal_forwarder.forwarder.dispatch_workflow_start", side_effect=start
+    )
+
+    mocker.patch.object(Config, "fanout_policy", FANOUT_ALL)
+    response = post(test_client)
+    assert response.status_code == 424
+    assert b"audit/audit=failed" in response.data
+
+    inflight.clear()
+    mocker.patch.object(Config, "fanout_policy", FANOUT_QUORUM)
+    response = post(test_client)
+    assert response.status_code == 200
+    assert response.headers["Webhook-Destinations"] == (
+        "default/generic_webhooks=started, reporting/reports=started, audit/audit=failed"
+    )
+
+
+def test_load_shedding(test_client, started, mocker):
+    """
+    GIVEN a forwarder at its admission limit
+    WHEN another webhook is POSTed
+    THEN it is rejected immediately with a 503 and Retry-After, without starting a workflow
+    """
+    admission = AdmissionController(1, target_latency=1.0)
+    mocker.patch("temporal_forwarder.forwarder.get_admission", return_value=admission)
+
+    assert post(test_client).status_code == 200
+    assert admission.limiter("generic").inflight == 0
+
+    admission.limiter("generic").try_acquire()
+    response = post(test_client)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert len(started) == 1
+
+
+def test_open_circuit_fails_fast(test_client, started, mocker):
+    """
+    GIVEN a Temporal endpoint whose circuit breaker is open
+    WHEN a webhook is POSTed
+    THEN a retryable 503 is returned without attempting to start a workflow
+    """
+    health = HealthProber({})
+    for _ in range(3):
+        health.breaker(Config.temporal_endpoint).record_failure(ConnectionError())
+    mocker.patch("temporal_forwarder.forwarder.get_health", return_value=health)
+
+    response = post(test_client)
+
+    assert response.status_code == 503
+    assert b"=unavailable" in response.data
+    assert not started
+
+
+def test_timeouts_open_circuit(test_client, mocker):
+    """
+    GIVEN a Temporal endpoint whose workflow starts hang or exceed their deadline
+    WHEN webhooks are POSTed
+    THEN each is a retryable 503 and the circuit breaker opens
+    """
+    mocker.patch.dict(WEBHOOK_FORWARDERS, {"generic": GenericForwarder(Config)})
+    health = HealthProber({})
+    mocker.patch("temporal_forwarder.forwarder.get_health", return_value=health)
+    mocker.patch(
+        "temporal_forwarder.forwarder.dispatch_workflow_start",
+        side_effect=[
+            asyncio.TimeoutError(),
+            RPCError("deadline", RPCStatusCode.DEADLINE_EXCEEDED, b""),
+            asyncio.TimeoutError(),
+        ],
+    )
+
+    for _ in range(3):
+        response = post(test_client)
+        assert response.status_code == 503
+        assert b"=timed-out" in response.data
+
+    assert not health.breaker(Config.temporal_endpoint).allow()
+
+
+def test_content_addressed_ids(test_client, started, mocker):
+    """
+    GIVEN a route with content-addressed workflow ids
+    WHEN identical webhooks are POSTed (with different request ids), and then
+    webhooks with a different body, id header or time bucket
+    THEN identical webhooks get the same workflow id and any difference a new one
+    """
+    route = {
+        "id_strategy": "content",
+        "id_headers": ["X-Event"],
+        "id_window": 60,
+        "workflow_type": "GenericWebhook",
+        "task_queue": "generic",
+    }
+    mocker.patch(
+        "temporal_forwarder.webhook.get_routing_table",
+        return_value=RoutingTable([route]),
+    )
+    now = mocker.patch("temporal_forwarder.webhook.time.time", return_value=600.0)
+
+    def post_event(request_id, event="created", body=BODY):
+        headers = {"Content-Type": "application/json", "X-Request-ID": request_id}
+        test_client.post(
+            "/temporal/generic", data=body, headers=headers | {"X-Event": event}
+        )
+
+    post_event("retry-1")
+    post_event("retry-2")
+    post_event("retry-3", body=b'{"id": 1}')
+    post_event("retry-4", event="updated")
+    now.return_value = 660.0
+    post_event("retry-5")
+
+    ids = [workflow_id for _, workflow_id, _ in started]
+    assert ids[0] == ids[1]
+    assert len(set(ids)) == 4
+
+
+def test_content_addressed_retries_deduplicated(test_client, started, mocker):
+    """
+    GIVEN a content-addressed route and the dedupe cache
+    WHEN identical webhooks without a request id are POSTed
+    THEN the content-addressed workflow id is returned, and the retry is
+    acknowledged from the cache without starting another workflow
+    """
+    route = {"id_strategy": "content", "workflow_type": "W", "task_queue": "generic"}
+    mocker.patch(
+        "temporal_forwarder.webhook.get_routing_table",
+        return_value=RoutingTable([route]),
+    )
+    dedupe = DedupeCache()
+    mocker.patch("temporal_forwarder.forwarder.get_dedupe", return_value=dedupe)
+
+    headers = {"Content-Type": "application/json"}
+    first = test_client.post("/temporal/generic", data=BODY, headers=headers)
+    retry = test_client.post("/temporal/generic", data=BODY, headers=headers)
+
+    [(_, workflow_id, _)] = started
+    assert first.data.decode() == retry.data.decode() == workflow_id
+    assert dedupe.stats()["hits"] == 1
+
+
+def test_signal_with_start_by_resource(test_client, started, mocker):
+    """
+    GIVEN a route delivering webhooks as signals keyed by the payload's id
+    WHEN webhooks for the same resource are POSTed
+    THEN they are all delivered to one workflow for that resource
+    """
+    route = {
+        "signal": "webhook",
+        "resource_key": "id",
+        "workflow_type": "Customer",
+        "task_queue": "customers",
+    }
+    mocker.patch(
+        "temporal_forwarder.webhook.get_routing_table",
+        return_value=RoutingTable([route]),
+    )
+
+    post(test_client)
+    post(test_client)
+
+    assert [workflow_id for _, workflow_id, _ in started] == [
+        "Customer:820982911946154508",
+        "Customer:820982911946154508",
+    ]
+    assert started[0][0].signal == "webhook"
+
+
+def test_projection(test_client, started, mocker):
+    """
+    GIVEN a route projecting webhooks down to their id
+    WHEN a webhook is POSTed, with the JSON or pass-through envelope
+    THEN only the id is enqueued, along with the hash of the original body
+    """
+    route = {
+        "include": ["id"],
+        "workflow_type": "GenericWebhook",
+        "task_queue": "generic",
+    }
+    mocker.patch(
+        "temporal_forwarder.webhook.get_routing_table",
+        return_value=RoutingTable([route]),
+    )
+
+    assert post(test_client).status_code == 200
+    mocker.patch.object(Config, "envelope", ENVELOPE_PASSTHROUGH)
+    assert post(test_client).status_code == 200
+
+    [(_, _, envelope), (_, _, passthrough)] = started
+    envelope = json.loads(envelope)
+    assert envelope["data"] == {"id": 820982911946154508}
+    assert json.loads(passthrough.body) == envelope["data"]
+
+    body_hash = hashlib.sha256(BODY).hexdigest()
+    assert envelope["headers"]["X-Webhook-Body-SHA256"] == body_hash
+    assert passthrough.headers["X-Webhook-Body-SHA256"] == body_hash
@@ -0,0 +1,65 @@
+from temporal_forwarder.admission import AdaptiveLimiter, AdmissionController
+
+
+def test_limit_rejects_past_limit():
+    """
+    GIVEN a limiter with a limit of 2
+    WHEN a third request arrives while two are in flight
+    THEN it is rejected until one of them is released
+    """
+    limiter = AdaptiveLimiter(2, target_latency=1.0, min_limit=1)
+
+    assert limiter.try_acquire() and limiter.try_acquire()
+    assert not limiter.try_acquire()
+
+    limiter.release()
+    assert limiter.try_acquire()
+    assert limiter.stats() == {"limit": 2.0, "inflight": 2, "admitted": 3, "rejected": 1}
+
+
+def test_slow_starts_decrease_limit():
+    """
+    GIVEN a limiter at its maximum limit
+    WHEN workflow starts take longer than the target latency
+    THEN the limit is cut multiplicatively, once per target latency window
+    """
+    limiter = AdaptiveLimiter(100, target_latency=60.0, backoff=0.5)
+
+    for _ in range(10):
+        assert limiter.try_acquire()
+    for _ in range(10):
+        limiter.release(latency=120.0)
+
+    assert limiter.limit == 50.0
+
+
+def test_fast_starts_increase_limit():
+    """
+    GIVEN a limiter whose limit was cut
+    WHEN workflow starts are within the target latency while the limit is in use
+    THEN the limit grows additively back towards its maximum
+    """
+    limiter = AdaptiveLimiter(20, target_latency=1.0, min_limit=10)
+    limiter.limit = 10.0
+
+    for _ in range(200):
+        for _ in range(10):
+            limiter.try_acquire()
+        for _ in range(10):
+            limiter.release(latency=0.01)
+
+    assert limiter.limit == 20.0
+
+    # an idle limit does not grow
+    limiter.limit = 10.0
+    limiter.try_acquire()
+    limiter.release(latency=0.01)
+    assert limiter.limit == 10.0
+
+
+def test_limiter_per_forwarder():
+    admission = AdmissionController(10, target_latency=1.0)
+
+    assert admission.limiter("shopify") is admission.limiter("shopify")
+    assert admission.limiter("shopify") is not admission.limiter("generic")
+    assert set(admission.stats()) == {"shopify", "generic"}
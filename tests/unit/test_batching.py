@@ -0,0 +1,140 @@
+import asyncio
+import dataclasses
+import json
+
+import pytest
+
+from temporal_forwarder import TemporalDestination
+from temporal_forwarder.batching import WorkflowBatcher, batch_workflow_id
+from temporal_forwarder.deadline import Deadline, DeadlineExceeded
+from temporal_forwarder.routing import compile_routes
+
+DESTINATION = TemporalDestination(
+    "localhost:7233", "default", "InventoryBatch", "inventory", batch_size=3
+)
+
+
+def test_batches_fill_or_time_out():
+    """
+    GIVEN a destination batching up to 3 webhooks
+    WHEN 4 webhooks arrive together
+    THEN 3 start as one full batch, and the 4th starts alone once the wait expires
+    """
+    starts = []
+
+    async def start_fn(dest, workflow_id, payload, deadline):
+        starts.append((workflow_id, json.loads(payload)))
+        return workflow_id
+
+    batcher = WorkflowBatcher(start_fn)
+    dest = dataclasses.replace(DESTINATION, batch_wait_ms=10)
+
+    async def burst():
+        return await asyncio.gather(
+            *[
+                batcher.start_workflow(dest, str(i), json.dumps({"i": i}))
+                for i in range(4)
+            ]
+        )
+
+    results = asyncio.run(burst())
+
+    [(full_id, full), (last_id, last)] = starts
+    assert full == [{"i": 0}, {"i": 1}, {"i": 2}]
+    assert last == [{"i": 3}]
+    assert results == [full_id, full_id, full_id, last_id]
+    assert full_id == batch_workflow_id(dest, ["2", "0", "1"])
+    assert batcher.stats() == [{"task_queue": "inventory", "batches": 2, "webhooks": 4}]
+
+
+def test_batch_failure_fails_every_webhook():
+    """
+    GIVEN a batch whose workflow start fails
+    WHEN its webhooks wait for the start
+    THEN every webhook in the batch sees the failure (so is retried by its sender)
+    """
+
+    async def start_fn(dest, workflow_id, payload, deadline):
+        raise RuntimeError("unavailable")
+
+    batcher = WorkflowBatcher(start_fn)
+
+    async def burst():
+        return await asyncio.gather(
+            *[batcher.start_workflow(DESTINATION, str(i), "{}") for i in range(3)],
+            return_exceptions=True,
+        )
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(burst()))
+
+
+def test_expired_and_cancelled_webhooks_dropped_from_batch():
+    """
+    GIVEN a batch with one webhook out of budget and one no longer waiting
+    WHEN the batch is started
+    THEN only the other webhooks are started (under their own deadlines), and the
+    expired webhook fails on its own
+    """
+    starts = []
+
+    async def start_fn(dest, workflow_id, payload, deadline):
+        starts.append((json.loads(payload), deadline.remaining()))
+        return workflow_id
+
+    batcher = WorkflowBatcher(start_fn)
+
+    async def burst():
+        cancelled = asyncio.create_task(
+            batcher.start_workflow(DESTINATION, "cancelled", json.dumps({"i": 3}))
+        )
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        return await asyncio.gather(
+            batcher.start_workflow(DESTINATION, "expired", "{}", Deadline(0.001)),
+            batcher.start_workflow(DESTINATION, "a", json.dumps({"i": 1}), Deadline(5)),
+            return_exceptions=True,
+        )
+
+    expired, started = asyncio.run(burst())
+
+    assert isinstance(expired, DeadlineExceeded)
+    [(payload, remaining)] = starts
+    assert payload == [{"i": 1}]
+    assert remaining > 4
+    assert started == batch_workflow_id(DESTINATION, ["a"])
+
+
+def test_batch_id_is_deterministic():
+    """
+    GIVEN the same webhooks arriving in a different order
+    WHEN batch ids are derived
+    THEN the ids match, and differ for a different set of webhooks
+    """
+    assert batch_workflow_id(DESTINATION, ["a", "b"]) == batch_workflow_id(
+        DESTINATION, ["b", "a"]
+    )
+    assert batch_workflow_id(DESTINATION, ["a", "b"]) != batch_workflow_id(
+        DESTINATION, ["a", "c"]
+    )
+    assert batch_workflow_id(DESTINATION, ["a"]).startswith("InventoryBatch:batch-")
+
+
+def test_batching_with_signal_is_rejected():
+    """
+    GIVEN a route both batching and signalling webhooks
+    WHEN routes are compiled
+    THEN the route is rejected
+    """
+    with pytest.raises(ValueError):
+        compile_routes(
+            [
+                {
+                    "workflow_type": "W",
+                    "task_queue": "q",
+                    "signal": "webhook",
+                    "resource_key": "id",
+                    "batch_size": 10,
+                }
+            ],
+            {},
+        )
@@ -0,0 +1,62 @@
+import asyncio
+import json
+import os
+
+import pytest
+from temporalio.api.common.v1 import Payload
+
+from temporal_forwarder.claimcheck import (
+    ClaimCheckCodec,
+    LocalBlobStore,
+    create_blob_store,
+)
+
+
+def payload(data: bytes) -> Payload:
+    return Payload(metadata={"encoding": b"json/plain"}, data=data)
+
+
+def test_large_payloads_claim_checked(tmp_path):
+    """
+    GIVEN a payload over the threshold
+    WHEN it is encoded
+    THEN the Temporal payload only carries a reference, and decoding fetches the
+         blob back from the store
+    """
+    codec = ClaimCheckCodec(LocalBlobStore(str(tmp_path)), threshold=1024)
+    large = payload(b"x" * 10_000)
+
+    async def run():
+        encoded = await codec.encode([payload(b"{}"), large])
+        # a fresh codec (e.g. on a worker) has nothing cached
+        decoded = await ClaimCheckCodec(codec.store).decode(encoded)
+        return encoded, decoded
+
+    [small, reference], decoded = asyncio.run(run())
+
+    assert small == payload(b"{}")
+    assert reference.metadata["encoding"] == b"binary/claim-check"
+    assert reference.ByteSize() < 1024
+    ref = json.loads(reference.data)
+    assert ref["size"] == large.ByteSize()
+    assert os.path.exists(ref["ref"].removeprefix("file://"))
+    assert decoded == [payload(b"{}"), large]
+
+
+def test_corrupt_blob_rejected(tmp_path):
+    codec = ClaimCheckCodec(LocalBlobStore(str(tmp_path)), threshold=0)
+    [reference] = asyncio.run(codec.encode([payload(b"{}")]))
+
+    path = json.loads(reference.data)["ref"].removeprefix("file://")
+    with open(path, "wb") as f:
+        f.write(b"tampered")
+
+    with pytest.raises(ValueError):
+        asyncio.run(ClaimCheckCodec(codec.store).decode([reference]))
+
+
+def test_create_blob_store(tmp_path):
+    assert isinstance(create_blob_store(str(tmp_path)), LocalBlobStore)
+    assert create_blob_store(f"file://{tmp_path}").directory == str(tmp_path)
+    with pytest.raises(ValueError):
+        create_blob_store("ftp://example.com/blobs")
@@ -0,0 +1,151 @@
+import asyncio
+import json
+
+import pytest
+from temporalio.api.common.v1 import Payload
+
+from temporal_forwarder.codec import (
+    CodecChain,
+    CompressionCodec,
+    EncryptionCodec,
+    KeyRingEncryptionCodec,
+    TimedCodec,
+    default_key,
+    default_key_id,
+)
+from temporal_forwarder.deadline import CURRENT_DEADLINE, Deadline
+from temporal_forwarder.encryption_keys import load_keys
+
+ORDER = json.dumps(
+    {
+        "line_items": [
+            {"sku": f"SKU-{i}", "quantity": 1, "taxable": True} for i in range(100)
+        ]
+    }
+).encode()
+
+
+def payload(data: bytes) -> Payload:
+    return Payload(metadata={"encoding": b"json/plain"}, data=data)
+
+
+def round_trip(codec, payloads):
+    async def run():
+        encoded = await codec.encode(payloads)
+        return encoded, await codec.decode(encoded)
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("algorithm", ["zlib", "zstd"])
+def test_compression_round_trip(algorithm):
+    if algorithm == "zstd":
+        pytest.importorskip("zstandard")
+    codec = CompressionCodec(algorithm)
+
+    [encoded], [decoded] = round_trip(codec, [payload(ORDER)])
+
+    assert encoded.metadata["compression"] == algorithm.encode()
+    assert len(encoded.data) < len(ORDER) / 4
+    assert decoded == payload(ORDER)
+
+
+def test_small_payloads_left_alone():
+    [encoded], [decoded] = round_trip(CompressionCodec(threshold=1024), [payload(b"{}")])
+
+    assert encoded == payload(b"{}")
+    assert decoded == payload(b"{}")
+
+
+def test_chain_compresses_before_encrypting():
+    """
+    Compressed-then-encrypted payloads decode, as do plain payloads and payloads
+    that were only encrypted (e.g. started before compression was enabled).
+    """
+    encryption = EncryptionCodec()
+    chain = CodecChain(CompressionCodec(), encryption)
+
+    [encrypted_only] = asyncio.run(encryption.encode([payload(ORDER)]))
+    [encoded, _], decoded = round_trip(chain, [payload(ORDER), payload(b"{}")])
+
+    assert encoded.metadata["encoding"] == b"binary/encrypted"
+    assert len(encoded.data) < len(encrypted_only.data) / 4
+    assert decoded == [payload(ORDER), payload(b"{}")]
+    assert asyncio.run(chain.decode([encrypted_only, payload(b"{}")])) == [
+        payload(ORDER),
+        payload(b"{}"),
+    ]
+
+
+def test_key_ring_compatible_with_encryption_codec():
+    legacy = EncryptionCodec()
+    ring = KeyRingEncryptionCodec({default_key_id: default_key}, default_key_id)
+
+    [from_legacy] = asyncio.run(legacy.encode([payload(ORDER)]))
+    [from_ring] = asyncio.run(ring.encode([payload(ORDER)]))
+
+    assert from_ring.metadata == from_legacy.metadata
+    assert asyncio.run(ring.decode([from_legacy])) == [payload(ORDER)]
+    assert asyncio.run(legacy.decode([from_ring])) == [payload(ORDER)]
+
+
+def test_key_ring_rotation():
+    """
+    GIVEN payloads encrypted before a key rotation
+    WHEN the active key changes
+    THEN new payloads use the new key, and old payloads still decode until the
+         old key is removed from the ring
+    """
+    old, new = b"o" * 32, b"n" * 32
+    codec = KeyRingEncryptionCodec({"old": old}, "old")
+    [before] = asyncio.run(codec.encode([payload(ORDER)]))
+
+    codec.set_keys({"old": old, "new": new}, "new")
+    [after] = asyncio.run(codec.encode([payload(ORDER)]))
+
+    assert after.metadata["encryption-key-id"] == b"new"
+    assert asyncio.run(codec.decode([before, after])) == [payload(ORDER), payload(ORDER)]
+
+    codec.set_keys({"new": new}, "new")
+    with pytest.raises(ValueError):
+        asyncio.run(codec.decode([before]))
+    with pytest.raises(ValueError):
+        codec.set_keys({"new": new}, "missing")
+
+
+def test_key_ring_offloads_large_payloads(mocker):
+    codec = KeyRingEncryptionCodec({"k": b"k" * 32}, "k", offload_threshold=1024)
+
+    async def run():
+        spy = mocker.spy(asyncio.get_running_loop(), "run_in_executor")
+        encoded = await codec.encode([payload(b"{}"), payload(ORDER)])
+        decoded = await codec.decode(encoded)
+        return spy.call_count, decoded
+
+    calls, decoded = asyncio.run(run())
+    assert calls == 2  # encrypt and decrypt of the large payload only
+    assert decoded == [payload(b"{}"), payload(ORDER)]
+
+
+def test_load_keys(tmp_path, monkeypatch):
+    monkeypatch.delenv("AES_KEYS_FILE", raising=False)
+    monkeypatch.setenv("AES_KEYS", "a:" + "aa" * 32 + ", b:" + "bb" * 32)
+    monkeypatch.setenv("AES_KEY_ID", "b")
+    monkeypatch.delenv("AES_KEY", raising=False)
+    assert load_keys() == ({"a": b"\xaa" * 32, "b": b"\xbb" * 32}, "b")
+
+    path = tmp_path / "keys.json"
+    path.write_text(json.dumps({"active": "c", "keys": {"c": "cc" * 32}}))
+    monkeypatch.setenv("AES_KEYS_FILE", str(path))
+    assert load_keys() == ({"c": b"\xcc" * 32}, "c")
+
+
+def test_timed_codec_records_stage():
+    deadline = Deadline()
+
+    async def run():
+        CURRENT_DEADLINE.set(deadline)
+        return await TimedCodec(CompressionCodec()).encode([payload(ORDER)])
+
+    asyncio.run(run())
+    assert deadline.stages["codec"] > 0
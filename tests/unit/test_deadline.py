@@ -0,0 +1,43 @@
+import time
+
+import pytest
+
+from temporal_forwarder.deadline import Deadline, DeadlineExceeded
+
+
+def test_no_deadline():
+    """
+    Without a budget the deadline never expires or limits RPC timeouts.
+    """
+    deadline = Deadline()
+    deadline.check(1000)
+
+    assert deadline.remaining() is None
+    assert deadline.timeout() is None
+    assert not deadline.expired()
+
+
+def test_insufficient_budget_fails_fast():
+    deadline = Deadline(0.05)
+    deadline.check(0.01)
+
+    with pytest.raises(DeadlineExceeded):
+        deadline.check(0.1)
+
+    time.sleep(0.06)
+    assert deadline.expired()
+    assert deadline.remaining() == 0.0
+
+
+def test_stage_timings():
+    """
+    Each mark records the time since the previous mark for that stage.
+    """
+    deadline = Deadline(5)
+    time.sleep(0.01)
+    deadline.mark("verify")
+    deadline.mark("encode")
+
+    assert deadline.stages["verify"] >= 0.01
+    assert deadline.stages["encode"] < deadline.stages["verify"]
+    assert deadline.server_timing().startswith("verify;dur=")
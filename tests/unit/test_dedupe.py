@@ -0,0 +1,51 @@
+import time
+
+from temporal_forwarder.dedupe import DedupeCache
+
+
+def test_lru_eviction():
+    cache = DedupeCache(max_entries=2)
+    cache.add("a")
+    cache.add("b")
+    assert cache.seen("a")  # "b" is now least recently used
+
+    cache.add("c")
+    assert cache.seen("a")
+    assert not cache.seen("b")
+    assert cache.stats() == {"entries": 2, "hits": 2, "misses": 1}
+
+
+def test_ttl_expiry():
+    cache = DedupeCache(ttl=0.01)
+    cache.add("a")
+    time.sleep(0.02)
+
+    assert not cache.seen("a")
+
+
+def test_persisted_across_restarts(tmp_path):
+    path = str(tmp_path / "dedupe.db")
+    cache = DedupeCache(path=path)
+    cache.add("shopify:1")
+    cache.close()
+
+    assert DedupeCache(path=path).seen("shopify:1")
+
+
+def test_persisted_off_the_caller(tmp_path, mocker):
+    """
+    GIVEN a persisted dedupe index
+    WHEN webhook ids are accepted
+    THEN the caller never writes to disk, and the writer persists them in a batch
+    """
+    cache = DedupeCache(path=str(tmp_path / "dedupe.db"))
+    flush = mocker.spy(cache, "flush")
+
+    for i in range(100):
+        cache.add(f"shopify:{i}")
+    assert flush.call_count == 0
+    time.sleep(0.5)  # the writer batches rows for WRITE_INTERVAL
+
+    assert flush.call_count >= 1
+    cache.close()
+    assert DedupeCache(path=str(tmp_path / "dedupe.db")).stats()["entries"] == 100
@@ -0,0 +1,56 @@
+import asyncio
+
+from temporal_forwarder import TemporalDestination
+from temporal_forwarder.dispatcher import WorkflowDispatcher
+
+DESTINATION = TemporalDestination("localhost:7233", "default", "TestWorkflow", "test")
+
+
+def test_inflight_starts_are_bounded():
+    """
+    No more than max_inflight starts run concurrently for a destination, no matter
+    how many handlers are waiting.
+    """
+    inflight = 0
+    peak = 0
+
+    async def start_fn(dest, workflow_id, payload, deadline):
+        nonlocal inflight, peak
+        inflight += 1
+        peak = max(peak, inflight)
+        await asyncio.sleep(0.01)
+        inflight -= 1
+        return workflow_id
+
+    dispatcher = WorkflowDispatcher(max_inflight=3, start_fn=start_fn)
+
+    async def burst():
+        return await asyncio.gather(
+            *[dispatcher.start_workflow(DESTINATION, str(i), "{}") for i in range(20)]
+        )
+
+    assert asyncio.run(burst()) == [str(i) for i in range(20)]
+    assert peak == 3
+
+    [stats] = dispatcher.stats()
+    assert stats["started"] == 20
+    assert stats["queue_depth"] == 0
+    assert stats["service_time_ms"] > 0
+    dispatcher.close()
+
+
+def test_start_failures_are_raised_to_caller():
+    async def start_fn(dest, workflow_id, payload, deadline):
+        raise RuntimeError("Temporal unavailable")
+
+    dispatcher = WorkflowDispatcher(max_inflight=1, start_fn=start_fn)
+
+    async def start():
+        try:
+            await dispatcher.start_workflow(DESTINATION, "1", "{}")
+        except RuntimeError:
+            return True
+
+    assert asyncio.run(start())
+    assert dispatcher.stats()[0]["failed"] == 1
+    dispatcher.close()
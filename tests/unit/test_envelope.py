@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+from temporalio.converter import DataConverter
+
+from temporal_forwarder.envelope import (
+    WEBHOOK_ENVELOPE_ENCODING,
+    WebhookEnvelope,
+    WebhookPayloadConverter,
+)
+
+HEADERS = {"Content-Type": "application/json", "X-Shopify-Topic": "orders/create"}
+BODY = b'{"id": 820982911946154508, "email": "jon@example.com"}'
+
+
+def test_body_passed_through_untouched():
+    """
+    The raw body is the payload data, with headers carried in metadata.
+    """
+    converter = WebhookPayloadConverter()
+    [payload] = converter.to_payloads(
+        [WebhookEnvelope(HEADERS, BODY, "application/json")]
+    )
+
+    assert payload.data == BODY
+    assert payload.metadata["encoding"] == WEBHOOK_ENVELOPE_ENCODING.encode()
+    assert json.loads(payload.metadata["webhook-headers"]) == HEADERS
+
+
+def test_decode_by_type_hint():
+    """
+    Workers can decode the envelope itself, a dict or the legacy JSON string.
+    """
+    converter = WebhookPayloadConverter()
+    payloads = converter.to_payloads([WebhookEnvelope(HEADERS, BODY, "application/json")])
+
+    [envelope] = converter.from_payloads(payloads)
+    assert envelope.body == BODY
+
+    [legacy] = converter.from_payloads(payloads, [str])
+    assert json.loads(legacy) == {"headers": HEADERS, "data": json.loads(BODY)}
+
+
+def test_non_json_body_and_other_values():
+    converter = WebhookPayloadConverter()
+    envelope = WebhookEnvelope({}, b"\x00\x01binary", "application/octet-stream")
+    payloads = converter.to_payloads([envelope, {"still": "json"}])
+
+    assert payloads[1].metadata["encoding"] == b"json/plain"
+    assert converter.from_payloads(payloads, [dict, dict]) == [
+        {"headers": {}, "data": "AAFiaW5hcnk="},
+        {"still": "json"},
+    ]
+
+
+def test_data_converter_round_trip():
+    data_converter = DataConverter(payload_converter_class=WebhookPayloadConverter)
+    envelope = WebhookEnvelope(HEADERS, BODY, "application/json")
+
+    async def round_trip():
+        payloads = await data_converter.encode([envelope])
+        return await data_converter.decode(payloads, [WebhookEnvelope])
+
+    assert asyncio.run(round_trip()) == [envelope]
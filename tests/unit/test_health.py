@@ -0,0 +1,84 @@
+import asyncio
+
+from temporal_forwarder import TemporalDestination
+from temporal_forwarder.health import CircuitBreaker, HealthProber
+
+A = TemporalDestination("temporal-a:7233", "default", "A", "a")
+B = TemporalDestination("temporal-b:7233", "default", "B", "b")
+
+
+class MockForwarder:
+    def destinations(self):
+        return [A, TemporalDestination("temporal-a:7233", "reporting", "C", "c"), B]
+
+
+class MockClient:
+    def __init__(self, endpoint, down):
+        self.service_client = self
+        self._endpoint = endpoint
+        self._down = down
+
+    async def check_health(self, timeout=None):
+        if self._endpoint in self._down:
+            raise ConnectionError(f"{self._endpoint} unreachable")
+        return True
+
+
+def test_circuit_breaker():
+    """
+    GIVEN a breaker with a failure threshold of 3
+    WHEN an endpoint fails repeatedly and then succeeds
+    THEN the breaker opens on the third consecutive failure and closes on success
+    """
+    breaker = CircuitBreaker("temporal:7233", failure_threshold=3)
+
+    breaker.record_failure(ConnectionError())
+    breaker.record_failure(ConnectionError())
+    assert breaker.allow()
+    breaker.record_failure(ConnectionError("refused"))
+    assert not breaker.allow()
+    assert breaker.state() == {
+        "healthy": False,
+        "consecutive_failures": 3,
+        "last_error": "refused",
+    }
+
+    breaker.record_success()
+    assert breaker.allow()
+
+
+def test_prober_caches_health(mocker):
+    """
+    GIVEN forwarders routing to two Temporal endpoints, one of which is down
+    WHEN the endpoints are probed until the failure threshold is reached
+    THEN each distinct endpoint is probed once per round, and the cached status
+    reports the forwarder unhealthy with the down endpoint's breaker open
+    """
+    down = {B.endpoint}
+    probed = []
+
+    async def get(dest):
+        probed.append(dest.endpoint)
+        return MockClient(dest.endpoint, down)
+
+    registry = mocker.Mock(get=get)
+    mocker.patch("temporal_forwarder.health.get_client_registry", return_value=registry)
+    mocker.patch("temporal_forwarder.health.default_destination", return_value=A)
+
+    prober = HealthProber({"test": MockForwarder()}, failure_threshold=2)
+    assert prober.status[0] is False  # not yet probed
+
+    asyncio.run(prober.probe_all())
+    assert sorted(probed) == [A.endpoint, B.endpoint]
+    assert prober.status[0] is True  # a single failure does not open the breaker
+
+    asyncio.run(prober.probe_all())
+    healthy, report = prober.status
+    assert not healthy
+    assert report["endpoints"][A.endpoint]["healthy"]
+    assert not report["endpoints"][B.endpoint]["healthy"]
+    assert not prober.breaker(B.endpoint).allow()
+
+    down.clear()
+    asyncio.run(prober.probe_all())
+    assert prober.status[0] is True
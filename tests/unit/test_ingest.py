@@ -0,0 +1,44 @@
+import base64
+import hashlib
+import io
+
+import pytest
+
+from temporal_forwarder.ingest import BodyTooLarge, read_body
+
+BODY = b'{"id": 820982911946154508, "line_items": []}' * 1000
+
+
+def test_digests_computed_while_streaming():
+    body = read_body(
+        io.BytesIO(BODY), digests={"sha256": hashlib.sha256()}, chunk_size=100
+    )
+
+    assert body.size == len(BODY)
+    assert body.read() == BODY
+    assert body.digest("sha256") == hashlib.sha256(BODY).digest()
+
+
+def test_large_bodies_spill_to_disk():
+    body = read_body(io.BytesIO(BODY), spill_threshold=1024)
+
+    assert body._file._rolled
+    assert body.read() == BODY
+
+
+def test_streamed_base64_matches():
+    body = read_body(io.BytesIO(BODY))
+
+    assert "".join(body.iter_base64(chunk_size=999)) == base64.b64encode(BODY).decode()
+
+
+def test_max_size_enforced():
+    """
+    Oversized bodies are rejected from the Content-Length before reading, or
+    as soon as the limit is crossed when the length is not known up front.
+    """
+    with pytest.raises(BodyTooLarge):
+        read_body(io.BytesIO(b""), content_length=len(BODY), max_size=1024)
+
+    with pytest.raises(BodyTooLarge):
+        read_body(io.BytesIO(BODY), max_size=1024)
@@ -0,0 +1,79 @@
+import json
+import logging
+import queue
+
+from temporal_forwarder.envelope import WebhookEnvelope
+from temporal_forwarder.logs import (
+    REDACTED,
+    DeferredQueueHandler,
+    JsonFormatter,
+    LoggedPayload,
+    PayloadLogger,
+)
+
+PAYLOAD = json.dumps(
+    {
+        "headers": {
+            "X-Shopify-Hmac-SHA256": "secret",
+            "X-Shopify-Topic": "orders/create",
+        },
+        "data": {"id": 1, "customer": {"email": "jon@example.com", "first_name": "Jon"}},
+    }
+)
+
+
+def test_payload_redacted():
+    logged = json.loads(str(LoggedPayload(PAYLOAD)))
+
+    assert logged["headers"]["X-Shopify-Hmac-SHA256"] == REDACTED
+    assert logged["headers"]["X-Shopify-Topic"] == "orders/create"
+    assert logged["data"]["customer"] == {"email": REDACTED, "first_name": REDACTED}
+
+
+def test_payload_truncated():
+    logged = str(LoggedPayload(PAYLOAD, max_bytes=20))
+
+    assert logged.startswith(PAYLOAD[:10])
+    assert logged.endswith(" bytes)")
+
+
+def test_envelope_payload():
+    envelope = WebhookEnvelope({}, b"\x00" * 100, "application/octet-stream")
+    assert json.loads(str(LoggedPayload(envelope)))["data"] == "<100 bytes>"
+
+
+def test_records_rendered_when_queued():
+    """
+    GIVEN the deferred queue handler
+    WHEN a mutable value, and an exception, are logged
+    THEN the queued record holds the message as it was when logged, and the listener
+    formats it (with the exception) later
+    """
+    records = queue.SimpleQueue()
+    logger = logging.getLogger("test_records_rendered_when_queued")
+    logger.addHandler(DeferredQueueHandler(records))
+    logger.propagate = False
+
+    headers = {"X-Shopify-Topic": "orders/create"}
+    try:
+        raise ValueError("bad")
+    except ValueError:
+        logger.exception("Webhook %s", headers, extra={"webhook_id": "1"})
+    headers["X-Shopify-Topic"] = "orders/paid"
+
+    record = records.get_nowait()
+    assert record.args is None and record.exc_info is None
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Webhook {'X-Shopify-Topic': 'orders/create'}"
+    assert entry["webhook_id"] == "1"
+    assert "ValueError: bad" in entry["exception"]
+    assert "ValueError: bad" in logging.Formatter().format(record)
+
+
+def test_payloads_not_logged_by_default(caplog):
+    caplog.set_level(logging.INFO)
+    PayloadLogger().log("1", PAYLOAD)
+    PayloadLogger(sample_rate=1.0).log("2", PAYLOAD)
+
+    assert [r.args[0] for r in caplog.records] == ["2"]
@@ -0,0 +1,73 @@
+import json
+import sys
+import threading
+
+import pytest
+
+from temporal_forwarder.metrics import BUCKETS, MAX_ROUTES, ForwarderMetrics, merge
+
+
+def record(metrics, status=200, seconds=0.002):
+    route = metrics.route("shopify", "orders/create")
+    route.observe_stages({"verify": seconds})
+    route.count_status(status)
+    route.add_payload_bytes(100)
+
+
+def test_workers_summed(tmp_path):
+    """
+    GIVEN two worker processes sharing a metrics directory
+    WHEN either one collects metrics
+    THEN the totals across both workers are reported
+    """
+    worker, other = ForwarderMetrics(str(tmp_path)), ForwarderMetrics()
+    record(worker)
+    record(other, status=503, seconds=20)
+    (tmp_path / "metrics-99999.json").write_text(json.dumps(other.snapshot()))
+
+    [total] = merge(worker.snapshots()).values()
+
+    verify = total["stages"]["verify"]
+    assert verify[BUCKETS.index(0.0025)] == 1
+    assert verify[len(BUCKETS)] == 1  # +Inf bucket
+    assert verify[-1] == pytest.approx(20.002)  # sum
+    assert total["statuses"] == {"200": 1, "503": 1}
+    assert total["payload_bytes"] == 200
+
+
+def test_label_sets_bounded():
+    metrics = ForwarderMetrics()
+    for i in range(MAX_ROUTES + 10):
+        metrics.route("shopify", f"bogus/{i}")
+
+    assert len(metrics.snapshot()) == MAX_ROUTES + 1
+    assert metrics.route("shopify", "bogus/forever") is metrics.route("shopify", "other")
+
+
+def test_concurrent_requests_counted():
+    """
+    GIVEN requests recorded from many threads at once (as on the ASGI request pool)
+    WHEN the metrics are snapshotted
+    THEN no counts are lost
+    """
+    metrics = ForwarderMetrics()
+
+    def requests():
+        for _ in range(1000):
+            record(metrics)
+
+    # switch threads as often as possible to expose any lost updates
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=requests) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(0.005)
+
+    [(_, _, route)] = metrics.snapshot()
+    assert route["statuses"] == {200: 8000}
+    assert sum(route["stages"]["verify"][:-1]) == 8000
+    assert route["payload_bytes"] == 800_000
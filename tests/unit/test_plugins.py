@@ -0,0 +1,61 @@
+import dataclasses
+
+import pytest
+
+from temporal_forwarder import Config
+from temporal_forwarder.plugins import (
+    ENABLED_FORWARDERS,
+    WEBHOOK_FORWARDERS,
+    available_forwarders,
+    get_forwarder,
+    register_plugins,
+)
+from temporal_forwarder.webhooks.generic import GenericForwarder
+
+
+def test_available_forwarders():
+    """
+    GIVEN the built-in forwarders
+    WHEN the available forwarders are listed
+    THEN each is an entry point that loads its forwarder class
+    """
+    available = available_forwarders()
+    assert {"generic", "shopify"} <= set(available)
+    assert available["generic"].load() is GenericForwarder
+
+
+def test_lazy_forwarders(mocker):
+    """
+    GIVEN forwarders enabled with lazy loading
+    WHEN a forwarder's route is first requested
+    THEN it is only then created, and unknown or disabled routes have no forwarder
+    """
+    mocker.patch.dict(WEBHOOK_FORWARDERS, clear=True)
+    mocker.patch.dict(ENABLED_FORWARDERS, clear=True)
+    config = dataclasses.replace(Config(), forwarders="generic", lazy_forwarders=True)
+
+    assert register_plugins(config) == {}
+    assert list(ENABLED_FORWARDERS) == ["generic"]
+
+    forwarder = get_forwarder("generic")
+    assert isinstance(forwarder, GenericForwarder)
+    assert forwarder.slug == "generic"
+    assert get_forwarder("generic") is forwarder
+    assert ENABLED_FORWARDERS == {}
+
+    assert get_forwarder("shopify") is None
+    assert get_forwarder("unknown") is None
+
+
+def test_unknown_forwarder_is_fatal(mocker):
+    """
+    GIVEN a forwarder that is neither built in nor installed
+    WHEN it is enabled
+    THEN startup fails
+    """
+    mocker.patch.dict(WEBHOOK_FORWARDERS, clear=True)
+    mocker.patch.dict(ENABLED_FORWARDERS, clear=True)
+    config = dataclasses.replace(Config(), forwarders="generic, shippo")
+
+    with pytest.raises(SystemExit):
+        register_plugins(config)
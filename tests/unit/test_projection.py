@@ -0,0 +1,94 @@
+import pytest
+
+from temporal_forwarder.projection import compile_projection, parse_path
+from temporal_forwarder.routing import RoutingTable
+
+ORDER = {
+    "id": 820982911946154508,
+    "email": "jon@example.com",
+    "customer": {"id": 115310627314723954, "note": None, "addresses": [{"zip": "K2P"}]},
+    "line_items": [
+        {"sku": "IPOD-1", "quantity": 1, "properties": [{"name": "gift"}]},
+        {"sku": "IPOD-2", "quantity": 2, "properties": []},
+    ],
+    "shipping_address": None,
+}
+
+
+def test_parse_path():
+    assert parse_path("line_items[*].sku") == ("line_items", "[*]", "sku")
+    assert parse_path("[*].id") == ("[*]", "id")
+    assert parse_path("matrix[*][*]") == ("matrix", "[*]", "[*]")
+    for invalid in ("", "a..b", "a.[*]", "items[0]", "a[*]b"):
+        with pytest.raises(ValueError):
+            parse_path(invalid)
+
+
+def test_include():
+    """
+    GIVEN include paths, including into arrays and to objects that are null
+    WHEN an order is projected
+    THEN only those fields are kept, and the order itself is unchanged
+    """
+    projection = compile_projection(
+        ("id", "line_items[*].sku", "customer", "customer.id", "shipping_address.zip")
+    )
+
+    assert projection(ORDER) == {
+        "id": 820982911946154508,
+        "customer": ORDER["customer"],  # naming the object keeps all of it
+        "line_items": [{"sku": "IPOD-1"}, {"sku": "IPOD-2"}],
+        "shipping_address": None,
+    }
+    assert ORDER["line_items"][0]["quantity"] == 1
+
+
+def test_exclude():
+    """
+    GIVEN include and exclude paths
+    WHEN an order is projected
+    THEN included fields are kept, less those excluded
+    """
+    projection = compile_projection(
+        ("customer", "line_items"),
+        ("customer.addresses", "line_items[*].properties", "missing.field"),
+    )
+
+    assert projection(ORDER) == {
+        "customer": {"id": 115310627314723954, "note": None},
+        "line_items": [
+            {"sku": "IPOD-1", "quantity": 1},
+            {"sku": "IPOD-2", "quantity": 2},
+        ],
+    }
+    assert compile_projection((), ("line_items",))(ORDER).keys() == {
+        "id",
+        "email",
+        "customer",
+        "shipping_address",
+    }
+
+
+def test_compiled_once_per_spec():
+    """
+    GIVEN routes with the same projection
+    WHEN they are compiled
+    THEN they share a single compiled projection, resolved by route
+    """
+    routes = [
+        {
+            "topic": "orders/create",
+            "include": ["id"],
+            "workflow_type": "W",
+            "task_queue": "a",
+        },
+        {"topic": "orders/*", "include": ["id"], "workflow_type": "W", "task_queue": "b"},
+        {"workflow_type": "W", "task_queue": "c"},
+    ]
+    table = RoutingTable(routes)
+
+    create = table.match("shopify", "orders/create").projection
+    assert create is table.match("shopify", "orders/paid").projection
+    assert create(ORDER) == {"id": 820982911946154508}
+    assert table.match("shopify", "products/create").projection is None
+    assert compile_projection() is None
@@ -0,0 +1,201 @@
+import pytest
+
+from temporal_forwarder import Config, TemporalDestination
+from temporal_forwarder.routing import RoutingTable
+from temporal_forwarder.webhooks.shopify import ShopifyForwarder, ShopifyWebhook
+
+ROUTES = [
+    {
+        "slug": "shopify",
+        "topic": "orders/create",
+        "workflow_type": "W",
+        "task_queue": "orders_create",
+    },
+    {
+        "slug": "shopify",
+        "topic": "orders/*",
+        "workflow_type": "W",
+        "task_queue": "orders",
+    },
+    {
+        "slug": "shopify",
+        "shop": "big.myshopify.com",
+        "workflow_type": "W",
+        "task_queue": "big",
+    },
+    {
+        "headers": {"X-Shopify-Test": "true"},
+        "namespace": "testing",
+        "workflow_type": "W",
+        "task_queue": "test",
+    },
+    {
+        "slug": "shopify",
+        "topic": "products/update",
+        "workflow_type": "W",
+        "task_queue": "orders",
+    },
+]
+
+
+def queue(dest: TemporalDestination) -> str:
+    return dest.task_queue if dest else None
+
+
+def routed(table: RoutingTable, *args, **kwargs) -> str:
+    return queue(table.match(*args, **kwargs).destination)
+
+
+def test_first_matching_route_wins():
+    """
+    GIVEN exact and glob routes
+    WHEN webhooks are resolved
+    THEN the first matching route in file order is used, whether indexed or a pattern
+    """
+    table = RoutingTable(ROUTES)
+
+    assert routed(table, "shopify", "orders/create") == "orders_create"
+    assert routed(table, "shopify", "orders/paid") == "orders"
+    assert routed(table, "shopify", "orders/paid", "big.myshopify.com") == "orders"
+    assert routed(table, "shopify", "carts/update", "big.myshopify.com") == "big"
+    assert routed(table, "shopify", "products/update") == "orders"
+    assert routed(table, "generic", "orders/create") is None
+    assert routed(table, "shopify", "carts/update") is None
+
+
+def test_header_routes():
+    """
+    GIVEN a route matching a header value
+    WHEN webhooks with and without the header are resolved
+    THEN only those with the header value are routed
+    """
+    table = RoutingTable(ROUTES)
+
+    dest = table.match("generic", headers={"X-Shopify-Test": "true"}).destination
+    assert queue(dest) == "test" and dest.namespace == "testing"
+    assert table.match("generic", headers={"X-Shopify-Test": "false"}).destination is None
+    assert table.match("generic", headers={}).destination is None
+
+
+def test_shop_case_insensitive():
+    """
+    GIVEN exact and glob routes on a shop domain
+    WHEN webhooks from the shop are resolved with differently cased domains
+    THEN they are routed regardless of case (as tenant secrets are looked up)
+    """
+    table = RoutingTable(
+        ROUTES
+        + [{"shop": "*.Example.com", "workflow_type": "W", "task_queue": "example"}]
+    )
+
+    assert routed(table, "shopify", "carts/update", "Big.myshopify.com") == "big"
+    assert routed(table, "shopify", "carts/update", "BIG.MYSHOPIFY.COM") == "big"
+    assert routed(table, "generic", shop="shop.example.COM") == "example"
+
+
+def test_match_survives_reload():
+    """
+    GIVEN a webhook matched against the routes
+    WHEN the routes are reloaded
+    THEN its destination, projection and fan-out all still come from the old routes
+    """
+    table = RoutingTable(
+        [
+            {
+                "topic": "orders/*",
+                "include": ["id"],
+                "workflow_type": "W",
+                "task_queue": "a",
+            },
+            {"fanout": True, "workflow_type": "W", "task_queue": "audit"},
+        ]
+    )
+    route = table.match("shopify", "orders/create")
+
+    table.load([{"topic": "orders/*", "workflow_type": "W", "task_queue": "b"}])
+
+    assert queue(route.destination) == "a"
+    assert route.projection.include == ("id",)
+    assert [queue(dest) for dest in route.fanout] == ["audit"]
+    assert routed(table, "shopify", "orders/create") == "b"
+    assert table.match("shopify", "orders/create").fanout == ()
+
+
+def test_destinations_are_shared():
+    """
+    GIVEN routes with identical destinations
+    WHEN they are compiled
+    THEN they share one immutable destination, filled in from the defaults
+    """
+    table = RoutingTable(ROUTES, {"namespace": "webhooks"})
+
+    orders = table.match("shopify", "orders/paid").destination
+    assert table.match("shopify", "products/update").destination is orders
+    assert orders.endpoint == Config.temporal_endpoint
+    assert orders.namespace == "webhooks"
+    with pytest.raises(AttributeError):
+        orders.task_queue = "other"
+
+    assert [d.task_queue for d in table.destinations("shopify")] == [
+        "orders_create",
+        "orders",
+        "big",
+        "test",
+    ]
+    assert [d.task_queue for d in table.destinations("generic")] == ["test"]
+
+
+def test_invalid_routes():
+    """
+    GIVEN routes missing a task queue or with unknown fields
+    WHEN they are compiled
+    THEN compilation fails, leaving any current routes in place
+    """
+    table = RoutingTable(ROUTES)
+    with pytest.raises(ValueError):
+        table.load([{"topic": "orders/*", "workflow_type": "W"}])
+    with pytest.raises(ValueError):
+        table.load([{"topics": "orders/*", "workflow_type": "W", "task_queue": "q"}])
+    with pytest.raises(ValueError):
+        table.load([{"signal": "webhook", "workflow_type": "W", "task_queue": "q"}])
+    with pytest.raises(ValueError):
+        table.load([{"id_strategy": "random", "workflow_type": "W", "task_queue": "q"}])
+    with pytest.raises(ValueError):
+        table.load([{"include": "id", "workflow_type": "W", "task_queue": "q"}])
+    with pytest.raises(ValueError):
+        table.load([{"include": ["items[0]"], "workflow_type": "W", "task_queue": "q"}])
+    with pytest.raises(ValueError):
+        table.load(
+            [{"fanout": True, "exclude": ["id"], "workflow_type": "W", "task_queue": "q"}]
+        )
+
+    assert routed(table, "shopify", "orders/create") == "orders_create"
+
+    table.load([])
+    assert table.match("shopify", "orders/create").destination is None
+
+
+def test_shopify_destination(mocker):
+    """
+    GIVEN a routing table
+    WHEN Shopify webhooks are routed by topic and shop domain
+    THEN matching webhooks go to their routed queue and others to the default queue
+    """
+    mocker.patch(
+        "temporal_forwarder.webhook.get_routing_table", return_value=RoutingTable(ROUTES)
+    )
+    mocker.patch.dict("os.environ", {"SHOPIFY_WEBHOOKS_KEY": "secret"})
+    forwarder = ShopifyForwarder(Config)
+
+    def destination(headers: dict) -> TemporalDestination:
+        request = mocker.Mock(
+            method="POST", headers={"X-Shopify-Webhook-Id": "1"} | headers
+        )
+        return ShopifyWebhook(Config, request, forwarder).destination()
+
+    assert queue(destination({"X-Shopify-Topic": "orders/paid"})) == "orders"
+    assert queue(destination({"X-Shopify-Shop-Domain": "big.myshopify.com"})) == "big"
+    assert (
+        destination({"X-Shopify-Topic": "carts/update"})
+        is forwarder.default_destination()
+    )
@@ -0,0 +1,79 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+
+from temporal_forwarder.secret_store import SecretStore, load_secrets, watch_secrets
+
+BODY = b'{"id": 820982911946154508}'
+
+
+def digests(store: SecretStore, tenant: str = None) -> list:
+    hmacs = store.hmacs(tenant)
+    for h in hmacs:
+        h.update(BODY)
+    return [h.digest() for h in hmacs]
+
+
+def expected(secret: str) -> bytes:
+    return hmac.new(secret.encode(), BODY, digestmod=hashlib.sha256).digest()
+
+
+def test_tenant_secrets():
+    """
+    GIVEN secrets for some shops and a default secret
+    WHEN HMACs are requested per shop
+    THEN each shop gets fresh HMACs keyed with its own secrets (or the default)
+    """
+    store = SecretStore(
+        {"A.myshopify.com": ["new", "old"], "b.myshopify.com": "b"}, default=["default"]
+    )
+
+    assert digests(store, "a.myshopify.com") == [expected("new"), expected("old")]
+    assert digests(store, "b.myshopify.com") == [expected("b")]
+    assert digests(store, "c.myshopify.com") == [expected("default")]
+    assert digests(store) == [expected("default")]
+
+    # prototypes are copied, so digests from earlier requests do not leak into later ones
+    assert digests(store, "b.myshopify.com") == [expected("b")]
+    assert SecretStore({"a": "a"}).hmacs("c") == []
+
+
+def test_load_secrets(tmp_path):
+    """
+    GIVEN secrets in a JSON file or a directory of per-shop files
+    WHEN they are loaded
+    THEN secrets are keyed by shop domain
+    """
+    path = tmp_path / "secrets.json"
+    path.write_text(json.dumps({"a.myshopify.com": ["new", "old"]}))
+    assert load_secrets(str(path)) == {"a.myshopify.com": ["new", "old"]}
+
+    directory = tmp_path / "secrets"
+    directory.mkdir()
+    (directory / "a.myshopify.com").write_text("new\nold\n\n")
+    (directory / ".hidden").write_text("ignored")
+    assert load_secrets(str(directory)) == {"a.myshopify.com": ["new", "old"]}
+
+
+def test_watch_secrets(tmp_path):
+    """
+    GIVEN a store watching a secrets directory
+    WHEN a shop's secret file is added
+    THEN the store is reloaded with the new shop's secrets
+    """
+    directory = tmp_path / "secrets"
+    directory.mkdir()
+    store = SecretStore(load_secrets(str(directory)))
+
+    async def add_shop():
+        watcher = asyncio.create_task(watch_secrets(store, str(directory), interval=0.01))
+        await asyncio.sleep(0.02)
+        (directory / "a.myshopify.com").write_text("a\n")
+        os.utime(directory / "a.myshopify.com", (1e10, 1e10))
+        await asyncio.sleep(0.05)
+        watcher.cancel()
+
+    asyncio.run(add_shop())
+    assert digests(store, "a.myshopify.com") == [expected("a")]
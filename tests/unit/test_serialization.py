@@ -0,0 +1,82 @@
+import json
+
+import pytest
+from temporalio.converter import DefaultPayloadConverter
+
+from temporal_forwarder import TemporalDestination
+from temporal_forwarder.batching import batch_payload
+from temporal_forwarder.envelope import WebhookPayloadConverter
+from temporal_forwarder.serialization import (
+    JSON_ENCODING,
+    MSGPACK_ENCODING,
+    SerializedEnvelope,
+    get_serializer,
+)
+from temporal_forwarder.spool import spool_entry
+
+DESTINATION = TemporalDestination("localhost:7233", "default", "TestWorkflow", "test")
+
+ENVELOPE = {
+    "headers": {"X-Shopify-Topic": "orders/create"},
+    "data": {"id": 820982911946154508, "email": "jon@example.com", "total": "10.00"},
+}
+
+
+@pytest.mark.parametrize(
+    "name,encoding",
+    [("json", JSON_ENCODING), ("orjson", JSON_ENCODING), ("msgpack", MSGPACK_ENCODING)],
+)
+def test_serialized_once_and_tagged(name, encoding):
+    """
+    GIVEN an envelope serialized by each serializer
+    WHEN it is converted to a Temporal payload
+    THEN the serialized bytes are the payload data, tagged with their encoding,
+    and decode back to the envelope
+    """
+    if name != "json":
+        pytest.importorskip(name)
+    serializer = get_serializer(name)
+    envelope = SerializedEnvelope.serialize(serializer, ENVELOPE)
+
+    converter = WebhookPayloadConverter()
+    [payload] = converter.to_payloads([envelope])
+    assert payload.data == envelope.data
+    assert payload.metadata["encoding"] == encoding.encode()
+
+    assert converter.from_payloads([payload]) == [ENVELOPE]
+    assert envelope.value() == ENVELOPE
+    assert serializer.parse_json(json.dumps(ENVELOPE).encode()) == ENVELOPE
+
+
+def test_json_decodes_with_default_converter():
+    """
+    GIVEN an envelope serialized as JSON
+    WHEN a worker decodes it with Temporal's default converter
+    THEN the workflow receives the envelope as an object
+    """
+    envelope = SerializedEnvelope.serialize(get_serializer("json"), ENVELOPE)
+    [payload] = WebhookPayloadConverter().to_payloads([envelope])
+
+    assert DefaultPayloadConverter().from_payloads([payload], [dict]) == [ENVELOPE]
+
+
+def test_unknown_serializer():
+    with pytest.raises(ValueError):
+        get_serializer("pickle")
+
+
+def test_spooled_and_batched():
+    """
+    GIVEN serialized envelopes
+    WHEN they are spooled or batched
+    THEN they keep their encoding
+    """
+    serializer = get_serializer("json")
+    envelope = SerializedEnvelope.serialize(serializer, ENVELOPE)
+
+    entry = json.loads(json.dumps(spool_entry("id-1", DESTINATION, envelope)))
+    assert SerializedEnvelope.from_json_dict(entry["payload"]) == envelope
+
+    batch = batch_payload([envelope, envelope])
+    assert batch.encoding == JSON_ENCODING
+    assert batch.value() == [ENVELOPE, ENVELOPE]
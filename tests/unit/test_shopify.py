@@ -1,22 +1,42 @@
 # TODO: use MockFixture instead of MockRequest
+import base64
+import hashlib
+import hmac
+import io
+
 from pytest_mock import MockFixture
 
+from temporal_forwarder import Config
+from temporal_forwarder.secret_store import SecretStore
 from temporal_forwarder.webhooks.shopify import ShopifyWebhook
 
 NO_CONFIG = None
 NO_FORWARDER = None
 
 REQUEST_ID = "fc6f8d28-2962-48a7-9e3c-16de4f03c1c0"
+SECRET_KEY = "shopify-test-secret"
 
 
 class MockRequest:
-    def __init__(self, headers={}):
+    def __init__(self, headers={}, body=b""):
         self.headers = headers
         # always inject required Webhook-Id header
         self.headers |= {"X-Shopify-Webhook-Id": REQUEST_ID}
 
         self.method = "POST"
         self.base_url = "/test"
+        self.stream = io.BytesIO(body)
+        self.content_length = len(body)
+
+
+class MockForwarder:
+    slug = "shopify"
+    secrets = SecretStore(default=[SECRET_KEY])
+
+
+def sign(body: bytes) -> str:
+    digest = hmac.new(SECRET_KEY.encode(), body, digestmod=hashlib.sha256).digest()
+    return base64.b64encode(digest).decode()
 
 
 def test_headers_are_filtered():
@@ -43,3 +63,39 @@ def test_request_id():
 
     assert webhook.id != "test"
     assert webhook.id == REQUEST_ID
+
+
+def test_verify_hmac():
+    """
+    Bodies signed with the shop secret verify, tampered bodies do not.
+    """
+    body = b'{"id": 820982911946154508}'
+
+    request = MockRequest(headers={"X-Shopify-Hmac-SHA256": sign(body)}, body=body)
+    assert ShopifyWebhook(Config, request, MockForwarder()).verify()
+
+    request = MockRequest(headers={"X-Shopify-Hmac-SHA256": sign(body)}, body=body + b" ")
+    assert not ShopifyWebhook(Config, request, MockForwarder()).verify()
+
+
+def test_verify_hmac_per_shop():
+    """
+    Each shop's webhooks verify against any of its own secrets (during rotation),
+    but not against another shop's.
+    """
+
+    class MultiShopForwarder(MockForwarder):
+        secrets = SecretStore({"a.myshopify.com": ["new-secret", SECRET_KEY]})
+
+    body = b'{"id": 820982911946154508}'
+    headers = {"X-Shopify-Hmac-SHA256": sign(body)}
+
+    request = MockRequest(
+        headers=headers | {"X-Shopify-Shop-Domain": "a.myshopify.com"}, body=body
+    )
+    assert ShopifyWebhook(Config, request, MultiShopForwarder()).verify()
+
+    request = MockRequest(
+        headers=headers | {"X-Shopify-Shop-Domain": "b.myshopify.com"}, body=body
+    )
+    assert not ShopifyWebhook(Config, request, MultiShopForwarder()).verify()
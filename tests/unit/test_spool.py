@@ -0,0 +1,157 @@
+import asyncio
+import collections
+import json
+import os
+
+from temporalio.exceptions import WorkflowAlreadyStartedError
+from temporalio.service import RPCError, RPCStatusCode
+
+from temporal_forwarder import TemporalDestination
+from temporal_forwarder.spool import (
+    DEAD_LETTER_FILE,
+    SpoolDrainer,
+    WebhookSpool,
+    orphaned_spool_dirs,
+    spool_entry,
+    worker_spool_dir,
+)
+
+DESTINATION = TemporalDestination("localhost:7233", "default", "TestWorkflow", "test")
+
+
+def entry(id):
+    return spool_entry(id, DESTINATION, '{"headers": {}, "data": {}}')
+
+
+def test_append_and_read(tmp_path):
+    """
+    Entries are read back in the order they were appended, including across
+    segment boundaries.
+    """
+    spool = WebhookSpool(str(tmp_path), segment_bytes=200, fsync=False)
+    for i in range(10):
+        spool.append(entry(str(i)))
+
+    assert len(spool.segments()) > 1
+
+    records, position = spool.read(spool.load_checkpoint(), limit=100)
+    while True:
+        more, position = spool.read(position, limit=100)
+        if not more:
+            break
+        records += more
+
+    assert [r.entry["id"] for r in records] == [str(i) for i in range(10)]
+    assert records[0].entry["destination"]["task_queue"] == "test"
+
+
+def test_torn_record_is_truncated(tmp_path):
+    """
+    A partially written record left behind by a crash is discarded on restart.
+    """
+    spool = WebhookSpool(str(tmp_path), fsync=False)
+    spool.append(entry("complete"))
+    spool.close()
+
+    segment = os.path.join(str(tmp_path), sorted(os.listdir(str(tmp_path)))[-1])
+    with open(segment, "ab") as f:
+        f.write(b'\x40\x00\x00\x00\x00\x00\x00\x00{"id":')
+
+    spool = WebhookSpool(str(tmp_path), fsync=False)
+    records, _ = spool.read(spool.load_checkpoint())
+    assert [r.entry["id"] for r in records] == ["complete"]
+
+
+def test_drainer_delivers_and_checkpoints(tmp_path):
+    """
+    The drainer starts every spooled workflow (treating already started ones as
+    delivered) and checkpoints past them so they are not redelivered.
+    """
+    started = []
+
+    async def start_fn(dest, workflow_id, payload):
+        started.append(workflow_id)
+        if workflow_id == "dupe":
+            raise WorkflowAlreadyStartedError(workflow_id, dest.workflow_type)
+
+    spool = WebhookSpool(str(tmp_path), fsync=False)
+    for id in ["a", "dupe", "b"]:
+        spool.append(entry(id))
+
+    async def drain():
+        drainer = SpoolDrainer(spool, start_fn=start_fn, checkpoint_interval=0.01)
+        task = asyncio.create_task(drainer.run())
+        while len(started) < 3:
+            await asyncio.sleep(0.01)
+        drainer.stop()
+        await task
+
+    asyncio.run(drain())
+
+    assert sorted(started) == ["a", "b", "dupe"]
+    records, _ = spool.read(spool.load_checkpoint())
+    assert records == []
+
+
+def test_drainer_dead_letters_permanent_failures(tmp_path):
+    """
+    GIVEN spooled webhooks failing transiently, permanently (an invalid request)
+    and repeatedly (a codec error)
+    WHEN the spool is drained
+    THEN transient failures are retried until delivered, the others are dead
+    lettered, and the checkpoint moves past all of them
+    """
+    attempts = collections.Counter()
+
+    async def start_fn(dest, workflow_id, payload):
+        attempts[workflow_id] += 1
+        if workflow_id == "invalid":
+            raise RPCError("bad", RPCStatusCode.INVALID_ARGUMENT, b"")
+        if workflow_id == "codec":
+            raise ValueError("Unrecognized key ID")
+        if workflow_id == "flaky" and attempts[workflow_id] < 3:
+            raise RPCError("down", RPCStatusCode.UNAVAILABLE, b"")
+
+    spool = WebhookSpool(str(tmp_path), fsync=False)
+    for id in ["invalid", "codec", "flaky", "ok"]:
+        spool.append(entry(id))
+
+    async def drain():
+        drainer = SpoolDrainer(
+            spool, start_fn=start_fn, checkpoint_interval=0.01, max_backoff=0.01
+        )
+        task = asyncio.create_task(drainer.run())
+        while spool.read(spool.load_checkpoint())[0]:
+            await asyncio.sleep(0.01)
+        drainer.stop()
+        await task
+
+    asyncio.run(drain())
+
+    assert attempts == {"invalid": 1, "codec": 5, "flaky": 3, "ok": 1}
+    with open(tmp_path / DEAD_LETTER_FILE) as f:
+        dead = [json.loads(line) for line in f]
+    assert [d["entry"]["id"] for d in dead] == ["invalid", "codec"]
+
+
+def test_orphaned_spools_adopted(tmp_path):
+    """
+    GIVEN spools of 4 workers, and of an earlier single process run
+    WHEN restarted with 2 workers, or a single process
+    THEN every spool without a worker is adopted by exactly one worker
+    """
+    for i in range(4):
+        WebhookSpool(str(tmp_path / f"worker-{i}"), fsync=False).close()
+    spool = WebhookSpool(str(tmp_path), fsync=False)
+    spool.append(entry("a"))
+    spool.close()
+
+    base = str(tmp_path)
+    assert worker_spool_dir(base, 1, 2) == str(tmp_path / "worker-1")
+    assert orphaned_spool_dirs(base, 0, 2) == [str(tmp_path / "worker-2"), base]
+    assert orphaned_spool_dirs(base, 1, 2) == [str(tmp_path / "worker-3")]
+
+    assert worker_spool_dir(base, 0, 1) == base
+    assert orphaned_spool_dirs(base, 0, 1) == [
+        str(tmp_path / f"worker-{i}") for i in range(4)
+    ]
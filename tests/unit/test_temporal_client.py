@@ -0,0 +1,91 @@
+import asyncio
+
+from temporalio.common import WorkflowIDReusePolicy
+
+from temporal_forwarder import TemporalDestination
+from temporal_forwarder.temporal_client import (
+    TemporalClientRegistry,
+    start_workflow_execution,
+)
+
+
+class MockClient:
+    def __init__(self, endpoint, namespace):
+        self.endpoint = endpoint
+        self.namespace = namespace
+
+
+def test_clients_keyed_by_endpoint_and_namespace(mocker):
+    """
+    Warm-up connects once per distinct (endpoint, namespace), and later lookups
+    reuse those connections.
+    """
+
+    async def connect(endpoint, namespace="default", data_converter=None):
+        return MockClient(endpoint, namespace)
+
+    connect_mock = mocker.patch(
+        "temporal_forwarder.temporal_client.Client.connect", side_effect=connect
+    )
+
+    destinations = [
+        TemporalDestination("temporal-a:7233", "default", "A", "a"),
+        TemporalDestination("temporal-a:7233", "default", "B", "b"),
+        TemporalDestination("temporal-a:7233", "reporting", "C", "c"),
+        TemporalDestination("temporal-b:7233", "default", "D", "d"),
+    ]
+
+    registry = TemporalClientRegistry()
+
+    async def warm_up_and_get():
+        await registry.warm_up(destinations)
+        return await registry.get(destinations[2])
+
+    client = asyncio.run(warm_up_and_get())
+
+    assert connect_mock.call_count == 3
+    assert client.endpoint == "temporal-a:7233"
+    assert client.namespace == "reporting"
+
+
+def test_signal_with_start(mocker):
+    """
+    GIVEN a destination with a signal
+    WHEN a workflow is started on it
+    THEN the payload is delivered with signal-with-start, not as a workflow argument
+    """
+    client = mocker.AsyncMock()
+    mocker.patch(
+        "temporal_forwarder.temporal_client.get_temporal_client", return_value=client
+    )
+    dest = TemporalDestination(
+        "temporal:7233", "default", "ShopifyOrder", "orders", "webhook", "id"
+    )
+
+    asyncio.run(start_workflow_execution(dest, "ShopifyOrder:1", "{}"))
+
+    args, kwargs = client.start_workflow.call_args
+    assert args == ("ShopifyOrder",)
+    assert kwargs["id"] == "ShopifyOrder:1"
+    assert kwargs["start_signal"] == "webhook"
+    assert kwargs["start_signal_args"] == ["{}"]
+
+
+def test_content_ids_reject_duplicates(mocker):
+    """
+    GIVEN destinations with content-addressed workflow ids (or batch ids)
+    WHEN a workflow is started on them
+    THEN workflows with the same id are never started again, even once closed
+    """
+    client = mocker.AsyncMock()
+    mocker.patch(
+        "temporal_forwarder.temporal_client.get_temporal_client", return_value=client
+    )
+    for dest in [
+        TemporalDestination(workflow_type="GenericWebhook", id_strategy="content"),
+        TemporalDestination(workflow_type="InventoryBatch", batch_size=100),
+    ]:
+        asyncio.run(start_workflow_execution(dest, "3f1c", "{}"))
+
+        args, kwargs = client.start_workflow.call_args
+        assert kwargs["id_reuse_policy"] == WorkflowIDReusePolicy.REJECT_DUPLICATE